@@ -0,0 +1,268 @@
+"""
+Benchmarks for form and table rendering throughput.
+
+Benchmarks run against an in-memory Axiom store and need no network access.
+Run them with::
+
+    python -m methanal.benchmark [--size=N] [--iterations=N] [name ...]
+
+Each result is written to standard output as a single line of JSON, suitable
+for collecting and comparing across releases.
+"""
+import sys
+import json
+import platform
+from timeit import default_timer
+
+from twisted.python import usage
+
+from epsilon.extime import FixedOffset, Time
+
+from axiom.store import Store
+from axiom.item import Item
+from axiom.attributes import boolean, integer, text, ieee754_double, timestamp
+
+from nevow import athena, loaders
+from nevow.testutil import renderLivePage
+
+from methanal import __version__
+from methanal.enums import Enum, EnumItem
+from methanal.model import ItemModel, Model, Value
+from methanal.view import AutoItemView
+from methanal.widgets import Table
+
+
+
+class BenchmarkItem(Item):
+    """
+    An item with one attribute of each type Methanal can synthesize inputs
+    and columns for.
+    """
+    typeName = 'methanal_benchmark_benchmarkitem'
+    schemaVersion = 1
+
+    name = text(doc=u'Name', default=u'')
+    count = integer(doc=u'Count', default=0)
+    enabled = boolean(doc=u'Enabled', default=False)
+    amount = ieee754_double(doc=u'Amount', default=0.0)
+    created = timestamp(doc=u'Created')
+
+
+
+def createItems(store, count):
+    """
+    Create some L{BenchmarkItem}s.
+
+    @rtype: C{list} of L{BenchmarkItem}
+    """
+    now = Time()
+    return [
+        BenchmarkItem(
+            store=store,
+            name=u'Item %d' % (i,),
+            count=i,
+            enabled=bool(i % 2),
+            amount=i / 3.0,
+            created=now)
+        for i in xrange(count)]
+
+
+
+_benchmarks = {}
+
+def benchmark(f):
+    """
+    Register a benchmark.
+
+    Benchmarks are called with a C{size} argument, perform any setup that
+    should not be measured and return a callable, taking no arguments, that
+    performs the measured work.
+    """
+    _benchmarks[f.__name__] = f
+    return f
+
+
+
+def getBenchmarkNames():
+    """
+    Get the names of all registered benchmarks.
+
+    @rtype: C{list} of C{str}
+    """
+    return sorted(_benchmarks)
+
+
+
+@benchmark
+def autoItemView(size):
+    """
+    Construct C{size} L{methanal.view.AutoItemView}s for existing items.
+    """
+    store = Store()
+    items = createItems(store, size)
+    env = {'timezone': FixedOffset(0, 0)}
+    def _run():
+        for item in items:
+            AutoItemView(item=item, env=env)
+    return _run
+
+
+
+@benchmark
+def autoItemViewRender(size):
+    """
+    Construct and render C{size} L{methanal.view.AutoItemView}s.
+    """
+    store = Store()
+    items = createItems(store, size)
+    env = {'timezone': FixedOffset(0, 0)}
+    def _render(item):
+        view = AutoItemView(item=item, env=env)
+        page = athena.LivePage(docFactory=loaders.stan(view))
+        view.setFragmentParent(page)
+        result = []
+        renderLivePage(page).addCallback(result.append)
+        if not result:
+            raise RuntimeError('Rendering did not complete synchronously')
+
+    def _run():
+        for item in items:
+            _render(item)
+    return _run
+
+
+
+@benchmark
+def tableArgs(size):
+    """
+    Build the initial arguments for a L{methanal.widgets.Table} of C{size}
+    rows, with a column for each L{BenchmarkItem} attribute.
+    """
+    store = Store()
+    createItems(store, size)
+    columns = [attr for name, attr in BenchmarkItem.getSchema()]
+    query = store.query(BenchmarkItem, sort=BenchmarkItem.count.ascending)
+    def _run():
+        Table(query, columns).getArgs()
+    return _run
+
+
+
+@benchmark
+def itemModel(size):
+    """
+    Synthesize C{size} L{methanal.model.ItemModel}s from existing items.
+    """
+    store = Store()
+    items = createItems(store, size)
+    def _run():
+        for item in items:
+            ItemModel(item=item)
+    return _run
+
+
+
+@benchmark
+def modelProcess(size):
+    """
+    Process a L{methanal.model.Model} with C{size} parameters.
+    """
+    model = Model(params=[
+        Value(name='value%d' % (i,), value=i) for i in xrange(size)])
+    def _run():
+        model.process()
+    return _run
+
+
+
+@benchmark
+def enumLookups(size):
+    """
+    Look up every value, by value and by extra, in an
+    L{methanal.enums.Enum} of C{size} items.
+    """
+    enum = Enum(u'Benchmark', [
+        EnumItem(i, u'Value %d' % (i,), id=u'id%d' % (i,))
+        for i in xrange(size)])
+    values = range(size)
+    def _run():
+        for value in values:
+            enum.get(value)
+            enum.find(id=u'id%d' % (value,))
+    return _run
+
+
+
+def runBenchmark(name, size, iterations):
+    """
+    Run a benchmark and measure it.
+
+    @type  name: C{str}
+    @param name: Benchmark name
+
+    @type  size: C{int}
+    @param size: Benchmark size, passed to the benchmark
+
+    @type  iterations: C{int}
+    @param iterations: Number of times to run the measured part of the
+        benchmark
+
+    @rtype: C{dict}
+    @return: Mapping of benchmark metadata and timing results, in seconds
+    """
+    run = _benchmarks[name](size)
+    timings = []
+    for i in xrange(iterations):
+        start = default_timer()
+        run()
+        timings.append(default_timer() - start)
+    total = sum(timings)
+    return {
+        'name': name,
+        'size': size,
+        'iterations': iterations,
+        'total': total,
+        'mean': total / iterations,
+        'min': min(timings),
+        'max': max(timings),
+        'version': __version__,
+        'python': platform.python_version()}
+
+
+
+class Options(usage.Options):
+    """
+    Command-line options for running benchmarks.
+    """
+    synopsis = '[options] [benchmark ...]'
+
+    optParameters = [
+        ('size', 's', 100, 'Benchmark size', int),
+        ('iterations', 'n', 10, 'Number of iterations', int)]
+
+
+    def parseArgs(self, *names):
+        for name in names:
+            if name not in _benchmarks:
+                raise usage.UsageError(
+                    'Unknown benchmark %r, choose from: %s' % (
+                        name, ', '.join(getBenchmarkNames())))
+        self['names'] = list(names) or getBenchmarkNames()
+
+
+
+def main(argv=None, stdout=sys.stdout):
+    """
+    Run benchmarks, writing results to C{stdout} as lines of JSON.
+    """
+    options = Options()
+    options.parseOptions(argv)
+    for name in options['names']:
+        result = runBenchmark(name, options['size'], options['iterations'])
+        stdout.write(json.dumps(result, sort_keys=True) + '\n')
+        stdout.flush()
+
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,17 @@
 import textwrap
-from zope.interface import implements
+from weakref import WeakSet
+from itertools import islice
+from zope.interface import implements, alsoProvides
 
 from twisted.python.versions import Version
 from twisted.python.deprecate import deprecated
 
 from methanal.errors import InvalidEnumItem
-from methanal.imethanal import IEnumeration
+from methanal.util import ContainsComparison
+from axiom.attributes import AND
+from axiom.item import Item
+
+from methanal.imethanal import IEnumeration, ISearchableEnumeration
 
 
 
@@ -41,17 +47,36 @@ class Enum(object):
         order of the enumeration
 
     @ivar _values: A mapping of enumeration values to L{EnumItem}s
+
+    @type shared: C{bool}
+    @ivar shared: Is this enumeration shared between inputs, such as a
+        module-level enumeration, rather than created for each form? Only the
+        rendered options of shared enumerations are cached.
+
+    @type _version: C{int}
+    @ivar _version: Incremented whenever the L{EnumItem.hidden} flag of one of
+        this enumeration's items changes
+
+    @type _visible: C{tuple} of L{EnumItem}
+    @ivar _visible: Enumeration items, in order, that are not hidden, as of
+        L{_visibleVersion}
+
+    @type _indexes: C{dict} mapping C{str} to C{dict}
+    @ivar _indexes: Lazily built indexes of extra values, mapping extra
+        value names to mappings of extra values to C{list}s of L{EnumItem}s,
+        in order; or to C{None} if an extra value cannot be indexed
     """
-    implements(IEnumeration)
+    implements(ISearchableEnumeration)
 
 
-    def __init__(self, doc, values):
+    def __init__(self, doc, values, shared=False):
         """
         Initialise an enumeration.
 
         @type values: C{iterable} of L{EnumItem}
         """
         self.doc = doc
+        self.shared = shared
 
         _order = self._order = []
         _values = self._values = {}
@@ -62,12 +87,79 @@ class Enum(object):
                     '%r is already a value in the enumeration' % (key,))
             _order.append(value)
             _values[key] = value
+            value._enums.add(self)
+
+        self._version = 0
+        self._visible = None
+        self._visibleVersion = None
+        self._indexes = {}
+
+
+    @property
+    def version(self):
+        """
+        A value that changes whenever the visible items of the enumeration
+        may have changed.
+        """
+        return self._version
+
+
+    def _getVisible(self):
+        """
+        Get the enumeration items that are not hidden, in order.
+
+        @rtype: C{tuple} of L{EnumItem}
+        """
+        if self._visibleVersion != self._version:
+            self._visible = tuple(
+                item for item in self._order if not item.hidden)
+            self._visibleVersion = self._version
+        return self._visible
+
+
+    def _getIndex(self, name):
+        """
+        Get the index for an extra value, building it if necessary.
+
+        @type  name: C{str}
+        @param name: Extra value name
+
+        @rtype: C{dict} mapping values to C{list} of L{EnumItem}
+        @return: Mapping of extra values to the items, hidden or not, with
+            that value; or C{None} if some of the values are not hashable
+        """
+        try:
+            return self._indexes[name]
+        except KeyError:
+            pass
+
+        index = {}
+        try:
+            for item in self._order:
+                index.setdefault(item.get(name), []).append(item)
+        except TypeError:
+            index = None
+        self._indexes[name] = index
+        return index
+
+
+    def _getCandidates(self, name, value):
+        """
+        Get the items that might have an extra value of C{value}.
+
+        @rtype: C{list} of L{EnumItem}
+        """
+        index = self._getIndex(name)
+        if index is None:
+            return self._order
+        try:
+            return index.get(value, [])
+        except TypeError:
+            return self._order
 
 
     def __iter__(self):
-        for item in self._order:
-            if not item.hidden:
-                yield item
+        return iter(self._getVisible())
 
 
     def __repr__(self):
@@ -91,7 +183,7 @@ class Enum(object):
 
 
     @classmethod
-    def fromPairs(cls, doc, pairs):
+    def fromPairs(cls, doc, pairs, shared=False):
         """
         Construct an enumeration from an iterable of pairs.
 
@@ -99,10 +191,12 @@ class Enum(object):
 
         @param pairs: C{iterable} of C{(value, description)} pairs
 
+        @param shared: See L{Enum.shared}
+
         @rtype: L{Enum}
         """
         values = (EnumItem(value, desc) for value, desc in pairs)
-        return cls(doc=doc, values=values)
+        return cls(doc=doc, values=values, shared=shared)
 
 
     # IEnumeration
@@ -135,13 +229,20 @@ class Enum(object):
 
 
     def findAll(self, **names):
-        values = names.items()
-        if len(values) != 1:
-            raise ValueError('Only one query is allowed at a time')
-
-        name, value = values[0]
-        for item in self:
-            if item.get(name) == value:
+        if not names:
+            raise ValueError('At least one query must be specified')
+
+        queries = names.items()
+        candidates = min(
+            (self._getCandidates(name, value) for name, value in queries),
+            key=len)
+        for item in candidates:
+            if item.hidden:
+                continue
+            for name, value in queries:
+                if item.get(name) != value:
+                    break
+            else:
                 yield item
 
 
@@ -149,6 +250,15 @@ class Enum(object):
         return [(i.value, i.desc) for i in self]
 
 
+    # ISearchableEnumeration
+
+    def search(self, text, limit):
+        text = text.lower()
+        return list(islice(
+            (item for item in self if text in unicode(item.desc).lower()),
+            limit))
+
+
 
 class ObjectEnum(Enum):
     """
@@ -178,6 +288,164 @@ class ObjectEnum(Enum):
 
 
 
+class QueryEnum(object):
+    """
+    An enumeration of the items matched by an Axiom query.
+
+    Enumeration items are created on demand, rather than loading every item
+    the query matches up front, which makes C{QueryEnum} suitable for
+    selecting from large tables with L{methanal.view.SearchableSelectInput}.
+
+    The value of each enumeration item is an Axiom item, and its C{'id'}
+    extra value the Axiom item's store ID. Finding items by C{'id'} and
+    searching are performed by the store, finding items by any other extra
+    value iterates the query. Only enumerations with a L{searchAttribute}
+    provide L{ISearchableEnumeration}.
+
+    @type query: C{axiom.store.ItemQuery}
+    @ivar query: Query matching the items of the enumeration
+
+    @type describe: C{callable} taking an C{axiom.item.Item} and returning
+        C{unicode}
+    @ivar describe: Produce the description of an enumeration item
+
+    @type searchAttribute: C{axiom.attributes.text}
+    @ivar searchAttribute: Attribute searched, for values containing the
+        search text, by L{search}; or C{None} if the enumeration is not
+        searchable
+    """
+    implements(IEnumeration)
+
+
+    def __init__(self, doc, query, describe=None, searchAttribute=None):
+        """
+        Initialise a query-backed enumeration.
+
+        @param describe: Produce the description of an enumeration item, or
+            C{None} to use the value of C{searchAttribute}
+        """
+        self.doc = doc
+        self.query = query
+        if describe is None:
+            if searchAttribute is None:
+                raise ValueError(
+                    'Either describe or searchAttribute must be specified')
+            describe = lambda item: getattr(item, searchAttribute.attrname)
+        self.describe = describe
+        self.searchAttribute = searchAttribute
+        if searchAttribute is not None:
+            alsoProvides(self, ISearchableEnumeration)
+
+
+    def __iter__(self):
+        for item in self.query:
+            yield self._makeEnumItem(item)
+
+
+    def __repr__(self):
+        return '<%s %r>' % (type(self).__name__, self.query)
+
+
+    def _makeEnumItem(self, item):
+        """
+        Create an enumeration item for an Axiom item.
+
+        @rtype: L{EnumItem}
+        """
+        return EnumItem(item, self.describe(item), id=unicode(item.storeID))
+
+
+    def _restrict(self, comparison):
+        """
+        Combine a comparison with the query's comparison.
+        """
+        if self.query.comparison is None:
+            return comparison
+        return AND(self.query.comparison, comparison)
+
+
+    def _contains(self, item):
+        """
+        Determine whether the query matches an Axiom item.
+        """
+        tableClass = self.query.tableClass
+        if not isinstance(item, tableClass) or item.store is not self.query.store:
+            return False
+        return self.query.store.findFirst(
+            tableClass,
+            self._restrict(tableClass.storeID == item.storeID)) is not None
+
+
+    # IEnumeration
+
+    def get(self, value):
+        if not isinstance(value, Item) or not self._contains(value):
+            raise InvalidEnumItem(value)
+        return self._makeEnumItem(value)
+
+
+    def getDesc(self, value):
+        try:
+            return self.get(value).desc
+        except InvalidEnumItem:
+            return u''
+
+
+    def getExtra(self, value, extraName, default=None):
+        try:
+            return self.get(value).get(extraName, default)
+        except InvalidEnumItem:
+            return default
+
+
+    def find(self, **names):
+        for res in self.findAll(**names):
+            return res
+        return None
+
+
+    def findAll(self, **names):
+        if not names:
+            raise ValueError('At least one query must be specified')
+
+        if 'id' in names:
+            try:
+                item = self.query.store.getItemByID(int(names['id']))
+            except (ValueError, TypeError, KeyError):
+                return
+            if not self._contains(item):
+                return
+            candidates = [self._makeEnumItem(item)]
+        else:
+            candidates = self
+
+        queries = names.items()
+        for enumItem in candidates:
+            for name, value in queries:
+                if enumItem.get(name) != value:
+                    break
+            else:
+                yield enumItem
+
+
+    def asPairs(self):
+        return [(i.value, i.desc) for i in self]
+
+
+    # ISearchableEnumeration
+
+    def search(self, text, limit):
+        if self.searchAttribute is None:
+            raise ValueError('%r is not searchable' % (self,))
+        items = self.query.store.query(
+            self.query.tableClass,
+            self._restrict(ContainsComparison(self.searchAttribute, text)),
+            sort=self.query.sort,
+            limit=limit)
+        return map(self._makeEnumItem, items)
+
+
+
 class EnumItem(object):
     """
     An enumeration item contained by L{Enum}.
@@ -189,6 +457,10 @@ class EnumItem(object):
     @type hidden: C{bool}
     @ivar hidden: Is this enumeration item hidden?
 
+    @type _enums: C{WeakSet} of L{Enum}
+    @ivar _enums: Enumerations containing this item, whose visible items are
+        invalidated when L{hidden} changes
+
     @type _extra: C{dict} mapping C{str} to values
     @ivar _extra: Mapping of names to values, accessed via L{EnumItem.get}
     """
@@ -200,8 +472,9 @@ class EnumItem(object):
         """
         self.value = value
         self.desc = desc
-        self.hidden = hidden
+        self._hidden = hidden
         self._extra = extra
+        self._enums = WeakSet()
 
 
     def __repr__(self):
@@ -212,6 +485,18 @@ class EnumItem(object):
             self.hidden)
 
 
+    def _getHidden(self):
+        return self._hidden
+
+
+    def _setHidden(self, hidden):
+        self._hidden = hidden
+        for enum in self._enums:
+            enum._version += 1
+
+    hidden = property(_getHidden, _setHidden)
+
+
     def __getattr__(self, name):
         """
         Get an extra value by name.
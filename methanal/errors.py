@@ -1,3 +1,7 @@
+from nevow.athena import LivePageError
+
+
+
 class ConstraintError(ValueError):
     """
     One or more constraints specified in the data model were unmet.
@@ -5,6 +9,29 @@ class ConstraintError(ValueError):
 
 
 
+class ValidationErrors(ConstraintError, LivePageError):
+    """
+    Validation of a model's parameters failed.
+
+    This exception is transported to the client, as
+    C{Methanal.View.ValidationErrors}, when raised from a remote method.
+
+    @type errors: C{dict}
+    @ivar errors: Mapping of parameter names to error messages, or to nested
+        mappings for parameters with sub-models
+    """
+    jsClass = u'Methanal.View.ValidationErrors'
+
+    def __init__(self, errors):
+        ConstraintError.__init__(self, errors)
+        self.errors = errors
+
+
+    def __str__(self):
+        return 'Invalid parameters: %s' % (', '.join(sorted(self.errors)),)
+
+
+
 class InvalidEnumItem(ValueError):
     """
     An invalid enumeration value was specified.
@@ -58,6 +58,41 @@ class IColumn(Interface):
 
 
 
+class IBatchColumn(IColumn):
+    """
+    An L{IColumn} that can extract values and links for many items at once,
+    avoiding per-cell overhead.
+    """
+    def extractValues(model, items):
+        """
+        Extract values for the column from several Items.
+
+        @type model: L{methanal.widgets.Table}
+
+        @type  items: C{list} of L{axiom.item.Item}
+        @param items: Items from which to extract values
+
+        @rtype: C{list}
+        @return: Underlying values for this column, in the same order as
+            C{items}
+        """
+
+
+    def extractLinks(model, items):
+        """
+        Extract URIs for the column from several Items.
+
+        @type model: L{methanal.widgets.Table}
+
+        @type  items: C{list} of L{axiom.item.Item}
+        @param items: Items from which to extract URIs
+
+        @rtype: C{list} of C{unicode}
+        @return: URIs, or C{None}, in the same order as C{items}
+        """
+
+
+
 class IEnumeration(Interface):
     """
     An enumeration.
@@ -114,9 +149,29 @@ class IEnumeration(Interface):
         """
         Find all L{EnumItem}s with matching extra values.
 
-        @param **names: Extra values to match
+        @param **names: Extra values to match, items must match all of them
+
+        @rtype:  C{iterable} of L{EnumItem}
+        """
+
+
+
+class ISearchableEnumeration(IEnumeration):
+    """
+    An enumeration that can be searched for items by their descriptions.
+    """
+    def search(text, limit):
+        """
+        Find the visible L{EnumItem}s whose descriptions contain C{text}.
+
+        @type  text: C{unicode}
+        @param text: Text to search for
+
+        @type  limit: C{int}
+        @param limit: Maximum number of items to find
 
         @rtype:  C{iterable} of L{EnumItem}
+        @return: At most C{limit} matching items, in enumeration order
         """
 
 
@@ -199,7 +199,28 @@ Methanal.Tests.MockBrowser.Element.subclass(
         } else {
             self.rows.splice(index, 0, row);
         }
+        self.appendChild(row);
         return row;
+    },
+
+
+    /**
+     * Remove the row at the given position in this section.
+     */
+    function deleteRow(self, index) {
+        self.removeChild(self.rows[index]);
+    },
+
+
+    function removeChild(self, child) {
+        Methanal.Tests.MockBrowser.MockHTMLTableSectionElement.upcall(
+            self, 'removeChild', child);
+        for (var i = 0; i < self.rows.length; ++i) {
+            if (self.rows[i] === child) {
+                self.rows.splice(i, 1);
+                break;
+            }
+        }
     });
 
 
@@ -213,6 +234,7 @@ Methanal.Tests.MockBrowser.Element.subclass(
         Methanal.Tests.MockBrowser.MockHTMLTableElement.upcall(
             self, '__init__', 'table');
         self.deleteTHead();
+        self.deleteTFoot();
         self.tBodies = [document.createElement('tbody')];
     },
 
@@ -233,6 +255,25 @@ Methanal.Tests.MockBrowser.Element.subclass(
             return self.tHead;
         }
         self.tHead = document.createElement('thead');
+    },
+
+
+    /**
+     * Delete the footer from the table, if one exists.
+     */
+    function deleteTFoot(self) {
+        self.tFoot = null;
+    },
+
+
+    /**
+     * Create a table footer row or return an existing one.
+     */
+    function createTFoot(self) {
+        if (self.tFoot === null) {
+            self.tFoot = document.createElement('tfoot');
+        }
+        return self.tFoot;
     });
 
 
@@ -286,6 +327,8 @@ if (document instanceof Divmod.MockBrowser.Document) {
             'thead', Methanal.Tests.MockBrowser.MockHTMLTableSectionElement);
         document.registerElementTag(
             'tbody', Methanal.Tests.MockBrowser.MockHTMLTableSectionElement);
+        document.registerElementTag(
+            'tfoot', Methanal.Tests.MockBrowser.MockHTMLTableSectionElement);
         document.registerElementTag(
             'tr', Methanal.Tests.MockBrowser.MockHTMLTableRowElement);
     }
@@ -36,4 +36,181 @@ Divmod.UnitTest.TestCase.subclass(
         cache.addHandler(function (x) { return 42; },      ['bar'], ['bar']);
         cache.changed('bar');
         self.assert(self._called);
+    },
+
+
+    /**
+     * Create a chained L{Methanal.View._HandlerCache} over C{self.data}, whose
+     * outputs store the first handler value in C{self.data} and record their
+     * updates in C{self.updates}.
+     */
+    function createChainedCache(self) {
+        self.data = {};
+        self.updates = [];
+
+        function getData(name) {
+            return self.data[name];
+        }
+
+        function update(name, values) {
+            self.updates.push(name);
+            var changed = self.data[name] !== values[0];
+            self.data[name] = values[0];
+            return changed;
+        }
+
+        function isActive(name) {
+            return true;
+        }
+
+        return Methanal.View._HandlerCache(
+            getData, update, isActive, undefined, true);
+    },
+
+
+    /**
+     * Handler functions are only called when their input values change,
+     * unless the cache is refreshed.
+     */
+    function test_memoised(self) {
+        var cache = self.createChainedCache();
+        var calls = 0;
+        cache.addHandler(
+            function (a) {
+                calls++;
+                return a.length;
+            }, ['a'], ['b']);
+        self.data.a = [1, 2];
+
+        cache.refresh({'b': true});
+        self.assertIdentical(calls, 1);
+        self.assertIdentical(self.data.b, 2);
+
+        self.data.a = [1, 2];
+        cache.changed('a');
+        self.assertIdentical(calls, 1);
+
+        self.data.a.push(3);
+        cache.changed('a');
+        self.assertIdentical(calls, 2);
+        self.assertIdentical(self.data.b, 3);
+
+        cache.refresh({'b': true});
+        self.assertIdentical(calls, 3);
+    },
+
+
+    /**
+     * Changes to outputs that are inputs to other handlers are propagated in
+     * dependency order, updating each output once, and propagation stops when
+     * an output does not change.
+     */
+    function test_chained(self) {
+        var cache = self.createChainedCache();
+        function add(x, y) {
+            return x + y;
+        }
+        function identity(x) {
+            return x;
+        }
+        // Add the handlers in reverse dependency order.
+        cache.addHandler(add, ['b', 'c'], ['d']);
+        cache.addHandler(identity, ['b'], ['c']);
+        cache.addHandler(identity, ['a'], ['b']);
+
+        self.data.a = 1;
+        cache.refresh({'b': true, 'c': true, 'd': true});
+        self.assertArraysEqual(self.updates, ['b', 'c', 'd']);
+        self.assertIdentical(self.data.d, 2);
+
+        self.updates = [];
+        self.data.a = 2;
+        self.assertIdentical(cache.changed('a'), true);
+        self.assertArraysEqual(self.updates, ['b', 'c', 'd']);
+        self.assertIdentical(self.data.d, 4);
+
+        self.updates = [];
+        self.assertIdentical(cache.changed('a'), false);
+        self.assertArraysEqual(self.updates, ['b']);
+    },
+
+
+    /**
+     * Handlers that would create a dependency cycle cannot be added to a
+     * chained cache.
+     */
+    function test_cycle(self) {
+        function identity(x) {
+            return x;
+        }
+
+        var cache = self.createChainedCache();
+        cache.addHandler(identity, ['a'], ['b']);
+        cache.addHandler(identity, ['b'], ['c']);
+        self.assertThrows(Methanal.View.HandlerCycleError,
+            function () {
+                cache.addHandler(identity, ['c'], ['a']);
+            });
+        self.assertThrows(Methanal.View.HandlerCycleError,
+            function () {
+                cache.addHandler(identity, ['d'], ['d']);
+            });
+        cache.addHandler(identity, ['a'], ['c']);
+
+        // Validators, for example, depend on their own outputs.
+        cache = Methanal.View._HandlerCache(
+            null, null, null, undefined, false);
+        cache.addHandler(identity, ['a', 'b'], ['a', 'b']);
+        cache.addHandler(identity, ['b'], ['b']);
+    },
+
+
+    /**
+     * Unchaining a cache allows handlers that create a dependency cycle to be
+     * added and stops changes to outputs from being propagated.
+     */
+    function test_unchain(self) {
+        function identity(x) {
+            return x;
+        }
+
+        var cache = self.createChainedCache();
+        cache.addHandler(identity, ['a'], ['b']);
+        cache.addHandler(identity, ['b'], ['c']);
+        cache.unchain();
+        cache.addHandler(identity, ['c'], ['a']);
+
+        self.data.a = 1;
+        cache.changed('a');
+        self.assertArraysEqual(self.updates, ['b']);
+        self.assertIdentical(self.data.b, 1);
+        self.assertIdentical(self.data.c, undefined);
+    },
+
+
+    /**
+     * Changes are propagated in dependency order through a deep chain of
+     * handlers, each handler being updated once.
+     */
+    function test_deepChain(self) {
+        var cache = self.createChainedCache();
+        var calls = 0;
+        function increment(x) {
+            calls++;
+            return x + 1;
+        }
+        var names = [];
+        for (var i = 0; i <= 50; ++i) {
+            names.push('n' + i);
+        }
+        // Add the handlers in reverse dependency order.
+        for (var i = names.length - 1; i > 0; --i) {
+            cache.addHandler(increment, [names[i - 1]], [names[i]]);
+        }
+
+        self.data.n0 = 0;
+        self.assertIdentical(cache.changed('n0'), true);
+        self.assertArraysEqual(self.updates, names.slice(1));
+        self.assertIdentical(self.data.n50, 50);
+        self.assertIdentical(calls, 50);
     });
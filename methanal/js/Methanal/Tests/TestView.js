@@ -126,6 +126,30 @@ Methanal.Tests.Util.TestCase.subclass(
     },
 
 
+    /**
+     * Dependency checkers that form a cycle disable chaining for the form,
+     * instead of failing to load.
+     */
+    function test_depCheckerCycle(self) {
+        var args = {
+            'viewOnly': false};
+        var form = self.createForm(args, [
+            self.createControl({'name': 'a'}),
+            self.createControl({'name': 'b'})]);
+        function identity(x) {
+            return x;
+        }
+        form.addDepChecker(['a'], ['b'], identity);
+        self.assertIdentical(form._depCache.chained, true);
+        form.addDepChecker(['b'], ['a'], identity);
+        self.assertIdentical(form._depCache.chained, false);
+        self.assertThrows(Methanal.View.HandlerError,
+            function () {
+                form.addDepChecker(['a'], ['b'], undefined);
+            });
+    },
+
+
     /**
      * Setting the form valid / invalid enables / disables the actions.
      */
@@ -142,6 +166,37 @@ Methanal.Tests.Util.TestCase.subclass(
     },
 
 
+    /**
+     * Invalid sub forms make the form invalid, without being passed to
+     * L{Methanal.View.LiveForm.setInvalid}.
+     */
+    function test_invalidSubforms(self) {
+        var control = self.createControl({'name': 'a'});
+        var args = {
+            'viewOnly': false};
+        var form = self.createForm(args, [control]);
+        var subform = {
+            'name': 'sub',
+            'valid': true};
+        form.subforms[subform.name] = subform;
+        form.updateSubformValidity(subform);
+        form._refreshValidity();
+        self.assertIdentical(form.valid, true);
+
+        subform.valid = false;
+        form.updateSubformValidity(subform);
+        form._refreshValidity();
+        self.assertIdentical(form.valid, false);
+        self.assertArraysEqual(form.getInvalidControls(), []);
+
+        subform.valid = true;
+        form.updateSubformValidity(subform);
+        form._refreshValidity();
+        self.assertIdentical(form.valid, true);
+        self.assertIdentical(form._invalidSubformCount, 0);
+    },
+
+
     /**
      * Submitting a form calls L{Methanal.View.LiveForm.submitSuccess} upon
      * successful submission and L{Methanal.View.LiveForm.submitFailure} upon
@@ -181,6 +236,51 @@ Methanal.Tests.Util.TestCase.subclass(
     },
 
 
+    /**
+     * Lightweight form elements, rendered without Athena boilerplate, have
+     * their widgets created by the form once it is inserted.
+     */
+    function test_lightweightWidgets(self) {
+        function makeNode(tagName, id, parentNode) {
+            var node = document.createElement(tagName);
+            if (id) {
+                node.id = id;
+            }
+            parentNode.appendChild(node);
+            return node;
+        }
+
+        var form = Methanal.Tests.TestView.MockLiveForm(['a'], {
+            'viewOnly': false,
+            'lightweightWidgets': [
+                [1001, 'Methanal.View.FormRow', []],
+                [1002, 'Methanal.View.TextInput', [
+                    {'name': 'a', 'label': 'A', 'value': 'x'}]]]});
+        var rowNode = makeNode('div', 'athena:1001', form.node);
+        makeNode('span', 'athenaid:1001-error-text', rowNode);
+        var inputNode = makeNode('div', 'athena:1002', rowNode);
+        makeNode('input', null, inputNode);
+        makeNode('span', 'athenaid:1002-displayValue', inputNode);
+        makeNode('span', 'athenaid:1002-error', inputNode);
+
+        try {
+            Methanal.Util.nodeInserted(form);
+            var control = form.getControl('a');
+            var row = Nevow.Athena.Widget.get(rowNode);
+            self.assertIdentical(
+                Nevow.Athena.Widget.get(inputNode.firstChild), control);
+            self.assertIdentical(control.widgetParent, row);
+            self.assertIdentical(row.widgetParent, form);
+            self.assertIdentical(form.getControlValue('a'), 'x');
+            self.assertIdentical(form.fullyLoaded, true);
+            self.assertIdentical(form.lightweightWidgets.length, 0);
+        } finally {
+            delete Nevow.Athena.Widget._athenaWidgets[1001];
+            delete Nevow.Athena.Widget._athenaWidgets[1002];
+        }
+    },
+
+
     /**
      * Visit all C{FormRow}s in C{widgetParent} and return an C{Array} of all
      * active rows.
@@ -595,6 +695,96 @@ Methanal.Tests.TestView.FormInputTestCase.subclass(
 
 
 
+/**
+ * Tests for L{Methanal.View.SearchableSelectInput}.
+ */
+Methanal.Tests.TestView.FormInputTestCase.subclass(
+    Methanal.Tests.TestView, 'TestSearchableSelectInput').methods(
+    function createControl(self, args) {
+        args.minSearchLength = 2;
+        var node = Nevow.Test.WidgetUtil.makeWidgetNode();
+        var control = Methanal.View.SearchableSelectInput(node, args);
+        node.appendChild(document.createElement('input'));
+        node.appendChild(document.createElement('select'));
+        Methanal.Tests.Util.makeWidgetChildNode(control, 'span', 'error');
+        return control;
+    },
+
+
+    /**
+     * Get the values of a select input's options.
+     */
+    function getOptionValues(self, control) {
+        var values = [];
+        var options = control.inputNode.options;
+        for (var i = 0; i < options.length; ++i) {
+            values.push(options[i].value);
+        }
+        return values;
+    },
+
+
+    /**
+     * Searching replaces the input's options with the search results,
+     * keeping the selected option and indicating truncated results. Search
+     * text shorter than C{minSearchLength} is not searched for.
+     */
+    function test_search(self) {
+        self.testControl({value: ''},
+            function (control) {
+                var calls = [];
+                control.callRemote = function (methodName, text) {
+                    calls.push([methodName, text]);
+                    return Divmod.Defer.succeed({
+                        options: [['v2', 'd2'], ['v3', 'd3']],
+                        truncated: true});
+                };
+                control.append('v1', 'd1');
+                control.setValue('v1');
+
+                control.searchNode.value = 'd';
+                control.onSearchKeyUp(control.searchNode);
+                self.assertIdentical(calls.length, 0);
+
+                control.searchNode.value = 'da';
+                control.onSearchKeyUp(control.searchNode);
+                self.assertIdentical(calls.length, 1);
+                self.assertArraysEqual(calls[0], ['search', 'da']);
+
+                self.assertArraysEqual(
+                    self.getOptionValues(control), ['v1', 'v2', 'v3', '']);
+                self.assertIdentical(
+                    control.inputNode.options[3].disabled, true);
+                self.assertIdentical(control.getValue(), 'v1');
+            });
+    },
+
+
+    /**
+     * Results of searches other than the most recent one are discarded.
+     */
+    function test_staleSearch(self) {
+        self.testControl({value: ''},
+            function (control) {
+                var results = [];
+                control.callRemote = function (methodName, text) {
+                    var d = Divmod.Defer.Deferred();
+                    results.push(d);
+                    return d;
+                };
+                control.search('first');
+                control.search('second');
+                results[1].callback({options: [['v2', 'd2']], truncated: false});
+                results[0].callback({options: [['v1', 'd1']], truncated: false});
+                // The placeholder option is inserted since nothing is
+                // selected.
+                self.assertArraysEqual(
+                    self.getOptionValues(control), ['', 'v2']);
+            });
+    });
+
+
+
 /**
  * Mimic Internet Explorer's broken C{HTMLSelectElement.add} behaviour.
  */
@@ -673,6 +863,168 @@ Methanal.Tests.TestView.BaseTestTextInput.subclass(
     },
 
 
+    /**
+     * When L{Methanal.View.LiveForm.deltaSubmission} is C{true}, only the
+     * values of inputs modified since the last successful submission are
+     * submitted.
+     */
+    function test_deltaSubmission(self) {
+        var controls = [
+            self.createControl({name: 'a', label: 'A', value: 'a'}),
+            self.createControl({name: 'b', label: 'B', value: 'b'})];
+        self.testControls(controls, function (controls) {
+            var form = controls[0].getForm();
+            var submitted = [];
+            form.deltaSubmission = true;
+            form.callRemote = function (methodName, data) {
+                submitted.push(data);
+                return Divmod.Defer.succeed(null);
+            };
+
+            form.submit();
+            controls[0].setValue('A');
+            form.valueChanged(controls[0]);
+            form.submit();
+            form.submit();
+            self.assertIdentical(submitted.length, 3);
+            self.assertArraysEqual(
+                Methanal.Util.map(Methanal.Util.repr, submitted),
+                ['{}', '{"a": "A"}', '{}']);
+
+            form.deltaSubmission = false;
+            form.submit();
+            self.assertIdentical(
+                Methanal.Util.repr(submitted[3]), '{"a": "A", "b": "b"}');
+        });
+    },
+
+
+    /**
+     * Inputs changed while a delta submission is in progress, and inputs
+     * whose submission failed, are submitted again. Resetting the form after
+     * a failed submission submits all inputs.
+     */
+    function test_deltaSubmissionInProgress(self) {
+        var controls = [
+            self.createControl({name: 'a', label: 'A', value: 'a'}),
+            self.createControl({name: 'b', label: 'B', value: 'b'})];
+        self.testControls(controls, function (controls) {
+            var form = controls[0].getForm();
+            var submitted = [];
+            var results = [];
+            form.deltaSubmission = true;
+            form.callRemote = function (methodName, data) {
+                submitted.push(Methanal.Util.repr(data));
+                var d = Divmod.Defer.Deferred();
+                results.push(d);
+                return d;
+            };
+            form.setError = function (failure) {};
+
+            controls[0].setValue('A');
+            form.valueChanged(controls[0]);
+            form.submit();
+            controls[0].setValue('AA');
+            form.valueChanged(controls[0]);
+            results[0].callback(null);
+            form.submit();
+            self.assertArraysEqual(submitted, ['{"a": "A"}', '{"a": "AA"}']);
+
+            controls[1].setValue('B');
+            form.valueChanged(controls[1]);
+            results[1].errback(new Error('Submission failed'));
+            form.submit();
+            self.assertIdentical(submitted[2], '{"a": "AA", "b": "B"}');
+
+            results[2].errback(new Error('Submission failed'));
+            form.reset();
+            form.submit();
+            self.assertIdentical(submitted[3], '{"a": "a", "b": "b"}');
+        });
+    },
+
+
+    /**
+     * Server-side validation errors, from a failed form submission, are all
+     * set on the relevant inputs at once, marking the form invalid. Changing
+     * the value of an input clears its server-side error.
+     */
+    function test_submissionValidationErrors(self) {
+        var controls = [
+            self.createControl({name: 'a', label: 'A', value: null}),
+            self.createControl({name: 'b', label: 'B', value: null})];
+        self.testControls(controls, function (controls) {
+            var controlA = controls[0];
+            var controlB = controls[1];
+            var form = controlA.getForm();
+            form.callRemote = function (methodName, data) {
+                return Divmod.Defer.fail(Methanal.View.ValidationErrors({
+                    'a': 'Bad a',
+                    'b': 'Bad b',
+                    'unknown': 'Ignored'}));
+            };
+
+            form.submit();
+            self.assertIdentical(controlA.error, 'Bad a');
+            self.assertIdentical(controlB.error, 'Bad b');
+            self.assertIdentical(form.valid, false);
+            self.assertIdentical(form.actions._disabled, true);
+
+            form.valueChanged(controlA);
+            self.assertIdentical(controlA.error, null);
+            self.assertIdentical(form.valid, false);
+            form.valueChanged(controlB);
+            self.assertIdentical(controlB.error, null);
+            self.assertIdentical(form.valid, true);
+        });
+    },
+
+
+    /**
+     * The form tracks its invalid inputs as their errors and activity
+     * change, passing them to L{Methanal.View.LiveForm.setInvalid} in the
+     * order they were loaded.
+     */
+    function test_invalidControls(self) {
+        var controls = [
+            self.createControl({name: 'a', label: 'A', value: 'a'}),
+            self.createControl({name: 'b', label: 'B', value: 'b'})];
+        self.testControls(controls, function (controls) {
+            var a = controls[0];
+            var b = controls[1];
+            var form = a.getForm();
+            var invalidControls = null;
+            form.setInvalid = function (controls) {
+                invalidControls = controls;
+                form.valid = false;
+            };
+
+            b.setError('Bad b');
+            form._refreshValidity();
+            self.assertArraysEqual(invalidControls, [b]);
+            a.setError('Bad a');
+            form._refreshValidity();
+            self.assertArraysEqual(invalidControls, [a, b]);
+
+            // Errors on inactive inputs do not count, reactivating an input
+            // validates it again.
+            b.setActive(false);
+            self.assertArraysEqual(invalidControls, [a]);
+            b.setError('Bad b');
+            self.assertArraysEqual(form.getInvalidControls(), [a]);
+            b.setActive(true);
+            self.assertIdentical(b.error, null);
+            self.assertArraysEqual(form.getInvalidControls(), [a]);
+
+            a.clearError();
+            form._refreshValidity();
+            self.assertArraysEqual(form.getInvalidControls(), []);
+            self.assertIdentical(form._invalidControlCount, 0);
+            self.assertIdentical(form.valid, true);
+        });
+    },
+
+
     /**
      * L{Methanal.View.TextInput.setValue} sets the node value to a string.
      */
@@ -17,6 +17,68 @@ Methanal.Widgets.Action.subclass(
 
 
 
+/**
+ * A L{Methanal.Widgets.DynamicTab} that logs content fetches, to its parent's
+ * C{fetchLog}, instead of fetching content.
+ */
+Methanal.Widgets.DynamicTab.subclass(
+    Methanal.Tests.TestWidgets, 'MockDynamicTab').methods(
+        function fetchContent(self, nodeID) {
+            self.fetchResult = Divmod.Defer.Deferred();
+            self.widgetParent.fetchLog.push(self.id);
+            return self.fetchResult;
+        });
+
+
+
+/**
+ * A L{Methanal.Widgets.DemandTab}, with a cache policy, that logs content
+ * fetches, to its parent's C{fetchLog}, instead of fetching content.
+ */
+Methanal.Widgets.DemandTab.subclass(
+    Methanal.Tests.TestWidgets, 'MockDemandTab').methods(
+        function __init__(self, node, args) {
+            Methanal.Tests.TestWidgets.MockDemandTab.upcall(
+                self, '__init__', node, args);
+            self.cachePolicy = {'ttl': null, 'revalidate': false};
+        },
+
+
+        function fetchContent(self, nodeID) {
+            self.widgetParent.fetchLog.push(self.id);
+            self.fetchResult = Divmod.Defer.Deferred();
+            return self.fetchResult;
+        });
+
+
+
+/**
+ * A L{Methanal.Widgets.DemandTab}, with a cache policy, that logs its remote
+ * calls to its parent's C{remoteCalls}. Their results are added to its
+ * parent's C{remoteResults}. Content is not displayed.
+ */
+Methanal.Widgets.DemandTab.subclass(
+    Methanal.Tests.TestWidgets, 'RemoteDemandTab').methods(
+        function __init__(self, node, args) {
+            Methanal.Tests.TestWidgets.RemoteDemandTab.upcall(
+                self, '__init__', node, args);
+            self.cachePolicy = {'ttl': null, 'revalidate': false};
+        },
+
+
+        function setContent(self, nodeID, content) {
+        },
+
+
+        function callRemote(self, methodName, nodeID) {
+            var d = Divmod.Defer.Deferred();
+            self.widgetParent.remoteCalls.push(self.id + ':' + methodName);
+            self.widgetParent.remoteResults.push(d);
+            return d;
+        });
+
+
+
 /**
  * Tests for L{Methanal.Widgets.Table}.
  */
@@ -147,6 +209,244 @@ Methanal.Tests.Util.TestCase.subclass(
         var table = self.createTable(columnValues, actions);
 
         self.assertHasNoActions(table);
+    },
+
+
+    /**
+     * Enacting an action calls the remote action method with the row's key,
+     * rather than its position.
+     */
+    function test_enactActionWithRowKey(self) {
+        var calls = [];
+        var tableWidget = {
+            'callRemote': function () {
+                calls.push(Array.prototype.slice.call(arguments));
+                return Divmod.Defer.succeed(null);
+            }};
+        var action = Methanal.Widgets.Action('foo', 'Foo');
+        action._enact(tableWidget, Methanal.Widgets.Row(3, {}, 42));
+        self.assertIdentical(calls.length, 1);
+        self.assertArraysEqual(calls[0], ['performAction', 'foo', 42]);
+    });
+
+
+
+/**
+ * Tests for L{Methanal.Widgets.Table} with windowed rows.
+ */
+Methanal.Tests.Util.TestCase.subclass(
+    Methanal.Tests.TestWidgets, 'WindowedTableTest').methods(
+    /**
+     * Create rows for a single text column.
+     */
+    function makeRows(self, offset, count) {
+        var rows = [];
+        for (var i = offset; i < offset + count; ++i) {
+            var cells = {'col1': Methanal.Widgets.Cell('row' + i, null)};
+            rows.push(Methanal.Widgets.Row(i, cells));
+        }
+        return rows;
+    },
+
+
+    /**
+     * Create a windowed L{Methanal.Widgets.Table} widget whose
+     * C{getRowRange} remote method is served from C{totalRows} fake rows.
+     */
+    function createTable(self, pageSize, totalRows) {
+        var node = Nevow.Test.WidgetUtil.makeWidgetNode();
+        var args = {
+            'columns': [Methanal.Widgets.TextColumn('col1', 'title')],
+            'rows': self.makeRows(0, Math.min(pageSize, totalRows)),
+            'pageSize': pageSize,
+            'totalRows': totalRows};
+        var table = Methanal.Widgets.Table(node, args);
+        table.remoteCalls = [];
+        table.callRemote = function (name, offset, limit) {
+            table.remoteCalls.push([name, offset, limit]);
+            limit = Math.min(limit, totalRows - offset);
+            return Divmod.Defer.succeed(
+                [self.makeRows(offset, limit), totalRows]);
+        };
+        Methanal.Tests.Util.makeWidgetChildNode(table, 'table');
+        document.body.appendChild(node);
+        Methanal.Util.nodeInserted(table);
+        return table;
+    },
+
+
+    /**
+     * Only the initial page of rows is populated and a footer is shown while
+     * more rows are available.
+     */
+    function test_initialPage(self) {
+        var table = self.createTable(2, 5);
+        self.assertIdentical(table.getRows().length, 2);
+        self.assertIdentical(table.loadedRows, 2);
+        self.assertIdentical(table.hasMoreRows(), true);
+        self.assertIdentical(table._tableNode.tFoot.rows.length, 1);
+    },
+
+
+    /**
+     * L{Methanal.Widgets.Table.loadMoreRows} fetches and appends the next
+     * page of rows until there are no more rows, at which point the footer
+     * is removed.
+     */
+    function test_loadMoreRows(self) {
+        var table = self.createTable(2, 5);
+        var counts = [];
+        function _loaded(count) {
+            counts.push(count);
+        }
+        table.loadMoreRows().addCallback(_loaded);
+        table.loadMoreRows().addCallback(_loaded);
+        table.loadMoreRows().addCallback(_loaded);
+        self.assertArraysEqual(counts, [2, 1, 0]);
+        self.assertIdentical(table.remoteCalls.length, 2);
+        self.assertArraysEqual(table.remoteCalls[1], ['getRowRange', 4, 2]);
+        self.assertIdentical(table.getRows().length, 5);
+        self.assertIdentical(table.hasMoreRows(), false);
+        self.assertIdentical(table._tableNode.tFoot, null);
+    },
+
+
+    /**
+     * L{Methanal.Widgets.Table.sortBy} sorts the rows on the server,
+     * repopulates the table and marks the sorted column header.
+     */
+    function test_sortBy(self) {
+        var table = self.createTable(2, 5);
+        table.sortable = true;
+        table.callRemote = function (name, columnID, ascending) {
+            table.remoteCalls.push([name, columnID, ascending]);
+            return Divmod.Defer.succeed([self.makeRows(0, 2), 5]);
+        };
+        table.sortBy('col1', false);
+        self.assertArraysEqual(
+            table.remoteCalls[0], ['sortRows', 'col1', false]);
+        self.assertIdentical(table.sortColumnID, 'col1');
+        self.assertIdentical(table.sortAscending, false);
+        self.assertIdentical(table.loadedRows, 2);
+        var headerCell = table._tableNode.tHead.rows[0].cells[0];
+        self.assertIdentical(
+            Methanal.Util.containsElementClass(
+                headerCell, 'methanal-table-sort-descending'),
+            true);
+        self.assertThrows(Methanal.Widgets.InvalidColumn,
+            function () {
+                table.sortBy('nope', true);
+            });
+    },
+
+
+    /**
+     * Get the C{col1} values of each row, by their current position.
+     */
+    function getRowValues(self, table) {
+        var values = [];
+        for (var i = 0; i < table._rowKeys.length; ++i) {
+            var row = table.getRowByKey(table._rowKeys[i]);
+            self.assertIdentical(row.id, i);
+            values.push(row.cells['col1'].value);
+        }
+        return values;
+    },
+
+
+    /**
+     * L{Methanal.Widgets.Table.updateRows} removes, updates and inserts rows
+     * by their keys and renumbers the resulting rows.
+     */
+    function test_updateRows(self) {
+        var table = self.createTable(5, 5);
+        var updated = Methanal.Widgets.Row(
+            3, {'col1': Methanal.Widgets.Cell('changed', null)}, 3);
+        var inserted = Methanal.Widgets.Row(
+            0, {'col1': Methanal.Widgets.Cell('new', null)}, 'new');
+        table.updateRows([1], [updated], [[0, inserted]], 5);
+        self.assertArraysEqual(
+            self.getRowValues(table),
+            ['new', 'row0', 'row2', 'changed', 'row4']);
+        self.assertIdentical(table.getRows().length, 5);
+        self.assertIdentical(table.loadedRows, 5);
+
+        table.updateRows([0, 2, 3, 4, 'new'], [], [], 0);
+        self.assertIdentical(table.loadedRows, 0);
+        self.assertIdentical(table.getRows().length, 1);
+        table.updateRows([], [], [[0, inserted]], 1);
+        self.assertArraysEqual(self.getRowValues(table), ['new']);
+        self.assertIdentical(table.getRows().length, 1);
+    },
+
+
+    /**
+     * L{Methanal.Widgets.Table.getRowIndex} finds rows by their key, through
+     * insertions and removals, without searching the rows for every key
+     * changed by L{Methanal.Widgets.Table.updateRows}.
+     */
+    function test_getRowIndex(self) {
+        var table = self.createTable(5, 5);
+        var rebuilds = 0;
+        var rebuildRowIndices = table._rebuildRowIndices;
+        table._rebuildRowIndices = function () {
+            rebuilds++;
+            rebuildRowIndices.call(table);
+        };
+        self.assertIdentical(table.getRowIndex(4), 4);
+        self.assertIdentical(table.getRowIndex('nope'), -1);
+        self.assertIdentical(rebuilds, 0);
+
+        var updated = Methanal.Widgets.Row(
+            3, {'col1': Methanal.Widgets.Cell('changed', null)}, 3);
+        table.updateRows([0, 2], [updated], [], 3);
+        self.assertIdentical(rebuilds, 1);
+        self.assertIdentical(table.getRowIndex(0), -1);
+        self.assertIdentical(table.getRowIndex(1), 0);
+        self.assertIdentical(table.getRowIndex(3), 1);
+        self.assertIdentical(table.getRowIndex(4), 2);
+
+        table.removeRow(0);
+        self.assertIdentical(table.getRowIndex(3), 0);
+        self.assertIdentical(table.getRowIndex(1), -1);
+        self.assertIdentical(rebuilds, 2);
+    },
+
+
+    /**
+     * L{Methanal.Widgets.RowSet} constructs rows from column arrays and can
+     * be used to populate a table.
+     */
+    function test_rowSet(self) {
+        var rowSet = Methanal.Widgets.RowSet(
+            [0, 1], [10, 11], {'col1': ['a', 'b']}, {'col1': [null, '/b']});
+        self.assertIdentical(rowSet.length, 2);
+        var row = rowSet.getRow(1);
+        self.assertIdentical(row.id, 1);
+        self.assertIdentical(row.key, 11);
+        self.assertIdentical(row.cells['col1'].value, 'b');
+        self.assertIdentical(row.cells['col1'].link, '/b');
+
+        var table = self.createTable(2, 2);
+        table.repopulate(Methanal.Widgets.RowSet(
+            [0, 1], [10, 11], {'col1': ['a', 'b']}, {}));
+        self.assertIdentical(table.loadedRows, 2);
+        self.assertIdentical(table.getRowByKey(10).cells['col1'].link, null);
+        self.assertArraysEqual(self.getRowValues(table), ['a', 'b']);
+    },
+
+
+    /**
+     * Repopulating a windowed table resets the loaded row count.
+     */
+    function test_repopulate(self) {
+        var table = self.createTable(2, 5);
+        table.loadMoreRows();
+        table.repopulate(self.makeRows(0, 2), 3);
+        self.assertIdentical(table.getRows().length, 2);
+        self.assertIdentical(table.loadedRows, 2);
+        self.assertIdentical(table.totalRows, 3);
+        self.assertIdentical(table.hasMoreRows(), true);
     });
 
 
@@ -446,7 +746,8 @@ Methanal.Tests.Util.TestCase.subclass(
 
         var node = Nevow.Test.WidgetUtil.makeWidgetNode();
         var tabView = Methanal.Widgets.TabView(
-            node, _tabIDs, _tabGroups, topLevel || false, _makeThrobber);
+            node, _tabIDs, _tabGroups, topLevel || false, null, false,
+            _makeThrobber);
         Methanal.Tests.Util.makeWidgetChildNode(tabView, 'div', 'throbber');
         Methanal.Tests.Util.makeWidgetChildNode(tabView, 'ul', 'labels');
         Methanal.Tests.Util.makeWidgetChildNode(tabView, 'div', 'contents');
@@ -460,9 +761,10 @@ Methanal.Tests.Util.TestCase.subclass(
      * Create a L{Methanal.Widgets.Tab} as child of C{tabView}.
      */
     function createTab(self, tabView, id, title, selected /*=false*/,
-                       group /*=null*/) {
+                       group /*=null*/, tabClass /*=Methanal.Widgets.Tab*/) {
         var node = Nevow.Test.WidgetUtil.makeWidgetNode();
-        var tab = Methanal.Widgets.Tab(node, {
+        tabClass = tabClass || Methanal.Widgets.Tab;
+        var tab = tabClass(node, {
             'id': id,
             'title': title,
             'selected': selected || false,
@@ -475,6 +777,129 @@ Methanal.Tests.Util.TestCase.subclass(
     },
 
 
+    /**
+     * Content fetches requested while a TabView is loading are scheduled once
+     * it has finished loading, with the content of the selected tab being
+     * fetched first.
+     */
+    function test_fetchScheduling(self) {
+        var tabView = self.createTabView(['tab1', 'tab2', 'tab3']);
+        tabView.scheduler = Methanal.Widgets.FetchScheduler(1);
+        tabView.fetchLog = [];
+        function createTab(id, selected) {
+            return self.createTab(
+                tabView, id, id, selected, null,
+                Methanal.Tests.TestWidgets.MockDynamicTab);
+        }
+        var tab1 = createTab('tab1', false);
+        var tab2 = createTab('tab2', true);
+        self.assertArraysEqual(tabView.fetchLog, []);
+
+        var tab3 = createTab('tab3', false);
+        self.assertArraysEqual(tabView.fetchLog, ['tab2']);
+        tab2.fetchResult.callback(null);
+        self.assertArraysEqual(tabView.fetchLog, ['tab2', 'tab1']);
+
+        // Selecting a tab promotes its queued fetch.
+        tabView.selectTab(tab3);
+        tab1.fetchResult.callback(null);
+        self.assertArraysEqual(tabView.fetchLog, ['tab2', 'tab1', 'tab3']);
+    },
+
+
+    /**
+     * Prefetching TabViews prefetch the content of tabs adjacent to the
+     * selected tab, once the selected tab's content has been fetched.
+     */
+    function test_prefetch(self) {
+        var tabView = self.createTabView(['tab1', 'tab2', 'tab3']);
+        tabView.scheduler = Methanal.Widgets.FetchScheduler(2);
+        tabView.prefetch = true;
+        tabView.fetchLog = [];
+        var tabClass = Methanal.Tests.TestWidgets.MockDemandTab;
+        var tab1 = self.createTab(
+            tabView, 'tab1', 'Tab 1', true, null, tabClass);
+        self.createTab(tabView, 'tab2', 'Tab 2', false, null, tabClass);
+        self.createTab(tabView, 'tab3', 'Tab 3', false, null, tabClass);
+        self.assertArraysEqual(tabView.fetchLog, ['tab1']);
+        tab1.fetchResult.callback(null);
+        self.assertArraysEqual(tabView.fetchLog, ['tab1', 'tab2']);
+    },
+
+
+    /**
+     * Selecting a tab whose content is being prefetched does not fetch its
+     * content again.
+     */
+    function test_selectDuringPrefetch(self) {
+        var tabView = self.createTabView(['tab1', 'tab2']);
+        tabView.scheduler = Methanal.Widgets.FetchScheduler(2);
+        tabView.prefetch = true;
+        tabView.remoteCalls = [];
+        tabView.remoteResults = [];
+        var tabClass = Methanal.Tests.TestWidgets.RemoteDemandTab;
+        self.createTab(tabView, 'tab1', 'Tab 1', true, null, tabClass);
+        var tab2 = self.createTab(
+            tabView, 'tab2', 'Tab 2', false, null, tabClass);
+        self.assertArraysEqual(tabView.remoteCalls, ['tab1:getContent']);
+
+        tabView.remoteResults[0].callback(null);
+        self.assertArraysEqual(
+            tabView.remoteCalls, ['tab1:getContent', 'tab2:getContent']);
+        tabView.selectTab(tab2);
+        self.assertArraysEqual(
+            tabView.remoteCalls, ['tab1:getContent', 'tab2:getContent']);
+    },
+
+
+    /**
+     * Removing a tab cancels its queued content fetch.
+     */
+    function test_removeCancelsFetch(self) {
+        var tabView = self.createTabView(['tab1', 'tab2']);
+        tabView.scheduler = Methanal.Widgets.FetchScheduler(1);
+        tabView.fetchLog = [];
+        var tab1 = self.createTab(
+            tabView, 'tab1', 'Tab 1', true, null,
+            Methanal.Tests.TestWidgets.MockDynamicTab);
+        var tab2 = self.createTab(
+            tabView, 'tab2', 'Tab 2', false, null,
+            Methanal.Tests.TestWidgets.MockDynamicTab);
+        self.assertArraysEqual(tabView.fetchLog, ['tab1']);
+        var fetched = false;
+        tab2.fetchContent = function (nodeID) {
+            fetched = true;
+            return Divmod.Defer.succeed(null);
+        };
+
+        tabView.removeTab(tab2);
+        tab1.fetchResult.callback(null);
+        self.assertIdentical(fetched, false);
+        self.assertIdentical(tabView.scheduler.active, 0);
+    },
+
+
+    /**
+     * TabViews with their own concurrency limit use their own scheduler,
+     * other TabViews share the page-wide scheduler.
+     */
+    function test_maxConcurrentFetches(self) {
+        var node = Nevow.Test.WidgetUtil.makeWidgetNode();
+        var tabView = Methanal.Widgets.TabView(
+            node, {}, {}, false, 5, false, function () {
+                return null;
+            });
+        self.assertIdentical(tabView.scheduler.maxConcurrent, 5);
+        var pageScheduler = Methanal.Widgets.getFetchScheduler();
+        self.assertNotIdentical(tabView.scheduler, pageScheduler);
+        self.assertIdentical(
+            pageScheduler.maxConcurrent,
+            Methanal.Widgets.DEFAULT_MAX_CONCURRENT_FETCHES);
+        self.assertIdentical(
+            self.createTabView([]).scheduler, pageScheduler);
+    },
+
+
     /**
      * Calling L{Methanal.Widgets.TabView.loadedUp} removes the specified tab
      * from the loading queue and creates a label for it.
@@ -659,20 +1084,344 @@ Methanal.Tests.Util.TestCase.subclass(
         tabView.showTab(tab3);
         self.assertNodeVisible(node);
 
-        // Stub out Nevow.Athena.Widget.detach.
-        function detach() {}
-
-        tab2.detach = detach;
         tabView.removeTab(tab2);
         self.assertNodeVisible(node);
 
-        tab3.detach = detach;
         tabView.removeTab(tab3);
         self.assertNodeHidden(node);
     });
 
 
 
+/**
+ * Tests for L{Methanal.Widgets.FetchScheduler}.
+ */
+Methanal.Tests.Util.TestCase.subclass(
+    Methanal.Tests.TestWidgets, 'FetchSchedulerTest').methods(
+    function setUp(self) {
+        self.scheduler = Methanal.Widgets.FetchScheduler(2);
+        self.started = [];
+        self.results = {};
+    },
+
+
+    /**
+     * Schedule a fetch, for C{key}, that records when it starts and finishes
+     * when C{self.results[key]} is fired.
+     */
+    function schedule(self, key, priority) {
+        return self.scheduler.schedule(key, priority, function () {
+            self.started.push(key);
+            self.results[key] = Divmod.Defer.Deferred();
+            return self.results[key];
+        });
+    },
+
+
+    /**
+     * No more than C{maxConcurrent} fetches run at the same time, queued
+     * fetches are started as running fetches finish and their results are
+     * passed on.
+     */
+    function test_concurrency(self) {
+        var normal = Methanal.Widgets.PRIORITY_NORMAL;
+        var result = null;
+        self.schedule('a', normal).addCallback(function (r) {
+            result = r;
+        });
+        self.schedule('b', normal);
+        self.schedule('c', normal);
+        self.assertArraysEqual(self.started, ['a', 'b']);
+        self.assertIdentical(self.scheduler.active, 2);
+
+        self.results['a'].callback(42);
+        self.assertIdentical(result, 42);
+        self.assertArraysEqual(self.started, ['a', 'b', 'c']);
+        self.assertIdentical(self.scheduler.active, 2);
+
+        self.results['b'].errback(new Error('Fetch failed'));
+        self.results['c'].callback(null);
+        self.assertIdentical(self.scheduler.active, 0);
+    },
+
+
+    /**
+     * Queued fetches are started in order of priority, and then in the order
+     * they were scheduled. Promoting or rescheduling a queued fetch raises its
+     * priority.
+     */
+    function test_priority(self) {
+        var W = Methanal.Widgets;
+        self.scheduler.maxConcurrent = 1;
+        self.schedule('a', W.PRIORITY_NORMAL);
+        self.schedule('b', W.PRIORITY_NORMAL);
+        self.schedule('c', W.PRIORITY_NORMAL);
+        self.schedule('d', W.PRIORITY_NORMAL);
+        self.schedule('e', W.PRIORITY_NORMAL);
+        self.assertIdentical(
+            self.scheduler.promote('d', W.PRIORITY_VISIBLE), true);
+        self.assertIdentical(
+            self.scheduler.promote('z', W.PRIORITY_VISIBLE), false);
+        self.schedule('e', W.PRIORITY_VISIBLE);
+
+        var keys = ['a', 'd', 'e', 'b', 'c'];
+        for (var i = 0; i < keys.length; ++i) {
+            self.results[keys[i]].callback(null);
+        }
+        self.assertArraysEqual(self.started, keys);
+    },
+
+
+    /**
+     * Prefetches only start when no other fetches are running or queued.
+     */
+    function test_prefetch(self) {
+        var W = Methanal.Widgets;
+        self.schedule('a', W.PRIORITY_NORMAL);
+        self.schedule('b', W.PRIORITY_PREFETCH);
+        self.assertArraysEqual(self.started, ['a']);
+        self.results['a'].callback(null);
+        self.assertArraysEqual(self.started, ['a', 'b']);
+    },
+
+
+    /**
+     * Cancelling a queued fetch removes it from the queue, cancelling a
+     * running fetch discards its result. Either way the fetch's deferreds
+     * fire with C{null}.
+     */
+    function test_cancel(self) {
+        var normal = Methanal.Widgets.PRIORITY_NORMAL;
+        self.scheduler.maxConcurrent = 1;
+        var results = [];
+        function _result(r) {
+            results.push(r);
+        }
+        self.schedule('a', normal).addCallback(_result);
+        self.schedule('b', normal).addCallback(_result);
+        self.schedule('c', normal);
+
+        self.assertIdentical(self.scheduler.cancel('b'), 1);
+        self.assertIdentical(self.scheduler.cancel('a'), 1);
+        self.assertIdentical(self.scheduler.cancel('z'), 0);
+        self.assertArraysEqual(results, [null, null]);
+
+        self.results['a'].errback(new Error('Fetch failed'));
+        self.assertArraysEqual(results, [null, null]);
+        self.assertArraysEqual(self.started, ['a', 'c']);
+    },
+
+
+    /**
+     * L{Methanal.Widgets.FetchScheduler.cancelFor} cancels fetches for a
+     * widget and its descendants.
+     */
+    function test_cancelFor(self) {
+        var normal = Methanal.Widgets.PRIORITY_NORMAL;
+        self.scheduler.maxConcurrent = 1;
+        var parent = {'widgetParent': null};
+        var child = {'widgetParent': parent};
+        var other = {'widgetParent': null};
+        self.schedule('a', normal);
+        self.schedule(child, normal);
+        self.schedule(other, normal);
+        self.schedule(parent, normal);
+
+        self.assertIdentical(self.scheduler.cancelFor(parent), 2);
+        self.results['a'].callback(null);
+        self.assertArraysEqual(self.started, ['a', other]);
+    },
+
+
+    /**
+     * Raising the concurrency limit starts queued fetches.
+     */
+    function test_setMaxConcurrent(self) {
+        var normal = Methanal.Widgets.PRIORITY_NORMAL;
+        self.scheduler.maxConcurrent = 1;
+        self.schedule('a', normal);
+        self.schedule('b', normal);
+        self.assertArraysEqual(self.started, ['a']);
+        self.scheduler.setMaxConcurrent(2);
+        self.assertArraysEqual(self.started, ['a', 'b']);
+    });
+
+
+
+Methanal.Tests.Util.TestCase.subclass(
+    Methanal.Tests.TestWidgets, 'CachedContentTest').methods(
+    /**
+     * Create a L{Methanal.Widgets.DemandTab} with C{cachePolicy}, whose remote
+     * calls are logged and answered from C{self.current}.
+     */
+    function createTab(self, cachePolicy) {
+        var node = Nevow.Test.WidgetUtil.makeWidgetNode();
+        var tab = Methanal.Widgets.DemandTab(node, {
+            'id': 'tab',
+            'title': 'Tab',
+            'selected': false,
+            'group': null,
+            'cachePolicy': cachePolicy});
+        Methanal.Tests.Util.makeWidgetChildNode(tab, 'div', 'content');
+        document.body.appendChild(node);
+
+        self.time = 0;
+        self.current = true;
+        self.calls = [];
+        tab.now = function () {
+            return self.time;
+        };
+        tab.callRemote = function (methodName, nodeID) {
+            self.calls.push(methodName);
+            if (methodName === 'isContentCurrent') {
+                return Divmod.Defer.succeed(self.current);
+            }
+            return Divmod.Defer.succeed(self.calls.length);
+        };
+        self.released = [];
+        tab.addChildWidgetFromWidgetInfo = function (widgetInfo) {
+            var widget = {
+                'node': document.createElement('div'),
+                'childWidgets': [],
+                'widgetInfo': widgetInfo};
+            widget._athenaDetachClient = function () {
+                self.released.push(widget.widgetInfo);
+            };
+            return Divmod.Defer.succeed(widget);
+        };
+        tab.widgetParent = {
+            'fullyLoaded': true,
+            'fetchTabContent': function (tab) {
+                tab.fetchScheduledContent();
+            }};
+        return tab;
+    },
+
+
+    /**
+     * Assert that selecting C{tab} makes the remote calls in C{calls}.
+     */
+    function assertSelectCalls(self, tab, calls) {
+        self.calls = [];
+        tab.select();
+        self.assertArraysEqual(self.calls, calls);
+    },
+
+
+    /**
+     * Without a cache policy, content is fetched every time the tab is
+     * selected.
+     */
+    function test_noCachePolicy(self) {
+        var tab = self.createTab(null);
+        self.assertSelectCalls(tab, ['getContent']);
+        var widget = tab._currentRemoteWidgets['content'];
+        self.assertSelectCalls(tab, ['getContent']);
+        self.assertNotIdentical(tab._currentRemoteWidgets['content'], widget);
+    },
+
+
+    /**
+     * Superseded content widgets, and the results of superseded fetches, are
+     * only detached locally, since the server has already released them.
+     */
+    function test_releaseSuperseded(self) {
+        var tab = self.createTab(null);
+        tab.select();
+        self.assertArraysEqual(self.released, []);
+        tab.select();
+        self.assertArraysEqual(self.released, [1]);
+
+        var results = [];
+        tab.callRemote = function (methodName, nodeID) {
+            self.calls.push(methodName);
+            var d = Divmod.Defer.Deferred();
+            results.push(d);
+            return d;
+        };
+        self.calls = [];
+        tab.updateContent();
+        tab.updateContent();
+        results[1].callback(4);
+        results[0].callback(3);
+        self.assertArraysEqual(self.calls, ['getContent', 'getContent']);
+        self.assertArraysEqual(self.released, [1, 2, 3]);
+        self.assertIdentical(
+            tab._currentRemoteWidgets['content'].widgetInfo, 4);
+    },
+
+
+    /**
+     * When the server has no new content, such as for superseded fetches, the
+     * current content is kept and shown again.
+     */
+    function test_noNewContent(self) {
+        var tab = self.createTab(null);
+        tab.select();
+        var widget = tab._currentRemoteWidgets['content'];
+
+        tab.callRemote = function (methodName, nodeID) {
+            return Divmod.Defer.succeed(null);
+        };
+        tab.select();
+        self.assertIdentical(tab._currentRemoteWidgets['content'], widget);
+        self.assertIdentical(
+            tab.nodeById('content').firstChild, widget.node);
+        self.assertArraysEqual(self.released, []);
+    },
+
+
+    /**
+     * Content is reused, without contacting the server, until it is
+     * invalidated when caching forever.
+     */
+    function test_cacheForever(self) {
+        var tab = self.createTab({'ttl': null, 'revalidate': false});
+        self.assertSelectCalls(tab, ['getContent']);
+        var widget = tab._currentRemoteWidgets['content'];
+        self.time = 1000000;
+        self.assertSelectCalls(tab, []);
+        self.assertIdentical(tab._currentRemoteWidgets['content'], widget);
+
+        tab.invalidateContent('content');
+        self.assertSelectCalls(tab, ['getContent']);
+        self.assertNotIdentical(tab._currentRemoteWidgets['content'], widget);
+    },
+
+
+    /**
+     * Content is reused until its TTL has passed.
+     */
+    function test_ttl(self) {
+        var tab = self.createTab({'ttl': 10, 'revalidate': false});
+        self.assertSelectCalls(tab, ['getContent']);
+        self.time = 9999;
+        self.assertSelectCalls(tab, []);
+        self.time = 10000;
+        self.assertSelectCalls(tab, ['getContent']);
+        self.time = 15000;
+        self.assertSelectCalls(tab, []);
+    },
+
+
+    /**
+     * When revalidating, the server is asked whether content is current
+     * before it is reused, and fresh content is fetched if it is not.
+     */
+    function test_revalidate(self) {
+        var tab = self.createTab({'ttl': null, 'revalidate': true});
+        self.assertSelectCalls(tab, ['getContent']);
+        var widget = tab._currentRemoteWidgets['content'];
+        self.assertSelectCalls(tab, ['isContentCurrent']);
+        self.assertIdentical(tab._currentRemoteWidgets['content'], widget);
+
+        self.current = false;
+        self.assertSelectCalls(tab, ['isContentCurrent', 'getContent']);
+        self.assertNotIdentical(tab._currentRemoteWidgets['content'], widget);
+    });
+
+
+
 /**
  * L{Methanal.Widgets.ModalDialogForm} mock implementation.
  */
@@ -759,3 +1508,90 @@ Methanal.Tests.Util.TestCase.subclass(
         self.assertIdentical(closed, false,
             'Dialog was closed');
     });
+
+
+
+/**
+ * Tests for L{Methanal.Widgets.LookupForm}.
+ */
+Methanal.Tests.Util.TestCase.subclass(
+    Methanal.Tests.TestWidgets, 'LookupFormTest').methods(
+    /**
+     * Create a L{Methanal.Widgets.LookupForm} whose lookup widget records
+     * remote calls and scheduled calls, and whose results are recorded
+     * instead of displayed.
+     */
+    function createForm(self, debounce) {
+        var node = Nevow.Test.WidgetUtil.makeWidgetNode();
+        var form = Methanal.Widgets.LookupForm(node, []);
+        form.remoteCalls = [];
+        form.scheduledCalls = [];
+        form.results = [];
+        form.widgetParent = {
+            'debounce': debounce,
+            'callRemote': function (methodName, data) {
+                var d = Divmod.Defer.Deferred();
+                form.remoteCalls.push([data, d]);
+                return d;
+            },
+            'callLater': function (delay, fn) {
+                var call = {'fn': fn, 'cancelled': false};
+                form.scheduledCalls.push(call);
+                return call;
+            },
+            'cancelCall': function (call) {
+                call.cancelled = true;
+            }};
+        form.setResults = function (values, selectedValue, more) {
+            form.results.push([values, more]);
+        };
+        form.exitSearchingState = function () {};
+        return form;
+    },
+
+
+    /**
+     * Lookups are only performed once the criteria have remained unchanged
+     * for the debounce delay, replacing previously scheduled lookups.
+     */
+    function test_debounce(self) {
+        var form = self.createForm(300);
+        form.scheduleLookup({'a': 1});
+        form.scheduleLookup({'a': 2});
+        self.assertIdentical(form.remoteCalls.length, 0);
+        self.assertIdentical(form.scheduledCalls.length, 2);
+        self.assertIdentical(form.scheduledCalls[0].cancelled, true);
+        self.assertIdentical(form.scheduledCalls[1].cancelled, false);
+
+        form.scheduledCalls[1].fn();
+        self.assertIdentical(form.remoteCalls.length, 1);
+        self.assertIdentical(form.remoteCalls[0][0].a, 2);
+
+        form.remoteCalls[0][1].callback({'results': ['r'], 'more': true});
+        self.assertIdentical(form.results.length, 1);
+        self.assertArraysEqual(form.results[0][0], ['r']);
+        self.assertIdentical(form.results[0][1], true);
+    },
+
+
+    /**
+     * Without a debounce delay lookups are performed immediately, and the
+     * results of lookups other than the most recent one are discarded.
+     */
+    function test_staleResults(self) {
+        var form = self.createForm(null);
+        form.scheduleLookup({'a': 1});
+        form.scheduleLookup({'a': 2});
+        self.assertIdentical(form.scheduledCalls.length, 0);
+        self.assertIdentical(form.remoteCalls.length, 2);
+
+        form.remoteCalls[1][1].callback({'results': ['second'], 'more': false});
+        form.remoteCalls[0][1].callback({'results': ['first'], 'more': false});
+        self.assertIdentical(form.results.length, 1);
+        self.assertArraysEqual(form.results[0][0], ['second']);
+
+        form.scheduleLookup({'a': 3});
+        form.cancelLookup();
+        form.remoteCalls[2][1].callback({'results': ['third'], 'more': false});
+        self.assertIdentical(form.results.length, 1);
+    });
@@ -409,12 +409,15 @@ Methanal.Util.detachWidget = function detachWidget(widget) {
  * Call a widget's (and all child widgets') C{nodeInserted} method.
  */
 Methanal.Util.nodeInserted = function nodeInserted(widget) {
+    // Widgets that create children in "nodeInserted" are responsible for
+    // inserting them.
+    var childWidgets = widget.childWidgets.slice();
     if (widget.nodeInserted !== undefined) {
         widget.nodeInserted();
     }
 
-    for (var i = 0; i < widget.childWidgets.length; ++i) {
-        Methanal.Util.nodeInserted(widget.childWidgets[i]);
+    for (var i = 0; i < childWidgets.length; ++i) {
+        Methanal.Util.nodeInserted(childWidgets[i]);
     }
 };
 
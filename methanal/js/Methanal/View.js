@@ -26,9 +26,56 @@ Methanal.View.buildInputNodeMapping = function buildInputNodeMapping(node) {
 
 
 
+/**
+ * Determine whether two sets of handler input values are the same.
+ *
+ * Primitive values are compared by identity and arrays element-wise, other
+ * objects are never considered the same since they may have been mutated.
+ *
+ * @rtype: C{Boolean}
+ */
+Methanal.View._sameValues = function _sameValues(a, b) {
+    if (a instanceof Array && b instanceof Array) {
+        if (a.length !== b.length) {
+            return false;
+        }
+        for (var i = 0; i < a.length; ++i) {
+            if (!Methanal.View._sameValues(a[i], b[i])) {
+                return false;
+            }
+        }
+        return true;
+    }
+    if ((typeof a === 'object' && a !== null) || typeof a === 'function') {
+        return false;
+    }
+    return a === b;
+};
+
+
+
+/**
+ * Copy handler input values, so that they can be compared to later values.
+ */
+Methanal.View._copyValues = function _copyValues(values) {
+    if (!(values instanceof Array)) {
+        return values;
+    }
+    var copy = [];
+    for (var i = 0; i < values.length; ++i) {
+        copy.push(Methanal.View._copyValues(values[i]));
+    }
+    return copy;
+};
+
+
+
 /**
  * Validator / dependency handler.
  *
+ * Handler function results are memoised on the values, and activity, of the
+ * handler's inputs.
+ *
  * @type handlerID: C{Integer}
  * @ivar handlerID: Handler identifier
  *
@@ -45,6 +92,9 @@ Methanal.View.buildInputNodeMapping = function buildInputNodeMapping(node) {
  *
  * @type outputs: C{Array} of C{String}
  * @ivar outputs: Names of form outputs
+ *
+ * @ivar _inputValues: Input values L{value} was last computed from, C{null}
+ *     if an input was inactive, or C{undefined} if it has never been computed
  */
 Divmod.Class.subclass(Methanal.View, '_Handler').methods(
     function __init__(self, handlerID, cache, fn, inputs, outputs) {
@@ -53,21 +103,52 @@ Divmod.Class.subclass(Methanal.View, '_Handler').methods(
         self.fn = fn;
         self.inputs = inputs;
         self.outputs = outputs;
+        self._inputValues = undefined;
     },
 
 
-    function update(self) {
+    /**
+     * Get the current input values.
+     *
+     * @return: C{Array} of input values, or C{null} if any input is inactive
+     */
+    function _getInputValues(self) {
         var values = [];
         for (var j = 0; j < self.inputs.length; ++j) {
             var name = self.inputs[j];
             if (!self.cache.isActive(name)) {
-                self.value = self.cache.failureValue;
-                return;
+                return null;
             }
-            var value = self.cache.getData(name);
-            values.push(value);
+            values.push(self.cache.getData(name));
+        }
+        return values;
+    },
+
+
+    /**
+     * Update L{value}.
+     *
+     * The handler function is only called if the input values have changed
+     * since it was last called, or C{force} is true.
+     *
+     * @rtype: C{Boolean}
+     * @return: Did L{value} change?
+     */
+    function update(self, force /*=false*/) {
+        var values = self._getInputValues();
+        if (!force && self._inputValues !== undefined &&
+            Methanal.View._sameValues(values, self._inputValues)) {
+            return false;
         }
-        self.value = self.fn.apply(null, values);
+        self._inputValues = Methanal.View._copyValues(values);
+
+        var oldValue = self.value;
+        if (values === null) {
+            self.value = self.cache.failureValue;
+        } else {
+            self.value = self.fn.apply(null, values);
+        }
+        return self.value !== oldValue;
     });
 
 
@@ -79,6 +160,16 @@ Divmod.Error.subclass(Methanal.View, 'HandlerError').methods(
 
 
 
+/**
+ * Adding a handler would create a dependency cycle.
+ */
+Methanal.View.HandlerError.subclass(Methanal.View, 'HandlerCycleError').methods(
+    function toString(self) {
+        return 'HandlerCycleError: ' + self.message;
+    });
+
+
+
 /**
  * Getting a control by name failed because the control does not exist.
  */
@@ -92,6 +183,17 @@ Divmod.Error.subclass(Methanal.View, 'MissingControlError').methods(
 /**
  * Management of L{Methanal.View._Handler}s.
  *
+ * Handlers and controls form a dependency graph: a handler depends on its
+ * input controls and an output control depends on the handlers that output to
+ * it. Changes are propagated through the graph in dependency order, each
+ * handler and output control being updated at most once per change, and only
+ * the handlers affected by a change are updated.
+ *
+ * In a chained cache an output control that reports a change, from L{update},
+ * is itself treated as a changed input, allowing handlers to depend on the
+ * outputs of other handlers. Handlers that would create a dependency cycle
+ * cannot be added to a chained cache.
+ *
  * @type _inputToHandlers: C{object} mapping C{String} to {object}
  * @ivar _inputTohandlers: Mapping of input control names to sets of handler
  *     identifiers
@@ -103,6 +205,10 @@ Divmod.Error.subclass(Methanal.View, 'MissingControlError').methods(
  * @type _handlers: C{object} mapping C{Integer} to L{Methanal.View._Handler}
  * @ivar _handlers: Mapping of handler identifiers to handler instances
  *
+ * @type _ranks: C{object} mapping C{String} to C{Integer}
+ * @ivar _ranks: Mapping of graph node keys, see L{_key}, to their position in
+ *     dependency order, or C{null} if it needs to be computed
+ *
  * @type getData: C{function} taking C{String}
  * @ivar getData: The function for getting the value of a control by name
  *
@@ -118,40 +224,93 @@ Divmod.Error.subclass(Methanal.View, 'MissingControlError').methods(
  *
  * @ivar failureValue: Value to use for L{_Handler.value} when an inactive
  *     control is encountered during an update.
+ *
+ * @type chained: C{Boolean}
+ * @ivar chained: Propagate changes reported by L{update} to the handlers that
+ *     take the output control as an input?
  */
 Divmod.Class.subclass(Methanal.View, '_HandlerCache').methods(
-    function __init__(self, getData, update, isActive, failureValue) {
+    function __init__(self, getData, update, isActive, failureValue,
+                      chained /*=false*/) {
         self.getData = getData;
         self.update = update;
         self.isActive = isActive;
         self.failureValue = failureValue;
+        self.chained = !!chained;
         self._inputToHandlers = {};
         self._outputToHandlers = {};
         self._handlers = {};
         self._handlerID = 0;
+        self._ranks = null;
     },
 
 
     /**
-     * Call L{self.update} for the specified output controls and handler values.
+     * Get the graph node key for a handler or control.
+     */
+    function _key(self, handlerID, name) {
+        if (handlerID !== null) {
+            return 'h' + handlerID;
+        }
+        return 'c' + name;
+    },
+
+
+    /**
+     * Compute the dependency order of handlers and output controls.
      *
-     * @type  outputs: C{object} mapping C{String}
-     * @param outputs: Names of output controls to update; only the keys are
-     *     relevant
+     * Handlers are ordered after their input controls and output controls
+     * after the handlers that output to them. Without chaining all handlers
+     * are ordered before all output controls.
      */
-    function _updateOutputs(self, outputs) {
-        var updated = false;
-        for (var output in outputs) {
-            var results = [];
-            for (var handlerID in self._outputToHandlers[output]) {
-                var handler = self._handlers[handlerID];
-                results.push(handler.value);
+    function _computeRanks(self) {
+        var ranks = {};
+
+        function _handlerRank(handlerID) {
+            var key = self._key(handlerID, null);
+            if (ranks[key] === undefined) {
+                var rank = 0;
+                if (self.chained) {
+                    var inputs = self._handlers[handlerID].inputs;
+                    for (var i = 0; i < inputs.length; ++i) {
+                        rank = Math.max(rank, _controlRank(inputs[i]) + 1);
+                    }
+                }
+                ranks[key] = rank;
             }
-            if (results.length > 0) {
-                updated |= self.update(output, results);
+            return ranks[key];
+        }
+
+        function _controlRank(name) {
+            var key = self._key(null, name);
+            if (ranks[key] === undefined) {
+                var rank = 0;
+                for (var handlerID in self._outputToHandlers[name]) {
+                    rank = Math.max(rank, _handlerRank(handlerID) + 1);
+                }
+                ranks[key] = rank;
             }
+            return ranks[key];
         }
-        return updated;
+
+        for (var handlerID in self._handlers) {
+            _handlerRank(handlerID);
+        }
+        for (var name in self._outputToHandlers) {
+            _controlRank(name);
+        }
+        return ranks;
+    },
+
+
+    /**
+     * Get the position of a graph node in dependency order.
+     */
+    function _getRank(self, key) {
+        if (self._ranks === null) {
+            self._ranks = self._computeRanks();
+        }
+        return self._ranks[key] || 0;
     },
 
 
@@ -176,6 +335,40 @@ Divmod.Class.subclass(Methanal.View, '_HandlerCache').methods(
     },
 
 
+    /**
+     * Determine whether a handler, with C{inputs} and C{outputs}, would create
+     * a dependency cycle.
+     *
+     * @rtype: C{Boolean}
+     */
+    function _createsCycle(self, inputs, outputs) {
+        var inputSet = {};
+        for (var i = 0; i < inputs.length; ++i) {
+            inputSet[inputs[i]] = true;
+        }
+
+        var visited = {};
+        var stack = outputs.slice();
+        while (stack.length > 0) {
+            var name = stack.pop();
+            if (inputSet[name]) {
+                return true;
+            }
+            if (visited[name]) {
+                continue;
+            }
+            visited[name] = true;
+            for (var handlerID in self._inputToHandlers[name]) {
+                var handlerOutputs = self._handlers[handlerID].outputs;
+                for (var j = 0; j < handlerOutputs.length; ++j) {
+                    stack.push(handlerOutputs[j]);
+                }
+            }
+        }
+        return false;
+    },
+
+
     /**
      * Add a new handler.
      *
@@ -188,15 +381,24 @@ Divmod.Class.subclass(Methanal.View, '_HandlerCache').methods(
      *
      * @type  outputs: C{Array} of C{String}
      * @param outputs: Sequence of control names of output controls
+     *
+     * @raise Methanal.View.HandlerCycleError: If this is a chained cache and
+     *     the handler would create a dependency cycle
      */
     function addHandler(self, fn, inputs, outputs) {
+        var repr = Methanal.Util.repr;
         if (fn === undefined) {
-            var repr = Methanal.Util.repr;
             throw Methanal.View.HandlerError(
                 'Specified handler function is not defined (inputs: ' +
                 repr(inputs) + '; outputs: ' + repr(outputs));
         }
 
+        if (self.chained && self._createsCycle(inputs, outputs)) {
+            throw Methanal.View.HandlerCycleError(
+                'Handler creates a dependency cycle (inputs: ' +
+                repr(inputs) + '; outputs: ' + repr(outputs));
+        }
+
         var handler = Methanal.View._Handler(
             self._handlerID, self, fn, inputs, outputs);
 
@@ -205,24 +407,151 @@ Divmod.Class.subclass(Methanal.View, '_HandlerCache').methods(
 
         self._handlers[self._handlerID] = handler;
         self._handlerID += 1;
+        self._ranks = null;
+    },
+
+
+    /**
+     * Stop propagating changes reported by L{update}, allowing handlers that
+     * create a dependency cycle to be added.
+     */
+    function unchain(self) {
+        self.chained = false;
+        self._ranks = null;
+    },
+
+
+    /**
+     * Create an empty set of pending updates.
+     *
+     * C{items} maps graph node keys to pending updates and C{buckets} holds
+     * the keys of pending updates, in the order they were added, indexed by
+     * their rank.
+     */
+    function _newPending(self) {
+        return {
+            'items': {},
+            'buckets': []};
+    },
+
+
+    /**
+     * Add a handler, or output control, to a set of pending updates.
+     *
+     * @param pending: Pending updates, see L{_newPending}
+     *
+     * @type  direct: C{Boolean}
+     * @param direct: Should a handler's outputs be updated even if its value
+     *     did not change?
+     */
+    function _addPending(self, pending, handlerID, name, direct) {
+        var key = self._key(handlerID, name);
+        var item = pending.items[key];
+        if (item === undefined) {
+            item = pending.items[key] = {
+                'handlerID': handlerID,
+                'name': name,
+                'direct': false};
+            var rank = self._getRank(key);
+            var bucket = pending.buckets[rank];
+            if (bucket === undefined) {
+                bucket = pending.buckets[rank] = [];
+            }
+            bucket.push(key);
+        }
+        item.direct = item.direct || direct;
+    },
+
+
+    /**
+     * Update pending handlers and output controls, in dependency order.
+     *
+     * Updates only ever add pending updates of a higher rank, so each rank
+     * is visited once.
+     *
+     * @type  force: C{Boolean}
+     * @param force: Call handler functions even if their input values have not
+     *     changed?
+     *
+     * @rtype:  C{Boolean}
+     * @return: Did any changes in the outputs occur during the updates?
+     */
+    function _propagate(self, pending, force) {
+        var updated = false;
+        var buckets = pending.buckets;
+        for (var rank = 0; rank < buckets.length; ++rank) {
+            var bucket = buckets[rank];
+            if (bucket === undefined) {
+                continue;
+            }
+            for (var n = 0; n < bucket.length; ++n) {
+                var key = bucket[n];
+                var item = pending.items[key];
+                delete pending.items[key];
+
+                if (item.handlerID !== null) {
+                    var handler = self._handlers[item.handlerID];
+                    var valueChanged = handler.update(force);
+                    if (valueChanged || item.direct) {
+                        for (var i = 0; i < handler.outputs.length; ++i) {
+                            self._addPending(
+                                pending, null, handler.outputs[i], false);
+                        }
+                    }
+                } else {
+                    var results = [];
+                    for (var handlerID in self._outputToHandlers[item.name]) {
+                        results.push(self._handlers[handlerID].value);
+                    }
+                    if (results.length > 0 &&
+                        self.update(item.name, results)) {
+                        updated = true;
+                        if (self.chained) {
+                            for (var handlerID in
+                                 self._inputToHandlers[item.name]) {
+                                self._addPending(
+                                    pending, handlerID, null, false);
+                            }
+                        }
+                    }
+                }
+            }
+        }
+        return updated;
     },
 
 
     /**
      * Ensure all specified output controls are updated.
+     *
+     * All handler functions are called, regardless of whether their inputs
+     * have changed.
+     *
+     * @type  outputs: C{object} mapping C{String}
+     * @param outputs: Names of output controls to update; only the keys are
+     *     relevant
      */
     function refresh(self, outputs) {
+        var pending = self._newPending();
         for (var handlerID in self._handlers) {
-            self._handlers[handlerID].update();
+            self._addPending(pending, handlerID, null, false);
         }
-
-        self._updateOutputs(outputs);
+        for (var output in outputs) {
+            if (self._outputToHandlers[output] !== undefined) {
+                self._addPending(pending, null, output, false);
+            }
+        }
+        self._propagate(pending, true);
     },
 
 
     /**
      * Update relevant output controls when an input control has changed.
      *
+     * The outputs of the handlers taking C{input} are always updated, other
+     * handlers and outputs are only updated if something they depend on
+     * changed.
+     *
      * @type  input: C{String}
      * @param input: Input control name
      *
@@ -230,17 +559,11 @@ Divmod.Class.subclass(Methanal.View, '_HandlerCache').methods(
      * @return: Did any changes in the outputs occur during the updates?
      */
     function changed(self, input) {
-        var handlers = self._inputToHandlers[input];
-        var outputs = {};
-        for (var handlerID in handlers) {
-            var handler = self._handlers[handlerID];
-            handler.update();
-            for (var i = 0; i < handler.outputs.length; ++i) {
-                outputs[handler.outputs[i]] = 1;
-            }
+        var pending = self._newPending();
+        for (var handlerID in self._inputToHandlers[input]) {
+            self._addPending(pending, handlerID, null, true);
         }
-
-        return self._updateOutputs(outputs);
+        return self._propagate(pending, false);
     });
 
 
@@ -261,6 +584,31 @@ Divmod.Error.subclass(Methanal.View, 'UnexpectedControl');
 
 
 
+/**
+ * Server-side validation of submitted form data failed.
+ *
+ * @type errors: C{object} mapping C{String} to C{String} or C{object}
+ * @ivar errors: Mapping of parameter names to error messages, or to nested
+ *     mappings for sub-forms
+ */
+Divmod.Error.subclass(Methanal.View, 'ValidationErrors').methods(
+    function __init__(self, errors) {
+        var names = [];
+        for (var name in errors) {
+            names.push(name);
+        }
+        Methanal.View.ValidationErrors.upcall(
+            self, '__init__', 'Invalid parameters: ' + names.join(', '));
+        self.errors = errors;
+    },
+
+
+    function toString(self) {
+        return 'ValidationErrors: ' + self.message;
+    });
+
+
+
 /**
  * Visit descendant L{Methanal.View.FormRow} widgets.
  *
@@ -314,6 +662,15 @@ Methanal.View.visitRows = function visitRows(widgetParent, fn) {
  * @type subforms: C{object} mapping C{String} to L{Methanal.View.FormBehaviour}
  * @ivar subforms: Mapping of form names to sub forms. Do not use this!
  *
+ * @type _invalidControls: C{object} mapping C{String} to
+ *     L{Methanal.View.FormInput}
+ * @ivar _invalidControls: Mapping of names to active form inputs with errors,
+ *     maintained by L{updateControlValidity}
+ *
+ * @type _invalidSubforms: C{object} mapping C{String} to C{boolean}
+ * @ivar _invalidSubforms: Names of invalid sub forms, maintained by
+ *     L{updateSubformValidity}
+ *
  * @type fullyLoaded: C{boolean}
  * @ivar fullyLoaded: Have all the form inputs reported that they're finished
  *     loading?
@@ -378,6 +735,12 @@ Nevow.Athena.Widget.subclass(Methanal.View, 'FormBehaviour').methods(
         self._frozen = 0;
         self.controls = {};
         self.subforms = {};
+        self._invalidControls = {};
+        self._invalidControlCount = 0;
+        self._invalidSubforms = {};
+        self._invalidSubformCount = 0;
+        self._controlOrder = {};
+        self._controlCount = 0;
 
         function getData(name) {
             return self.getControlValue(name);
@@ -397,7 +760,8 @@ Nevow.Athena.Widget.subclass(Methanal.View, 'FormBehaviour').methods(
             getData,
             function (name, values) { return self._depUpdate(name, values); },
             isActive,
-            false);
+            false,
+            true);
 
         self.controlsLoaded = false;
         self.fullyLoaded = false;
@@ -436,35 +800,95 @@ Nevow.Athena.Widget.subclass(Methanal.View, 'FormBehaviour').methods(
 
 
     /**
-     * Refresh the validity of the form, based on the states of form inputs and
-     * sub-forms. View-only forms do not have their validity refreshed.
+     * Update the form's record of whether a form input is invalid.
+     *
+     * Form inputs are invalid when they are active and have an error, this
+     * should be called whenever either of those change.
+     *
+     * @type  control: L{Methanal.View.FormInput}
      */
-    function _refreshValidity(self) {
-        if (self.viewOnly || self._frozen > 0) {
+    function updateControlValidity(self, control) {
+        var name = control.name;
+        if (self.controls[name] !== control) {
             return;
         }
+        if (self._controlOrder[name] === undefined) {
+            self._controlOrder[name] = self._controlCount++;
+        }
 
-        var invalidControls = [];
-        for (var controlName in self.controls) {
-            var control = self.getControl(controlName);
-            if (control.active && control.error) {
-                invalidControls.push(control);
-            }
+        var invalid = !!(control.active && control.error);
+        var wasInvalid = self._invalidControls[name] !== undefined;
+        if (invalid && !wasInvalid) {
+            self._invalidControls[name] = control;
+            self._invalidControlCount++;
+        } else if (!invalid && wasInvalid) {
+            delete self._invalidControls[name];
+            self._invalidControlCount--;
         }
+    },
+
 
-        if (invalidControls.length) {
-            self.setInvalid(invalidControls);
+    /**
+     * Update the form's record of whether a sub form is invalid.
+     *
+     * This should be called whenever the sub form's validity changes.
+     *
+     * @type  subform: L{Methanal.View.FormBehaviour}
+     */
+    function updateSubformValidity(self, subform) {
+        var name = subform.name;
+        if (self.subforms[name] !== subform) {
             return;
         }
 
-        for (var name in self.subforms) {
-            if (!self.subforms[name].valid) {
-                self.setInvalid();
-                return;
-            }
+        var wasInvalid = self._invalidSubforms[name] !== undefined;
+        if (!subform.valid && !wasInvalid) {
+            self._invalidSubforms[name] = true;
+            self._invalidSubformCount++;
+        } else if (subform.valid && wasInvalid) {
+            delete self._invalidSubforms[name];
+            self._invalidSubformCount--;
+        }
+    },
+
+
+    /**
+     * Get the invalid form inputs.
+     *
+     * @rtype: C{Array} of L{Methanal.View.FormInput}
+     * @return: Active form inputs with errors, in the order they were loaded
+     */
+    function getInvalidControls(self) {
+        var invalidControls = [];
+        for (var name in self._invalidControls) {
+            invalidControls.push(self._invalidControls[name]);
         }
+        invalidControls.sort(function (a, b) {
+            return self._controlOrder[a.name] - self._controlOrder[b.name];
+        });
+        return invalidControls;
+    },
 
-        self.setValid();
+
+    /**
+     * Refresh the validity of the form, based on the states of form inputs and
+     * sub-forms. View-only forms do not have their validity refreshed.
+     *
+     * Invalid form inputs and sub forms are tracked as their state changes, so
+     * this does not need to examine every form input.
+     */
+    function _refreshValidity(self) {
+        if (self.viewOnly || self._frozen > 0) {
+            return;
+        }
+
+        if (self._invalidControlCount > 0) {
+            self.setInvalid(self.getInvalidControls());
+        } else if (self._invalidSubformCount > 0) {
+            self.setInvalid();
+        } else {
+            self.setValid();
+        }
     },
 
 
@@ -668,8 +1092,15 @@ Nevow.Athena.Widget.subclass(Methanal.View, 'FormBehaviour').methods(
 
     /**
      * An event that is called when a form input's value is changed.
+     *
+     * Errors reported by the server for C{control} are cleared, since they
+     * applied to its previous value.
      */
     function valueChanged(self, control) {
+        if (control.serverError) {
+            control.serverError = false;
+            control.clearError();
+        }
         var depsChanged = self._depCache.changed(control.name);
         self.validate(control);
         if (depsChanged) {
@@ -678,6 +1109,41 @@ Nevow.Athena.Widget.subclass(Methanal.View, 'FormBehaviour').methods(
     },
 
 
+    /**
+     * Set errors, reported by the server, on form inputs and sub-forms.
+     *
+     * Errors for names that do not correspond to an input or sub-form of this
+     * form are ignored.
+     *
+     * @type  errors: C{object} mapping C{String} to C{String} or C{object}
+     * @param errors: Mapping of input names to error messages, or sub-form
+     *     names to nested mappings
+     *
+     * @rtype: C{Array} of L{Methanal.View.FormInput}
+     * @return: Inputs that had errors set
+     */
+    function setServerErrors(self, errors) {
+        var invalidControls = [];
+        self.freeze();
+        for (var name in errors) {
+            var error = errors[name];
+            if (typeof error === 'string') {
+                var control = self.controls[name];
+                if (control !== undefined) {
+                    control.setError(error);
+                    control.serverError = true;
+                    invalidControls.push(control);
+                }
+            } else if (self.subforms[name] !== undefined) {
+                invalidControls = invalidControls.concat(
+                    self.subforms[name].setServerErrors(error));
+            }
+        }
+        self.thaw();
+        return invalidControls;
+    },
+
+
     /**
      * Update the validator cache for C{control} and refresh the form validity.
      */
@@ -711,9 +1177,23 @@ Nevow.Athena.Widget.subclass(Methanal.View, 'FormBehaviour').methods(
      * be made visible if L{fn} indicates that a dependency is met.
      *
      * Use L{addDepCheckers} to attach more than one "checker" at a time.
+     *
+     * Dependency checkers are chained, allowing a checker to depend on the
+     * outputs of other checkers, unless a checker creates a dependency cycle,
+     * in which case chaining is disabled for the form.
      */
     function addDepChecker(self, inputNames, outputNames, fn) {
-        self._depCache.addHandler(fn, inputNames, outputNames);
+        try {
+            self._depCache.addHandler(fn, inputNames, outputNames);
+        } catch (e) {
+            if (!(e instanceof Methanal.View.HandlerCycleError)) {
+                throw e;
+            }
+            Divmod.msg(e.toString() + '; dependency checkers for ' +
+                       self.toString() + ' will not be chained');
+            self._depCache.unchain();
+            self._depCache.addHandler(fn, inputNames, outputNames);
+        }
     },
 
 
@@ -987,6 +1467,15 @@ Nevow.Athena.Widget.subclass(Methanal.View, 'ActionContainer').methods(
  * @ivar hideValidationErrorIndicator: Hide the validation error indicator for
  *     this form? Defaults to C{false}.
  *
+ * @type deltaSubmission: C{boolean}
+ * @ivar deltaSubmission: Only submit the values of inputs modified since the
+ *     form was loaded or last successfully submitted? Defaults to C{false}.
+ *
+ * @type lightweightWidgets: C{Array}
+ * @ivar lightweightWidgets: C{[athenaID, className, initArgs]} for each
+ *     lightweight form element whose widget must be created by this form,
+ *     parents before children
+ *
  * @type controlNames: C{object} of C{String}
  * @ivar controlNames: Names of form inputs as a mapping
  *
@@ -1016,6 +1505,10 @@ Methanal.View.FormBehaviour.subclass(Methanal.View, 'LiveForm').methods(
         self.viewOnly = args.viewOnly;
         self.hideModificationIndicator = args.hideModificationIndicator;
         self.hideValidationErrorIndicator = args.hideValidationErrorIndicator;
+        self.deltaSubmission = !!args.deltaSubmission;
+        self.lightweightWidgets = args.lightweightWidgets || [];
+        self._modifiedControls = {};
+        self._submitted = false;
         if (!(controlNames instanceof Array)) {
             throw new Error('"controlNames" must be an Array of control names');
         }
@@ -1033,6 +1526,66 @@ Methanal.View.FormBehaviour.subclass(Methanal.View, 'LiveForm').methods(
         self._validationErrorTooltip = Methanal.Util.Tooltip(
             self.node, null, 'top', 'error-tooltip submission-error-tooltip ' +
                                     'form-validation-error-tooltip');
+        self.createLightweightWidgets();
+    },
+
+
+    /**
+     * Find a descendant DOM node by its Athena identifier.
+     */
+    function _findWidgetNode(self, athenaID) {
+        var id = Nevow.Athena.Widget.translateAthenaID(athenaID);
+        function _find(node) {
+            var childNodes = node.childNodes;
+            for (var i = 0; i < childNodes.length; ++i) {
+                var child = childNodes[i];
+                if (child.id === id) {
+                    return child;
+                }
+                var result = _find(child);
+                if (result !== null) {
+                    return result;
+                }
+            }
+            return null;
+        }
+        return _find(self.node);
+    },
+
+
+    /**
+     * Create the widgets for lightweight form elements.
+     *
+     * Lightweight elements are rendered as plain markup, their widgets are
+     * created and inserted here, the same way Athena would create them.
+     * Events on lightweight nodes are dispatched to their widgets as usual.
+     */
+    function createLightweightWidgets(self) {
+        var widgets = self.lightweightWidgets;
+        self.lightweightWidgets = [];
+        for (var i = 0; i < widgets.length; ++i) {
+            var athenaID = widgets[i][0];
+            var widgetClass = Divmod.namedAny(widgets[i][1]);
+            var node = self._findWidgetNode(athenaID);
+            if (node === null) {
+                throw new Error(
+                    'No node for lightweight widget ' + athenaID);
+            }
+            var widget = widgetClass.apply(null, [node].concat(widgets[i][2]));
+            Nevow.Athena.Widget._athenaWidgets[athenaID] = widget;
+            var parentNode = Nevow.Athena.nodeByDOM(node.parentNode);
+            var widgetParent = self;
+            if (parentNode !== self.node) {
+                widgetParent = Nevow.Athena.Widget.get(parentNode);
+            }
+            widgetParent.addChildWidget(widget);
+            if (widget.loaded !== undefined) {
+                widget.loaded();
+            }
+            if (widget.nodeInserted !== undefined) {
+                widget.nodeInserted();
+            }
+        }
     },
 
 
@@ -1085,8 +1638,14 @@ Methanal.View.FormBehaviour.subclass(Methanal.View, 'LiveForm').methods(
      * Reset form inputs to their initial values.
      */
     function reset(self) {
+        self._modifiedControls = {};
         for (var name in self.controls) {
             self.getControl(name).reset();
+            if (self._submitted) {
+                // The initial value may differ from what was last submitted,
+                // even if that submission failed.
+                self._modifiedControls[name] = true;
+            }
         }
         self.refresh();
         // XXX: This isn't strictly correct since the initial values are not
@@ -1097,6 +1656,30 @@ Methanal.View.FormBehaviour.subclass(Methanal.View, 'LiveForm').methods(
     },
 
 
+    /**
+     * Gather the values of form inputs and sub-forms to submit.
+     *
+     * If L{deltaSubmission} is C{true} only the values of inputs modified
+     * since the form was loaded or last successfully submitted are gathered;
+     * sub-forms are always gathered in full.
+     *
+     * @rtype: C{object} mapping C{String} to values
+     */
+    function getSubmissionData(self) {
+        var data = {};
+        for (var name in self.controls) {
+            if (!self.deltaSubmission || self._modifiedControls[name]) {
+                data[name] = self.getControlValue(name);
+            }
+        }
+        for (var name in self.subforms) {
+            var form = self.subforms[name];
+            data[form.name] = form.getValue();
+        }
+        return data;
+    },
+
+
     /**
      * Gather form data and invoke the server-side callback.
      *
@@ -1104,31 +1687,42 @@ Methanal.View.FormBehaviour.subclass(Methanal.View, 'LiveForm').methods(
      * return value of the server-side callback is passed. If unsuccessful
      * L{submitFailure} is called and the failure is passed.
      *
+     * The submitted inputs are no longer considered modified once the
+     * submission is sent, inputs changed while it is in progress are
+     * submitted next time. If the submission fails the submitted inputs are
+     * considered modified again.
+     *
      * @rtype: C{Deferred}
      * @return: A deferred that fires with the return value of L{submitSuccess}
      *     or, in the case of a failure, L{submitFailure}
      */
     function submit(self) {
-        var data = {};
-        for (var name in self.controls) {
-            data[name] = self.getControlValue(name);
-        }
-        for (var name in self.subforms) {
-            var form = self.subforms[name];
-            data[form.name] = form.getValue();
-        }
+        var data = self.getSubmissionData();
 
         self.clearError();
         self.actions.disable('waiting');
         self.freeze();
         self.actions.throbber.start();
 
+        var submittedControls = {};
+        for (var name in data) {
+            if (self._modifiedControls[name]) {
+                submittedControls[name] = true;
+                delete self._modifiedControls[name];
+            }
+        }
+        // Even a failed submission may have changed the server-side model.
+        self._submitted = true;
+
         var d = self.callRemote('invoke', data);
         d.addCallback(function (value) {
             self.formModified(false);
             return self.submitSuccess(value);
         });
         d.addErrback(function (value) {
+            for (var name in submittedControls) {
+                self._modifiedControls[name] = true;
+            }
             return self.submitFailure(value);
         });
         d.addBoth(function (value) {
@@ -1196,8 +1790,19 @@ Methanal.View.FormBehaviour.subclass(Methanal.View, 'LiveForm').methods(
     /**
      * Callback for a failure form submission. The return value will be sent
      * back to the server.
+     *
+     * Server-side validation errors are set on the relevant inputs, which
+     * marks the form invalid, all at once; other failures are displayed with
+     * L{setError}.
      */
     function submitFailure(self, failure) {
+        if (failure.check(Methanal.View.ValidationErrors)) {
+            var invalidControls = self.setServerErrors(failure.error.errors);
+            if (invalidControls.length) {
+                self.setInvalid(invalidControls);
+                return null;
+            }
+        }
         self.setError(failure);
         return null;
     },
@@ -1236,6 +1841,9 @@ Methanal.View.FormBehaviour.subclass(Methanal.View, 'LiveForm').methods(
 
 
     function valueChanged(self, control, updateModified/*=true*/) {
+        if (self.fullyLoaded) {
+            self._modifiedControls[control.name] = true;
+        }
         Methanal.View.LiveForm.upcall(self, 'valueChanged', control);
         if (updateModified === undefined || !!updateModified) {
             self.formModified(true);
@@ -1497,7 +2105,19 @@ Methanal.View.FormBehaviour.subclass(Methanal.View, 'GroupInput').methods(
     function setWidgetParent(self, widgetParent) {
         Methanal.View.GroupInput.upcall(self, 'setWidgetParent', widgetParent);
         if (self.widgetParent) {
-            self.widgetParent.getForm().subforms[self.name] = self;
+            var form = self.widgetParent.getForm();
+            form.subforms[self.name] = self;
+            form.updateSubformValidity(self);
+        }
+    },
+
+
+    /**
+     * Update the parent form's record of this form's validity.
+     */
+    function _notifyValidity(self) {
+        if (self.widgetParent) {
+            self.widgetParent.getForm().updateSubformValidity(self);
         }
     },
 
@@ -1535,11 +2155,13 @@ Methanal.View.FormBehaviour.subclass(Methanal.View, 'GroupInput').methods(
 
     function setValid(self) {
         self.valid = true;
+        self._notifyValidity();
     },
 
 
     function setInvalid(self) {
         self.valid = false;
+        self._notifyValidity();
     },
 
 
@@ -1630,6 +2252,7 @@ Nevow.Athena.Widget.subclass(Methanal.View, 'FormInput').methods(
 
         var form = self.getForm();
         form.controls[self.name] = self;
+        form.updateControlValidity(self);
         form.addValidator([self.name], [_baseValidator]);
         form.loadedUp(self);
     },
@@ -1705,6 +2328,7 @@ Nevow.Athena.Widget.subclass(Methanal.View, 'FormInput').methods(
     function setError(self, error) {
         Methanal.Util.addElementClass(self.node, 'methanal-control-error');
         self.error = error;
+        self.getForm().updateControlValidity(self);
         self.widgetParent.checkForErrors();
         if (self.error && self.error.length) {
             self._errorTooltip.setText(self.error);
@@ -1719,6 +2343,7 @@ Nevow.Athena.Widget.subclass(Methanal.View, 'FormInput').methods(
     function clearError(self) {
         Methanal.Util.removeElementClass(self.node, 'methanal-control-error');
         self.error = null;
+        self.getForm().updateControlValidity(self);
         self.widgetParent.checkForErrors();
         self._errorTooltip.hide();
     },
@@ -1734,7 +2359,9 @@ Nevow.Athena.Widget.subclass(Methanal.View, 'FormInput').methods(
      */
     function setActive(self, active) {
         Methanal.View._setActive(self, active);
-        self.getForm().validate(self);
+        var form = self.getForm();
+        form.updateControlValidity(self);
+        form.validate(self);
     },
 
 
@@ -2400,6 +3027,114 @@ Methanal.View.FormInput.subclass(Methanal.View, 'SelectInput').methods(
 
 
 
+/**
+ * A dropdown input whose options are searched for on demand.
+ *
+ * @type minSearchLength: C{Integer}
+ * @ivar minSearchLength: Minimum length of text to search for
+ *
+ * @type searchNode: DOM node
+ * @ivar searchNode: Text input the user enters search text into
+ */
+Methanal.View.SelectInput.subclass(
+    Methanal.View, 'SearchableSelectInput').methods(
+    function __init__(self, node, args) {
+        Methanal.View.SearchableSelectInput.upcall(
+            self, '__init__', node, args);
+        self.minSearchLength = args.minSearchLength;
+        self._searchText = null;
+    },
+
+
+    function nodeInserted(self) {
+        self.searchNode = self.getSearchNode();
+        Methanal.View.SearchableSelectInput.upcall(self, 'nodeInserted');
+    },
+
+
+    /**
+     * Get the text input the user enters search text into.
+     */
+    function getSearchNode(self) {
+        return self.node.getElementsByTagName('input')[0];
+    },
+
+
+    /**
+     * Replace the input's options, keeping the selected option.
+     *
+     * @type  options: C{Array} of C{[value, description]}
+     * @param options: Options to display
+     *
+     * @type  truncated: C{Boolean}
+     * @param truncated: Were more options found than are being displayed?
+     */
+    function setOptions(self, options, truncated) {
+        var value = self.getValue();
+        var selected = null;
+        var optionNodes = self.inputNode.options;
+        for (var i = 0; value !== null && i < optionNodes.length; ++i) {
+            if (optionNodes[i].value == value) {
+                selected = [value, optionNodes[i].text];
+                break;
+            }
+        }
+
+        self.clear();
+        for (var i = 0; i < options.length; ++i) {
+            self.append(options[i][0], options[i][1]);
+            if (selected !== null && options[i][0] == value) {
+                selected = null;
+            }
+        }
+        if (selected !== null) {
+            self.insert(selected[0], selected[1],
+                self.inputNode.options[0] || null);
+        }
+        if (truncated) {
+            var moreNode = self.append('', 'More results, refine your search');
+            moreNode.disabled = true;
+            Methanal.Util.addElementClass(moreNode, 'embedded-label');
+        }
+        self.setValue(value);
+    },
+
+
+    /**
+     * Search for options and display them.
+     *
+     * Results for anything other than the most recent search are discarded.
+     *
+     * @type  text: C{String}
+     * @param text: Text to search for
+     *
+     * @rtype: C{Deferred}
+     */
+    function search(self, text) {
+        self._searchText = text;
+        return self.callRemote('search', text).addCallback(
+            function (result) {
+                if (text === self._searchText) {
+                    self.setOptions(result.options, result.truncated);
+                }
+            });
+    },
+
+
+    /**
+     * Handler for the "onkeyup" DOM event of the search input.
+     */
+    function onSearchKeyUp(self, node) {
+        var text = node.value;
+        if (text.length >= self.minSearchLength &&
+            text !== self._searchText) {
+            self.search(text);
+        }
+        return true;
+    });
+
+
+
 Methanal.View.SelectInput.subclass(Methanal.View, 'MultiSelectInput').methods(
     /**
      * Get all selected C{option}'s values.
@@ -45,11 +45,12 @@ Divmod.Class.subclass(Methanal.Widgets, 'Action').methods(
 
     /**
      * Called by the C{onclick} handler created by L{toNode}, to call the
-     * remote action method and dispatch the result to the relevant handler.
+     * remote action method, for the row's key, and dispatch the result to the
+     * relevant handler.
      */
     function _enact(self, tableWidget, row) {
         var d = tableWidget.callRemote(
-            'performAction', self.name, row.id);
+            'performAction', self.name, row.key);
         return d.addCallbacks(
             function (result) {
                 return self.handleSuccess(tableWidget, row, result);
@@ -261,11 +262,72 @@ Divmod.Class.subclass(Methanal.Widgets, 'Cell').methods(
  *
  * @type cells: Mapping of C{String} to L{Methanal.Widgets.Cell}
  * @ivar cells: Mapping of column identifiers to cell objects
+ *
+ * @ivar key: Stable row key, identifying the row regardless of its position,
+ *     defaults to L{id}
  */
 Divmod.Class.subclass(Methanal.Widgets, 'Row').methods(
-    function __init__(self, id, cells) {
+    function __init__(self, id, cells, key/*=undefined*/) {
         self.id = id;
         self.cells = cells;
+        self.key = key === undefined ? id : key;
+    });
+
+
+
+/**
+ * A collection of rows for L{Methanal.Widgets.Table}, transported column by
+ * column.
+ *
+ * Rows are only constructed on demand, by L{getRow}, and their cells are
+ * simple objects with C{value} and C{link} attributes rather than
+ * L{Methanal.Widgets.Cell} instances.
+ *
+ * @type length: C{Integer}
+ * @ivar length: Number of rows
+ */
+Divmod.Class.subclass(Methanal.Widgets, 'RowSet').methods(
+    /**
+     * @type  ids: C{Array}
+     * @param ids: Row identifiers
+     *
+     * @type  keys: C{Array}
+     * @param keys: Row keys
+     *
+     * @type  values: C{object} mapping C{String} to C{Array}
+     * @param values: Mapping of column identifiers to cell values
+     *
+     * @type  links: C{object} mapping C{String} to C{Array}
+     * @param links: Mapping of column identifiers to cell links, columns
+     *     without any links are omitted
+     */
+    function __init__(self, ids, keys, values, links) {
+        self._ids = ids;
+        self._keys = keys;
+        self._values = values;
+        self._links = links;
+        self.length = ids.length;
+    },
+
+
+    /**
+     * Construct a row.
+     *
+     * @type  index: C{Integer}
+     * @param index: Index of the row in this row set
+     *
+     * @rtype: L{Methanal.Widgets.Row}
+     */
+    function getRow(self, index) {
+        var cells = {};
+        for (var columnID in self._values) {
+            var links = self._links[columnID];
+            cells[columnID] = {
+                'value': self._values[columnID][index],
+                'link': links === undefined ? null : links[index]};
+        }
+        return Methanal.Widgets.Row(
+            self._ids[index], cells, self._keys[index]);
     });
 
 
@@ -284,6 +346,26 @@ Divmod.Class.subclass(Methanal.Widgets, 'Row').methods(
  * @ivar defaultActionNavigates: Does clicking the default action invoke the
  *     normal navigation logic (determined by L{cellClicked} or
  *     L{Methanal.Widgets.Action.allowNavigate})? Defaults to C{false}
+ *
+ * @type pageSize: C{Integer}
+ * @ivar pageSize: Number of rows to fetch from the server at a time, or
+ *     C{null} if all rows are sent up front
+ *
+ * @type totalRows: C{Integer}
+ * @ivar totalRows: Total number of rows available on the server
+ *
+ * @type loadedRows: C{Integer}
+ * @ivar loadedRows: Number of rows currently loaded into the table
+ *
+ * @type sortable: C{Boolean}
+ * @ivar sortable: Can the table be sorted by clicking on column headers?
+ *
+ * @type sortColumnID: C{String}
+ * @ivar sortColumnID: Identifier of the column the rows are sorted by, or
+ *     C{null} if the rows are in their natural order
+ *
+ * @type sortAscending: C{Boolean}
+ * @ivar sortAscending: Are the rows sorted in ascending order?
  */
 Nevow.Athena.Widget.subclass(Methanal.Widgets, 'Table').methods(
     function __init__(self, node, args) {
@@ -294,6 +376,19 @@ Nevow.Athena.Widget.subclass(Methanal.Widgets, 'Table').methods(
             self._columnIndices[column.id] = index;
         });
         self._rows = args.rows;
+        self.pageSize = args.pageSize || null;
+        self.totalRows = args.totalRows;
+        if (self.totalRows === undefined) {
+            self.totalRows = self._rows.length;
+        }
+        self.loadedRows = 0;
+        self._rowKeys = [];
+        self._rowsByKey = {};
+        self._rowIndices = {};
+        self._fetchingRows = null;
+        self.sortable = args.sortable || false;
+        self.sortColumnID = null;
+        self.sortAscending = true;
 
         self.actions = null;
         self.defaultAction = null;
@@ -323,10 +418,37 @@ Nevow.Athena.Widget.subclass(Methanal.Widgets, 'Table').methods(
         function insertCell(rowNode, title) {
             var td = tr.insertCell(-1);
             Methanal.Util.replaceNodeText(td, title);
+            return td;
+        }
+
+        function insertSortableCell(rowNode, column) {
+            var td = tr.insertCell(-1);
+            var a = doc.createElement('a');
+            a.href = '#';
+            a.onclick = function onclick(evt) {
+                var ascending = true;
+                if (self.sortColumnID === column.id) {
+                    ascending = !self.sortAscending;
+                }
+                self.sortBy(column.id, ascending);
+                return false;
+            };
+            Methanal.Util.replaceNodeText(a, column.title);
+            td.appendChild(a);
+            if (self.sortColumnID === column.id) {
+                Methanal.Util.addElementClass(td, self.sortAscending ?
+                    'methanal-table-sort-ascending' :
+                    'methanal-table-sort-descending');
+            }
+            return td;
         }
 
         self.eachColumn(function (column) {
-            insertCell(tr, column.title);
+            if (self.sortable) {
+                insertSortableCell(tr, column);
+            } else {
+                insertCell(tr, column.title);
+            }
         });
 
         if (self._hasActions()) {
@@ -344,6 +466,118 @@ Nevow.Athena.Widget.subclass(Methanal.Widgets, 'Table').methods(
         } else {
             self.empty();
         }
+
+        if (self.pageSize !== null) {
+            self.node.onscroll = function onscroll(evt) {
+                self.onScroll(this);
+                return true;
+            };
+        }
+    },
+
+
+    /**
+     * Are there rows on the server that have not been loaded yet?
+     */
+    function hasMoreRows(self) {
+        return self.loadedRows < self.totalRows;
+    },
+
+
+    /**
+     * Fetch a range of rows from the server.
+     *
+     * @type  offset: C{Integer}
+     * @param offset: Index of the first row to fetch
+     *
+     * @type  limit: C{Integer}
+     * @param limit: Maximum number of rows to fetch, the server will never
+     *     return more than L{pageSize} rows
+     *
+     * @rtype: C{Deferred}
+     * @return: A deferred that fires with an C{Array} of
+     *     L{Methanal.Widgets.Row}, or a L{Methanal.Widgets.RowSet}, after
+     *     updating L{totalRows}
+     */
+    function fetchRows(self, offset, limit) {
+        var d = self.callRemote('getRowRange', offset, limit);
+        d.addCallback(function (result) {
+            self.totalRows = result[1];
+            return result[0];
+        });
+        return d;
+    },
+
+
+    /**
+     * Fetch and append the next page of rows, if there are any.
+     *
+     * Only one page is fetched at a time, calling this while a fetch is
+     * already in progress returns the pending result.
+     *
+     * @rtype: C{Deferred}
+     * @return: A deferred that fires with the number of rows appended
+     */
+    function loadMoreRows(self) {
+        if (self._fetchingRows !== null) {
+            return self._fetchingRows;
+        }
+        if (self.pageSize === null || !self.hasMoreRows()) {
+            return Divmod.Defer.succeed(0);
+        }
+
+        var d = self.fetchRows(self.loadedRows, self.pageSize);
+        self._fetchingRows = d;
+        d.addCallback(function (rows) {
+            self.populate(rows);
+            return rows.length;
+        });
+        d.addBoth(function (result) {
+            self._fetchingRows = null;
+            return result;
+        });
+        return d;
+    },
+
+
+    /**
+     * Handle the "onscroll" DOM event.
+     *
+     * When the table is scrolled near to the bottom, the next page of rows is
+     * loaded.
+     */
+    function onScroll(self, node) {
+        var remaining = node.scrollHeight - node.scrollTop - node.clientHeight;
+        if (remaining <= node.clientHeight / 2) {
+            self.loadMoreRows();
+        }
+    },
+
+
+    /**
+     * Update the "more rows" footer according to L{hasMoreRows}.
+     */
+    function _updateMoreRows(self) {
+        self._tableNode.deleteTFoot();
+        if (self.pageSize === null || !self.hasMoreRows()) {
+            return;
+        }
+
+        var tfoot = self._tableNode.createTFoot();
+        var tr = tfoot.insertRow(0);
+        Methanal.Util.addElementClass(tr, 'methanal-table-more-rows');
+        var td = tr.insertCell(-1);
+        td.colSpan = self._tableNode.tHead.rows[0].cells.length;
+        var a = self.node.ownerDocument.createElement('a');
+        a.href = '#';
+        a.onclick = function onclick(evt) {
+            self.loadMoreRows();
+            return false;
+        };
+        Methanal.Util.replaceNodeText(
+            a, 'Showing ' + self.loadedRows + ' of ' + self.totalRows +
+            ' rows, show more');
+        td.appendChild(a);
     },
 
 
@@ -559,6 +793,16 @@ Nevow.Athena.Widget.subclass(Methanal.Widgets, 'Table').methods(
      */
     function insertRow(self, index, row) {
         var tr = self.createRowElement(index, row);
+        if (index === -1 || index === self._rowKeys.length) {
+            if (self._rowIndices !== null) {
+                self._rowIndices[row.key] = self._rowKeys.length;
+            }
+            self._rowKeys.push(row.key);
+        } else {
+            self._rowKeys.splice(index, 0, row.key);
+            self._rowIndices = null;
+        }
+        self._rowsByKey[row.key] = row;
         self.rowInserted(tr.sectionRowIndex, tr, row);
     },
 
@@ -584,10 +828,141 @@ Nevow.Athena.Widget.subclass(Methanal.Widgets, 'Table').methods(
      */
     function removeRow(self, rowIndex) {
         self.getBody().deleteRow(rowIndex);
+        var key = self._rowKeys.splice(rowIndex, 1)[0];
+        delete self._rowsByKey[key];
+        if (rowIndex === self._rowKeys.length && self._rowIndices !== null) {
+            delete self._rowIndices[key];
+        } else {
+            self._rowIndices = null;
+        }
         self.rowRemoved(rowIndex);
     },
 
 
+    /**
+     * Rebuild the mapping of row keys to row indices.
+     *
+     * Appending and removing the last row keep the mapping up to date, other
+     * insertions and removals discard it until it is next needed.
+     */
+    function _rebuildRowIndices(self) {
+        self._rowIndices = {};
+        for (var i = 0; i < self._rowKeys.length; ++i) {
+            self._rowIndices[self._rowKeys[i]] = i;
+        }
+    },
+
+
+    /**
+     * Get the index of the row with a given key.
+     *
+     * @param key: Row key
+     *
+     * @rtype: C{Integer}
+     * @return: Row index, or C{-1} if there is no row with the given key
+     */
+    function getRowIndex(self, key) {
+        if (self._rowIndices === null) {
+            self._rebuildRowIndices();
+        }
+        var index = self._rowIndices[key];
+        return index === undefined ? -1 : index;
+    },
+
+
+    /**
+     * Get the row with a given key.
+     *
+     * @param key: Row key
+     *
+     * @rtype: L{Methanal.Widgets.Row}
+     * @return: Row, or C{undefined} if there is no row with the given key
+     */
+    function getRowByKey(self, key) {
+        return self._rowsByKey[key];
+    },
+
+
+    /**
+     * Apply row changes computed by the server.
+     *
+     * Rows are removed first, then updated in place and finally inserted.
+     * Afterwards rows are renumbered, according to their position, and
+     * restriped.
+     *
+     * @type  removedKeys: C{Array}
+     * @param removedKeys: Keys of rows to remove
+     *
+     * @type  updatedRows: C{Array} of L{Methanal.Widgets.Row}
+     * @param updatedRows: Rows to replace the existing rows, with the same
+     *     keys, with
+     *
+     * @type  insertedRows: C{Array}
+     * @param insertedRows: Pairs of row index and L{Methanal.Widgets.Row} to
+     *     insert, ordered by index
+     *
+     * @type  totalRows: C{Integer}
+     * @param totalRows: Total number of rows available on the server
+     */
+    function updateRows(self, removedKeys, updatedRows, insertedRows,
+                        totalRows) {
+        if (self._rowKeys.length === 0) {
+            // Get rid of the "empty" placeholder row, if there is one.
+            self.clear();
+        }
+
+        // Look up all the indices before changing any rows, removing rows
+        // from the end first keeps the indices of the remaining rows valid.
+        var removedIndices = [];
+        for (var i = 0; i < removedKeys.length; ++i) {
+            var index = self.getRowIndex(removedKeys[i]);
+            if (index !== -1) {
+                removedIndices.push(index);
+            }
+        }
+        removedIndices.sort(function (a, b) {
+            return b - a;
+        });
+        for (var i = 0; i < removedIndices.length; ++i) {
+            self.removeRow(removedIndices[i]);
+        }
+
+        // Replacing a row does not move any other rows.
+        var updatedIndices = [];
+        for (var i = 0; i < updatedRows.length; ++i) {
+            updatedIndices.push(self.getRowIndex(updatedRows[i].key));
+        }
+        for (var i = 0; i < updatedRows.length; ++i) {
+            self.removeRow(updatedIndices[i]);
+            self.insertRow(updatedIndices[i], updatedRows[i]);
+        }
+
+        for (var i = 0; i < insertedRows.length; ++i) {
+            self.insertRow(insertedRows[i][0], insertedRows[i][1]);
+        }
+
+        self.totalRows = totalRows;
+        self.loadedRows = self._rowKeys.length;
+        if (self.loadedRows === 0) {
+            self.empty();
+            return;
+        }
+
+        self._cycler = Methanal.Util.cycle('odd', 'even');
+        var rowNodes = self.getRows();
+        self._rowIndices = {};
+        for (var i = 0; i < self._rowKeys.length; ++i) {
+            self._rowIndices[self._rowKeys[i]] = i;
+            self._rowsByKey[self._rowKeys[i]].id = i;
+            var node = rowNodes[i];
+            Methanal.Util.removeElementClass(node, 'odd');
+            Methanal.Util.removeElementClass(node, 'even');
+            Methanal.Util.addElementClass(node, self._cycler());
+        }
+        self._updateMoreRows();
+    },
+
+
     /**
      * Replace all the children of a cell with new ones.
      *
@@ -606,13 +981,65 @@ Nevow.Athena.Widget.subclass(Methanal.Widgets, 'Table').methods(
     },
 
 
+    /**
+     * Sort the table, on the server, by a column and repopulate the table.
+     *
+     * @type  columnID: C{String}
+     * @param columnID: Identifier of the column to sort by, or C{null} to
+     *     restore the natural order
+     *
+     * @type  ascending: C{Boolean}
+     * @param ascending: Sort in ascending order?
+     *
+     * @raise Methanal.Widgets.InvalidColumn: If L{columnID} does not identify
+     *     a column
+     *
+     * @rtype: C{Deferred}
+     */
+    function sortBy(self, columnID, ascending) {
+        if (columnID !== null && self._columnIndices[columnID] === undefined) {
+            throw Methanal.Widgets.InvalidColumn(columnID);
+        }
+        var d = self.callRemote('sortRows', columnID, ascending);
+        d.addCallback(function (result) {
+            self.sortColumnID = columnID;
+            self.sortAscending = ascending;
+            self._rebuildHeaders();
+            self.repopulate(result[0], result[1]);
+            return null;
+        });
+        return d;
+    },
+
+
+    /**
+     * Filter the table, on the server, by column values and repopulate the
+     * table.
+     *
+     * @type  filters: C{object} mapping C{String} to values
+     * @param filters: Mapping of column identifiers to values that rows must
+     *     match; text columns match rows containing the value, other columns
+     *     match rows equal to the value
+     *
+     * @rtype: C{Deferred}
+     */
+    function filterBy(self, filters) {
+        var d = self.callRemote('filterRows', filters);
+        d.addCallback(function (result) {
+            self.repopulate(result[0], result[1]);
+            return null;
+        });
+        return d;
+    },
+
+
     /**
      * Fetch rows from the server and repopulate the table.
      */
     function repopulateFromServer(self) {
-        var d = self.callRemote('_getRows');
-        d.addCallback(function (rows) {
-            self.repopulate(rows);
+        var d = self.callRemote('getFirstPage');
+        d.addCallback(function (result) {
+            self.repopulate(result[0], result[1]);
             return null;
         });
         return d;
@@ -622,23 +1049,46 @@ Nevow.Athena.Widget.subclass(Methanal.Widgets, 'Table').methods(
     /**
      * Clear the table body and populate it.
      *
-     * @param rows: C{Array} of row data objects
+     * @param rows: C{Array} of row data objects or a
+     *     L{Methanal.Widgets.RowSet}
+     *
+     * @type  totalRows: C{Integer}
+     * @param totalRows: Total number of rows available on the server, defaults
+     *     to the length of C{rows}
      */
-    function repopulate(self, rows) {
+    function repopulate(self, rows, totalRows/*=undefined*/) {
         self.clear();
-        self.populate(rows);
+        self.totalRows = totalRows === undefined ? rows.length : totalRows;
+        if (rows.length > 0) {
+            self.populate(rows);
+        } else {
+            self.empty();
+        }
     },
 
 
     /**
      * Populate the table.
      *
-     * @param rows: C{Array} of row data objects
+     * @param rows: C{Array} of row data objects or a
+     *     L{Methanal.Widgets.RowSet}
      */
     function populate(self, rows) {
-        for (var i = 0; i < rows.length; ++i) {
-            self.appendRow(rows[i]);
+        if (self.loadedRows === 0 && rows.length > 0) {
+            // Get rid of the "empty" placeholder row, if there is one.
+            self.clear();
         }
+        if (rows instanceof Methanal.Widgets.RowSet) {
+            for (var i = 0; i < rows.length; ++i) {
+                self.appendRow(rows.getRow(i));
+            }
+        } else {
+            for (var i = 0; i < rows.length; ++i) {
+                self.appendRow(rows[i]);
+            }
+        }
+        self.loadedRows += rows.length;
+        self._updateMoreRows();
     },
 
 
@@ -647,6 +1097,10 @@ Nevow.Athena.Widget.subclass(Methanal.Widgets, 'Table').methods(
      */
     function clear(self) {
         Methanal.Util.removeNodeContent(self.getBody());
+        self.loadedRows = 0;
+        self._rowKeys = [];
+        self._rowsByKey = {};
+        self._rowIndices = {};
     },
 
 
@@ -661,6 +1115,7 @@ Nevow.Athena.Widget.subclass(Methanal.Widgets, 'Table').methods(
         var td = tr.insertCell(-1);
         td.colSpan = self._tableNode.tHead.rows[0].cells.length;
         Methanal.Util.replaceNodeText(td, 'No items to display');
+        self._updateMoreRows();
     });
 
 
@@ -1134,11 +1589,17 @@ Methanal.View.LiveForm.subclass(Methanal.Widgets, 'FilterListForm').methods(
 /**
  * Complex input for arriving at a single result, given a set of criteria.
  *
+ * @type debounce: C{Integer}
+ * @ivar debounce: Number of milliseconds the criteria must remain unchanged
+ *     for before a lookup is performed, or C{null} to perform lookups
+ *     immediately
+ *
  * @type _lookupForm: L{Methanal.Widgets.LookupForm}
  */
 Methanal.View.FormInput.subclass(Methanal.Widgets, 'Lookup').methods(
     function __init__(self, node, args) {
         Methanal.Widgets.Lookup.upcall(self, '__init__', node, args);
+        self.debounce = args.debounce;
         self._lookupForm = null;
         self._waitForForm = Divmod.Defer.Deferred();
         self._waitForLookupForm = Divmod.Defer.Deferred();
@@ -1209,6 +1670,27 @@ Methanal.View.FormInput.subclass(Methanal.Widgets, 'Lookup').methods(
 
     function getValue(self) {
         return self._lookupForm.getResultValue();
+    },
+
+
+    /**
+     * Call a function after a delay.
+     *
+     * @type  delay: C{Integer}
+     * @param delay: Number of milliseconds to wait
+     *
+     * @return: An object that can be passed to L{cancelCall}
+     */
+    function callLater(self, delay, fn) {
+        return setTimeout(fn, delay);
+    },
+
+
+    /**
+     * Cancel a call scheduled with L{callLater}.
+     */
+    function cancelCall(self, call) {
+        clearTimeout(call);
     });
 
 
@@ -1270,6 +1752,8 @@ Methanal.View.SimpleForm.subclass(Methanal.Widgets, 'LookupForm').methods(
         self.results = {};
         self.storeResults = false;
         self._initialisedOnce = false;
+        self._pendingLookup = null;
+        self._lookupID = 0;
     },
 
 
@@ -1357,8 +1841,13 @@ Methanal.View.SimpleForm.subclass(Methanal.Widgets, 'LookupForm').methods(
      * @param selectedValue: Selected result values; use C{undefined} to select
      *     the first value in C{values} (or C{null} if there are none).
      *     Defaults to C{undefined}.
+     *
+     * @type  more: C{Boolean}
+     * @param more: Are more results available than C{values}? Defaults to
+     *     C{false}.
      */
-    function setResults(self, values, selectedValue/*=undefined*/) {
+    function setResults(self, values, selectedValue/*=undefined*/,
+                        more/*=false*/) {
         var resultControl = self.getResultControl();
         resultControl.clear();
         self.results = {};
@@ -1371,6 +1860,13 @@ Methanal.View.SimpleForm.subclass(Methanal.Widgets, 'LookupForm').methods(
             }
         }
 
+        if (more) {
+            var moreNode = resultControl.append(
+                '', 'More results available, refine your criteria');
+            moreNode.disabled = true;
+            Methanal.Util.addElementClass(moreNode, 'embedded-label');
+        }
+
         var data = selectedValue || null;
         if (selectedValue === undefined) {
             if (values.length > 0) {
@@ -1444,6 +1940,7 @@ Methanal.View.SimpleForm.subclass(Methanal.Widgets, 'LookupForm').methods(
         }
 
         if (!self.valid) {
+            self.cancelLookup();
             self.setResults([]);
             return;
         }
@@ -1455,14 +1952,71 @@ Methanal.View.SimpleForm.subclass(Methanal.Widgets, 'LookupForm').methods(
         }
 
         self.enterSearchingState();
+        self.scheduleLookup(data);
+    },
+
+
+    /**
+     * Cancel any scheduled lookup and discard the results of lookups in
+     * progress.
+     */
+    function cancelLookup(self) {
+        if (self._pendingLookup !== null) {
+            self.widgetParent.cancelCall(self._pendingLookup);
+            self._pendingLookup = null;
+        }
+        self._lookupID++;
+    },
+
+
+    /**
+     * Schedule a lookup, replacing any previously scheduled lookup.
+     *
+     * If the lookup widget specifies a C{debounce} delay, the lookup is
+     * performed once the criteria have been unchanged for that long,
+     * otherwise it is performed immediately.
+     *
+     * @type  data: C{object} mapping C{String} to values
+     * @param data: Lookup criteria
+     */
+    function scheduleLookup(self, data) {
+        self.cancelLookup();
+        var debounce = self.widgetParent.debounce;
+        if (!debounce) {
+            self.performLookup(data);
+            return;
+        }
+        self._pendingLookup = self.widgetParent.callLater(debounce,
+            function () {
+                self._pendingLookup = null;
+                self.performLookup(data);
+            });
+    },
+
 
+    /**
+     * Perform a lookup, populating the result input with the results.
+     *
+     * The results of lookups other than the most recent one are discarded.
+     *
+     * @type  data: C{object} mapping C{String} to values
+     * @param data: Lookup criteria
+     *
+     * @rtype: C{Deferred}
+     */
+    function performLookup(self, data) {
+        var lookupID = ++self._lookupID;
         // Pass the gathered values to the remote side and populate the result
         // input from the return value of that call.
         var d = self.widgetParent.callRemote('lookup', data);
-        d.addCallback(function (values) {
-            self.setResults(values);
+        d.addCallback(function (result) {
+            if (lookupID !== self._lookupID) {
+                return;
+            }
+            self.setResults(result.results, undefined, result.more);
             self.exitSearchingState();
         });
+        return d;
     });
 
 
@@ -1593,13 +2147,29 @@ Methanal.View.LiveForm.subclass(Methanal.Widgets, 'ModalDialogForm').methods(
 
 /**
  * Base class for widgets that rely on remote content.
+ *
+ * @type cachePolicy: C{Object}
+ * @ivar cachePolicy: Mapping of C{'ttl'}, the number of seconds content may
+ *     be reused for or C{null} for no expiry, and C{'revalidate'}, whether to
+ *     ask the server if content is current before reusing it; or C{null} to
+ *     never reuse content. See L{updateCachedContent}.
  */
 Nevow.Athena.Widget.subclass(Methanal.Widgets, 'RemoteContentWidget').methods(
-    function __init__(self, node) {
+    function __init__(self, node, cachePolicy /*=null*/) {
         Methanal.Widgets.RemoteContentWidget.upcall(self, '__init__', node);
         self._currentRemoteWidgets = {};
-        self._cancelFetch = function() {};
-        self._abortFetchs = {};
+        self._fetchIDs = {};
+        self._fetching = {};
+        self._contentTimes = {};
+        self.cachePolicy = cachePolicy || null;
+    },
+
+
+    /**
+     * Get the current time, in milliseconds.
+     */
+    function now(self) {
+        return new Date().getTime();
     },
 
 
@@ -1621,21 +2191,43 @@ Nevow.Athena.Widget.subclass(Methanal.Widgets, 'RemoteContentWidget').methods(
     },
 
 
+    /**
+     * Release a content widget that has been superseded.
+     *
+     * The server releases superseded content itself, so the widget is only
+     * detached locally.
+     */
+    function releaseWidget(self, widget) {
+        widget._athenaDetachClient();
+    },
+
+
     /**
      * Set an Athena widget as the content.
+     *
+     * If C{widgetInfo} is C{null} the server has no new content, the current
+     * content, if there is any, is shown.
      */
     function setContentFromWidgetInfo(self, widgetInfo, nodeID, abortFetch) {
+        if (widgetInfo === null) {
+            var currentWidget = self._currentRemoteWidgets[nodeID];
+            if (!abortFetch && currentWidget !== undefined) {
+                self.setContent(nodeID, currentWidget.node);
+            }
+            return Divmod.Defer.succeed(null);
+        }
         var d = self.addChildWidgetFromWidgetInfo(widgetInfo);
         d.addCallback(function (widget) {
             if (abortFetch) {
-                return widget.detach();
+                self.releaseWidget(widget);
             } else {
                 var currentWidget = self._currentRemoteWidgets[nodeID];
                 if (currentWidget !== undefined) {
-                    currentWidget.detach();
+                    self.releaseWidget(currentWidget);
                 }
                 self.setContent(nodeID, widget.node);
                 self._currentRemoteWidgets[nodeID] = widget;
+                self._contentTimes[nodeID] = self.now();
                 Methanal.Util.nodeInserted(widget);
             }
             return null;
@@ -1657,28 +2249,410 @@ Nevow.Athena.Widget.subclass(Methanal.Widgets, 'RemoteContentWidget').methods(
     /**
      * Fetch the latest content from the server.
      *
-     * If a fetch is already in progress it's result is discarded and a new
-     * fetch takes place.
+     * If a fetch for the same node ID is already in progress it's result is
+     * discarded and a new fetch takes place.
      */
     function fetchContent(self, nodeID) {
         self.showPlaceholder(nodeID);
-        self._cancelFetch();
 
-        self._abortFetchs[nodeID] = false;
-        self._cancelFetch = function() {
-            self._abortFetchs[nodeID] = true;
-        };
+        var fetchID = (self._fetchIDs[nodeID] || 0) + 1;
+        self._fetchIDs[nodeID] = fetchID;
+        self._fetching[nodeID] = true;
 
         var d = self.getRemoteContent(nodeID);
         d.addCallback(function (widgetInfo) {
             return self.setContentFromWidgetInfo(
-                widgetInfo, nodeID, self._abortFetchs[nodeID]);
+                widgetInfo, nodeID, self._fetchIDs[nodeID] !== fetchID);
+        });
+        d.addBoth(function (result) {
+            if (self._fetchIDs[nodeID] === fetchID) {
+                self._fetching[nodeID] = false;
+            }
+            return result;
+        });
+        return d;
+    },
+
+
+    /**
+     * Is content for a given node ID currently being fetched?
+     */
+    function isFetching(self, nodeID) {
+        return !!self._fetching[nodeID];
+    },
+
+
+    /**
+     * Determine whether the cached content for a node ID has expired.
+     */
+    function _contentExpired(self, nodeID) {
+        var ttl = self.cachePolicy.ttl;
+        if (ttl === null || ttl === undefined) {
+            return false;
+        }
+        return self.now() - self._contentTimes[nodeID] >= ttl * 1000;
+    },
+
+
+    /**
+     * Show the content for a given node ID, reusing the current content if
+     * L{cachePolicy} allows it.
+     *
+     * Content is fetched if there is no cache policy, no current content, the
+     * current content has expired or, when revalidating, the server reports
+     * that the current content is out of date.
+     */
+    function updateCachedContent(self, nodeID) {
+        if (self.cachePolicy === null ||
+            self._currentRemoteWidgets[nodeID] === undefined ||
+            self._contentTimes[nodeID] === undefined ||
+            self._contentExpired(nodeID)) {
+            return self.fetchContent(nodeID);
+        }
+
+        if (!self.cachePolicy.revalidate) {
+            return Divmod.Defer.succeed(null);
+        }
+
+        var d = self.callRemote('isContentCurrent', nodeID);
+        d.addCallback(function (current) {
+            if (current) {
+                self._contentTimes[nodeID] = self.now();
+                return null;
+            }
+            return self.fetchContent(nodeID);
         });
         return d;
+    },
+
+
+    /**
+     * Discard cached content for a given node ID, it will be fetched the next
+     * time it is shown.
+     */
+    function invalidateContent(self, nodeID) {
+        delete self._contentTimes[nodeID];
     });
 
 
 
+/**
+ * Priority of fetches for content that may be needed soon, they only run when
+ * no other fetches are running or queued.
+ */
+Methanal.Widgets.PRIORITY_PREFETCH = 0;
+
+/**
+ * Priority of fetches for content that is needed but not yet visible.
+ */
+Methanal.Widgets.PRIORITY_NORMAL = 1;
+
+/**
+ * Priority of fetches for content that is visible.
+ */
+Methanal.Widgets.PRIORITY_VISIBLE = 2;
+
+
+
+/**
+ * Schedule remote content fetches, limiting how many run concurrently.
+ *
+ * Queued fetches are started in order of priority, highest first, and then in
+ * the order they were scheduled.
+ *
+ * @type maxConcurrent: C{Integer}
+ * @ivar maxConcurrent: Maximum number of fetches to run concurrently.
+ *
+ * @type active: C{Integer}
+ * @ivar active: Number of fetches currently running.
+ *
+ * @ivar _queue: Queued fetches, in the order they were scheduled.
+ *
+ * @ivar _running: Fetches currently running.
+ */
+Divmod.Class.subclass(Methanal.Widgets, 'FetchScheduler').methods(
+    function __init__(self, maxConcurrent) {
+        self.maxConcurrent = maxConcurrent;
+        self.active = 0;
+        self._queue = [];
+        self._running = [];
+    },
+
+
+    /**
+     * Change the maximum number of fetches to run concurrently, starting
+     * queued fetches if the limit was raised.
+     *
+     * @type  maxConcurrent: C{Integer}
+     */
+    function setMaxConcurrent(self, maxConcurrent) {
+        self.maxConcurrent = maxConcurrent;
+        self._runQueued();
+    },
+
+
+    /**
+     * Find a queued fetch by key.
+     *
+     * @rtype: C{Integer}
+     * @return: Index of the queued fetch in L{_queue}, or C{-1}.
+     */
+    function _indexOf(self, key) {
+        for (var i = 0; i < self._queue.length; ++i) {
+            if (self._queue[i].key === key) {
+                return i;
+            }
+        }
+        return -1;
+    },
+
+
+    /**
+     * Schedule a fetch.
+     *
+     * If a fetch for C{key} is already queued it is replaced by this one, at
+     * the higher of the two priorities.
+     *
+     * @param key: Identifier of the content being fetched.
+     *
+     * @type  priority: C{Integer}
+     * @param priority: Fetch priority, such as
+     *     L{Methanal.Widgets.PRIORITY_NORMAL}.
+     *
+     * @type  fetch: C{Function} taking no arguments and returning a
+     *     C{Divmod.Defer.Deferred}
+     * @param fetch: Perform the fetch.
+     *
+     * @rtype: C{Divmod.Defer.Deferred}
+     * @return: Fires with the result of C{fetch}, once it has run, or with
+     *     C{null} if the fetch is cancelled.
+     */
+    function schedule(self, key, priority, fetch) {
+        var entry = {
+            'key': key,
+            'priority': priority,
+            'fetch': fetch,
+            'deferreds': [],
+            'cancelled': false};
+        var index = self._indexOf(key);
+        if (index !== -1) {
+            var existing = self._queue[index];
+            entry.priority = Math.max(priority, existing.priority);
+            entry.deferreds = existing.deferreds;
+            self._queue[index] = entry;
+        } else {
+            self._queue.push(entry);
+        }
+        var d = Divmod.Defer.Deferred();
+        entry.deferreds.push(d);
+        self._runQueued();
+        return d;
+    },
+
+
+    /**
+     * Raise the priority of a queued fetch.
+     *
+     * @rtype: C{Boolean}
+     * @return: Was a fetch for C{key} queued?
+     */
+    function promote(self, key, priority) {
+        var index = self._indexOf(key);
+        if (index === -1) {
+            return false;
+        }
+        var entry = self._queue[index];
+        entry.priority = Math.max(priority, entry.priority);
+        self._runQueued();
+        return true;
+    },
+
+
+    /**
+     * Cancel fetches whose keys match a predicate.
+     *
+     * Queued fetches are removed from the queue. Running fetches cannot be
+     * stopped, but their results, or failures, are discarded.
+     *
+     * @type  matches: C{Function} taking a key and returning a C{Boolean}
+     *
+     * @rtype: C{Integer}
+     * @return: Number of fetches cancelled.
+     */
+    function _cancelMatching(self, matches) {
+        var cancelled = [];
+        var queue = [];
+        for (var i = 0; i < self._queue.length; ++i) {
+            var entry = self._queue[i];
+            if (matches(entry.key)) {
+                cancelled.push(entry);
+            } else {
+                queue.push(entry);
+            }
+        }
+        self._queue = queue;
+        for (var i = 0; i < self._running.length; ++i) {
+            var entry = self._running[i];
+            if (!entry.cancelled && matches(entry.key)) {
+                cancelled.push(entry);
+            }
+        }
+
+        for (var i = 0; i < cancelled.length; ++i) {
+            var entry = cancelled[i];
+            entry.cancelled = true;
+            for (var j = 0; j < entry.deferreds.length; ++j) {
+                entry.deferreds[j].callback(null);
+            }
+            entry.deferreds = [];
+        }
+        return cancelled.length;
+    },
+
+
+    /**
+     * Cancel the fetch for C{key}.
+     *
+     * @rtype: C{Integer}
+     * @return: Number of fetches cancelled.
+     */
+    function cancel(self, key) {
+        return self._cancelMatching(function (k) {
+            return k === key;
+        });
+    },
+
+
+    /**
+     * Cancel the fetches for C{widget} and for any of its descendant widgets.
+     *
+     * @type  widget: C{Nevow.Athena.Widget}
+     *
+     * @rtype: C{Integer}
+     * @return: Number of fetches cancelled.
+     */
+    function cancelFor(self, widget) {
+        return self._cancelMatching(function (key) {
+            while (key !== null && key !== undefined) {
+                if (key === widget) {
+                    return true;
+                }
+                key = key.widgetParent;
+            }
+            return false;
+        });
+    },
+
+
+    /**
+     * Get the next fetch to start, removing it from the queue.
+     *
+     * @return: Queued fetch, or C{null} if there is no fetch that can be
+     *     started.
+     */
+    function _nextQueued(self) {
+        var best = -1;
+        for (var i = 0; i < self._queue.length; ++i) {
+            if (best === -1 ||
+                self._queue[i].priority > self._queue[best].priority) {
+                best = i;
+            }
+        }
+        if (best === -1) {
+            return null;
+        }
+        var entry = self._queue[best];
+        // Prefetches only run when nothing else is happening.
+        if (entry.priority <= Methanal.Widgets.PRIORITY_PREFETCH &&
+            self.active > 0) {
+            return null;
+        }
+        self._queue.splice(best, 1);
+        return entry;
+    },
+
+
+    /**
+     * Start queued fetches, while the concurrency limit allows it.
+     */
+    function _runQueued(self) {
+        while (self.active < self.maxConcurrent) {
+            var entry = self._nextQueued();
+            if (entry === null) {
+                break;
+            }
+            self._start(entry);
+        }
+    },
+
+
+    /**
+     * Start a fetch.
+     */
+    function _start(self, entry) {
+        function _finished(result) {
+            self.active--;
+            for (var i = 0; i < self._running.length; ++i) {
+                if (self._running[i] === entry) {
+                    self._running.splice(i, 1);
+                    break;
+                }
+            }
+            self._runQueued();
+            return result;
+        }
+
+        self.active++;
+        self._running.push(entry);
+        var d;
+        try {
+            d = entry.fetch();
+        } catch (e) {
+            d = Divmod.Defer.fail(e);
+        }
+        d.addBoth(_finished);
+        d.addBoth(function (result) {
+            // Cancelled fetches have already fired their deferreds.
+            var isFailure = result instanceof Divmod.Defer.Failure;
+            for (var i = 0; i < entry.deferreds.length; ++i) {
+                if (isFailure) {
+                    entry.deferreds[i].errback(result);
+                } else {
+                    entry.deferreds[i].callback(result);
+                }
+            }
+            return null;
+        });
+    });
+
+
+
+/**
+ * Default maximum number of concurrent content fetches per page.
+ */
+Methanal.Widgets.DEFAULT_MAX_CONCURRENT_FETCHES = 2;
+
+/**
+ * Page-wide fetch scheduler, see L{Methanal.Widgets.getFetchScheduler}.
+ */
+Methanal.Widgets._fetchScheduler = null;
+
+
+
+/**
+ * Get the page-wide L{Methanal.Widgets.FetchScheduler}, creating it if
+ * necessary.
+ */
+Methanal.Widgets.getFetchScheduler = function getFetchScheduler() {
+    if (Methanal.Widgets._fetchScheduler === null) {
+        Methanal.Widgets._fetchScheduler = Methanal.Widgets.FetchScheduler(
+            Methanal.Widgets.DEFAULT_MAX_CONCURRENT_FETCHES);
+    }
+    return Methanal.Widgets._fetchScheduler;
+};
+
+
+
 /**
  * An unknown tab identifier was specified.
  */
@@ -1696,6 +2670,12 @@ Divmod.Error.subclass(Methanal.Widgets, 'UnknownGroup');
 /**
  * A tab container, visually displayed as a horizontal tab bar.
  *
+ * Tab content is fetched through the page-wide
+ * L{Methanal.Widgets.FetchScheduler}, or through a scheduler of its own if
+ * the TabView has its own concurrency limit. Content fetches requested while
+ * the TabView is loading are only scheduled once it has finished loading,
+ * when the selected tab is known and can be fetched first.
+ *
  * @ivar tabIDs: Mapping of L{Tab.id}, used conceptually as a set, used for
  *     tracking tab loading.
  *
@@ -1704,13 +2684,24 @@ Divmod.Error.subclass(Methanal.Widgets, 'UnknownGroup');
  *     the fragment part of the current URL to track which tab is selected,
  *     this behaviour supercedes L{Tab.selected}.
  *
+ * @type prefetch: C{Boolean}
+ * @ivar prefetch: Prefetch the content of the tabs adjacent to the selected
+ *     tab, when the page is otherwise idle?
+ *
  * @type fullyLoaded: C{Boolean}
  * @ivar fullyLoaded: Have all the tabs finished loading?
  *
+ * @type scheduler: L{Methanal.Widgets.FetchScheduler}
+ * @ivar scheduler: Scheduler for content fetches.
+ *
  * @ivar _labels: Mapping of L{Tab.id} to DOM nodes of the tab labels.
+ *
+ * @ivar _pendingFetches: Tabs whose content was requested before the TabView
+ *     finished loading.
  */
 Nevow.Athena.Widget.subclass(Methanal.Widgets, 'TabView').methods(
     function __init__(self, node, tabIDs, tabGroups, topLevel,
+                      maxConcurrentFetches, prefetch,
                       _makeThrobber/*=undefined*/) {
         Methanal.Widgets.TabView.upcall(self, '__init__', node);
         self.tabIDs = tabIDs;
@@ -1723,6 +2714,14 @@ Nevow.Athena.Widget.subclass(Methanal.Widgets, 'TabView').methods(
         self._tabs = {};
         self._groups = {};
         self.fullyLoaded = false;
+        self.prefetch = prefetch;
+        if (maxConcurrentFetches) {
+            self.scheduler = Methanal.Widgets.FetchScheduler(
+                maxConcurrentFetches);
+        } else {
+            self.scheduler = Methanal.Widgets.getFetchScheduler();
+        }
+        self._pendingFetches = [];
         if (_makeThrobber === undefined) {
             _makeThrobber = function() { return self._defaultMakeThrobber(); };
         }
@@ -1882,10 +2881,16 @@ Nevow.Athena.Widget.subclass(Methanal.Widgets, 'TabView').methods(
 
     /**
      * Remove a tab widget's content.
+     *
+     * Tabs are only removed at the server's request, and the server has
+     * already released them, so the widget is only detached locally. Content
+     * fetches for the tab, or anything inside it, are cancelled.
      */
     function _removeTabContent(self, tab) {
+        self.scheduler.cancelFor(tab);
         self.nodeById('contents').removeChild(tab.node);
-        return tab.detach();
+        tab._athenaDetachClient();
+        return Divmod.Defer.succeed(null);
     },
 
 
@@ -2022,6 +3027,77 @@ Nevow.Athena.Widget.subclass(Methanal.Widgets, 'TabView').methods(
     },
 
 
+    /**
+     * Get the fetch priority for a tab's content.
+     */
+    function _getFetchPriority(self, tab) {
+        if (tab.selected) {
+            return Methanal.Widgets.PRIORITY_VISIBLE;
+        }
+        return Methanal.Widgets.PRIORITY_NORMAL;
+    },
+
+
+    /**
+     * Schedule a fetch of a tab's content.
+     *
+     * Fetches requested before the TabView has finished loading are deferred
+     * until it has.
+     */
+    function fetchTabContent(self, tab) {
+        if (!self.fullyLoaded) {
+            self._pendingFetches.push(tab);
+            return;
+        }
+        self.scheduler.schedule(
+            tab, self._getFetchPriority(tab),
+            function () {
+                return tab.fetchScheduledContent();
+            });
+    },
+
+
+    /**
+     * Schedule prefetching of the content of the visible tabs adjacent to
+     * C{tab}.
+     */
+    function _prefetchAround(self, tab) {
+        var tabs = [];
+        for (var i = 0; i < self.childWidgets.length; ++i) {
+            if (self.childWidgets[i].visible) {
+                tabs.push(self.childWidgets[i]);
+            }
+        }
+
+        function _prefetch(neighbour) {
+            self.scheduler.schedule(
+                neighbour, Methanal.Widgets.PRIORITY_PREFETCH,
+                function () {
+                    // The content may have been fetched since this was
+                    // scheduled.
+                    if (!neighbour.wantsPrefetch()) {
+                        return Divmod.Defer.succeed(null);
+                    }
+                    return neighbour.fetchContent('content');
+                });
+        }
+
+        for (var i = 0; i < tabs.length; ++i) {
+            if (tabs[i] !== tab) {
+                continue;
+            }
+            var neighbours = [tabs[i + 1], tabs[i - 1]];
+            for (var j = 0; j < neighbours.length; ++j) {
+                var neighbour = neighbours[j];
+                if (neighbour !== undefined && neighbour.wantsPrefetch()) {
+                    _prefetch(neighbour);
+                }
+            }
+            break;
+        }
+    },
+
+
     /**
      * Select a tab.
      *
@@ -2038,6 +3114,10 @@ Nevow.Athena.Widget.subclass(Methanal.Widgets, 'TabView').methods(
         var labelNode = self._labels[tab.id];
         Methanal.Util.addElementClass(labelNode, 'selected-tab-label');
         tab.select();
+        self.scheduler.promote(tab, Methanal.Widgets.PRIORITY_VISIBLE);
+        if (self.prefetch && self.fullyLoaded) {
+            self._prefetchAround(tab);
+        }
 
         if (self.topLevel) {
             window.location.hash = '#tab:' + tab.id;
@@ -2156,6 +3236,9 @@ Nevow.Athena.Widget.subclass(Methanal.Widgets, 'TabView').methods(
 
     /**
      * Finalise TabView loading.
+     *
+     * The selected tab is selected and content fetches requested while
+     * loading are scheduled.
      */
     function _finishLoading(self) {
         self.throbber.stop();
@@ -2165,9 +3248,25 @@ Nevow.Athena.Widget.subclass(Methanal.Widgets, 'TabView').methods(
                 self._tabToSelect = self.childWidgets[0];
             }
         }
+
+        var pendingFetches = self._pendingFetches;
+        self._pendingFetches = [];
         if (self._tabToSelect) {
             self.selectTab(self._tabToSelect);
         }
+        // Fetches start as soon as they are scheduled, if the scheduler is
+        // idle, so schedule the selected tab's fetch first.
+        var priorities = [
+            Methanal.Widgets.PRIORITY_VISIBLE,
+            Methanal.Widgets.PRIORITY_NORMAL];
+        for (var i = 0; i < priorities.length; ++i) {
+            for (var j = 0; j < pendingFetches.length; ++j) {
+                var tab = pendingFetches[j];
+                if (self._getFetchPriority(tab) === priorities[i]) {
+                    self.fetchTabContent(tab);
+                }
+            }
+        }
     });
 
 
@@ -2216,7 +3315,7 @@ Divmod.Class.subclass(Methanal.Widgets, 'TabGroup').methods(
  */
 Methanal.Widgets.RemoteContentWidget.subclass(Methanal.Widgets, 'Tab').methods(
     function __init__(self, node, args) {
-        Methanal.Widgets.Tab.upcall(self, '__init__', node);
+        Methanal.Widgets.Tab.upcall(self, '__init__', node, args.cachePolicy);
         self.id = args.id;
         self.title = args.title;
         self.selected = args.selected;
@@ -2238,6 +3337,23 @@ Methanal.Widgets.RemoteContentWidget.subclass(Methanal.Widgets, 'Tab').methods(
     },
 
 
+    /**
+     * Fetch the content widget, once the TabView's scheduler runs the fetch
+     * scheduled by L{Methanal.Widgets.TabView.fetchTabContent}.
+     */
+    function fetchScheduledContent(self) {
+        return self.fetchContent('content');
+    },
+
+
+    /**
+     * Should this tab's content be prefetched?
+     */
+    function wantsPrefetch(self) {
+        return false;
+    },
+
+
     /**
      * Get the class name to use for this tab's label.
      *
@@ -2297,7 +3413,7 @@ Methanal.Widgets.Tab.subclass(Methanal.Widgets, 'StaticTab');
 Methanal.Widgets.Tab.subclass(Methanal.Widgets, 'DynamicTab').methods(
     function nodeInserted(self) {
         Methanal.Widgets.DemandTab.upcall(self, 'nodeInserted');
-        self.updateContent();
+        self.widgetParent.fetchTabContent(self);
     });
 
 
@@ -2306,9 +3422,10 @@ Methanal.Widgets.Tab.subclass(Methanal.Widgets, 'DynamicTab').methods(
  * On-demand content tab container.
  *
  * Content is only requested, from the server, and inserted when the tab is
- * selected. Selecting the tab always retrieves new content; selecting the tab
- * before a previous fetch attempt has completed will result in that data being
- * discarded and a new fetch occurring.
+ * selected. Unless the cache policy allows previously fetched content to be
+ * reused, selecting the tab always retrieves new content, through the
+ * TabView's fetch scheduler; selecting the tab while its content is already
+ * being fetched waits for that fetch instead.
  */
 Methanal.Widgets.Tab.subclass(Methanal.Widgets, 'DemandTab').methods(
     function getLabelClassName(self) {
@@ -2316,9 +3433,37 @@ Methanal.Widgets.Tab.subclass(Methanal.Widgets, 'DemandTab').methods(
     },
 
 
+    /**
+     * Content is only worth prefetching if it will be reused when the tab is
+     * selected, and hasn't been fetched, or isn't being fetched, already.
+     */
+    function wantsPrefetch(self) {
+        return (self.cachePolicy !== null &&
+                self._currentRemoteWidgets['content'] === undefined &&
+                !self.isFetching('content'));
+    },
+
+
+    /**
+     * Reuse the cached content, if the cache policy allows it.
+     */
+    function fetchScheduledContent(self) {
+        return self.updateCachedContent('content');
+    },
+
+
+    /**
+     * Select the tab, scheduling a fetch of its content unless the content,
+     * for example from a prefetch, is already being fetched.
+     *
+     * Tabs selected while the TabView is loading are selected again once it
+     * has finished loading, their content is only fetched then.
+     */
     function select(self) {
         Methanal.Widgets.DemandTab.upcall(self, 'select');
-        self.updateContent();
+        if (self.widgetParent.fullyLoaded && !self.isFetching('content')) {
+            self.widgetParent.fetchTabContent(self);
+        }
     });
 
 
@@ -2331,8 +3476,8 @@ Methanal.Widgets.Tab.subclass(Methanal.Widgets, 'DemandTab').methods(
  */
 Methanal.Widgets.RemoteContentWidget.subclass(Methanal.Widgets,
                                               'Expander').methods(
-    function __init__(self, node, expanded) {
-        Methanal.Widgets.Expander.upcall(self, '__init__', node);
+    function __init__(self, node, expanded, cachePolicy /*=null*/) {
+        Methanal.Widgets.Expander.upcall(self, '__init__', node, cachePolicy);
         self.expanded = expanded;
     },
 
@@ -2426,9 +3571,12 @@ Methanal.Widgets.Expander.subclass(Methanal.Widgets, 'DynamicExpander').methods(
 
 /**
  * Collapsable container with dynamically loaded content upon being expanded.
+ *
+ * Unless the cache policy allows previously fetched content to be reused, the
+ * content is fetched every time the expander is expanded.
  */
 Methanal.Widgets.Expander.subclass(Methanal.Widgets, 'DemandExpander').methods(
     function expand(self) {
         Methanal.Widgets.DemandExpander.upcall(self, 'expand');
-        self.updateContent();
+        self.updateCachedContent('content');
     });
@@ -1,4 +1,10 @@
+import copy
+import threading
+from functools import partial
+
+from twisted.internet.threads import deferToThreadPool
 from twisted.python.deprecate import deprecatedModuleAttribute
+from twisted.python.threadpool import ThreadPool
 from twisted.python.versions import Version
 
 from axiom import attributes
@@ -18,6 +24,25 @@ constraint = Expose(
 
 
 
+_constraintNames = {}
+
+def _getConstraintNames(cls):
+    """
+    Get the names of the constraints exposed by a parameter class.
+
+    The names are only looked up, by walking the class, once per class.
+
+    @rtype: C{tuple} of C{str}
+    @return: Constraint names, in the order they are applied
+    """
+    names = _constraintNames.get(cls)
+    if names is None:
+        names = _constraintNames[cls] = tuple(
+            constraint.exposedMethodNames(cls))
+    return names
+
+
+
 class Value(object):
     """
     A simple value in a model.
@@ -29,8 +54,12 @@ class Value(object):
 
     @type doc: C{unicode}
     @ivar doc: A long description of this parameter
+
+    @type externalConstraints: C{list} of C{callable}
+    @ivar externalConstraints: Constraints, such as L{mandatory}, applied to
+        this parameter in addition to those exposed by its class
     """
-    def __init__(self, name, value=None, doc=None, **kw):
+    def __init__(self, name, value=None, doc=None, constraints=None, **kw):
         """
         Initialise the parameter.
 
@@ -42,8 +71,16 @@ class Value(object):
         @type doc: C{unicode}
         @ivar doc: A long description of this parameter, or C{None} to use the
             parameter's name
+
+        @type constraints: C{iterable} of C{callable}
+        @param constraints: External constraints to apply to this parameter,
+            or C{None} for no external constraints
         """
         super(Value, self).__init__(**kw)
+        self._constraints = None
+        if constraints is None:
+            constraints = []
+        self.externalConstraints = list(constraints)
         self.name = name
         self.value = value
         if doc is None:
@@ -70,6 +107,42 @@ class Value(object):
         return cls(**kw)
 
 
+    def addConstraint(self, constraint):
+        """
+        Apply an external constraint to this parameter.
+
+        @type constraint: C{callable}
+        @param constraint: Called with a value to validate, returning a
+            descriptive message if the value is invalid or C{None} if it is
+            valid
+        """
+        self.externalConstraints.append(constraint)
+        self._constraints = None
+
+
+    def getConstraints(self):
+        """
+        Get the constraints applied to this parameter.
+
+        Exposed constraints are resolved once, the first time they are needed,
+        which includes any exposed on this instance before that point;
+        constraints added after that should be added with L{addConstraint}.
+
+        @rtype: C{list} of C{callable}
+        @return: Bound exposed constraints, in name order, followed by
+            external constraints
+        """
+        if self._constraints is None:
+            names = set(_getConstraintNames(type(self)))
+            names.update(
+                name for name, value in vars(self).iteritems()
+                if constraint in getattr(value, 'exposedThrough', []))
+            self._constraints = [
+                getattr(self, name) for name in sorted(names)]
+            self._constraints.extend(self.externalConstraints)
+        return self._constraints
+
+
     def validate(self, value):
         """
         Validate a value provided for this parameter against all constraints.
@@ -77,8 +150,8 @@ class Value(object):
         If any constraints were violated a descriptive message is returned,
         otherwise C{None} is returned upon successful validation.
         """
-        for constraintName in constraint.exposedMethodNames(self):
-            result = constraint.get(self, constraintName)(value)
+        for func in self.getConstraints():
+            result = func(value)
             if result is not None:
                 return result
 
@@ -90,6 +163,16 @@ class Value(object):
         return self.validate(value) is None
 
 
+    def getErrors(self):
+        """
+        Validate this parameter's current value.
+
+        @return: A descriptive message if validation failed, otherwise
+            C{None}
+        """
+        return self.validate(self.value)
+
+
     def getValue(self):
         """
         Retrieve the value for this parameter.
@@ -185,6 +268,17 @@ class ReferenceParameter(Value):
         return get, set
 
 
+    def getErrors(self):
+        """
+        Validate all of the referenced model's parameters.
+
+        @rtype: C{dict} or C{None}
+        @return: The errors from L{Model.validateAll}, or C{None} if there
+            were none
+        """
+        return self.model.validateAll() or None
+
+
     def getValue(self):
         return self.model.process()
 
@@ -231,11 +325,152 @@ def mandatory(value):
 
 
 
+class ThreadPoolExecutor(object):
+    """
+    Execution policy that runs model callbacks in a bounded thread pool.
+
+    The thread pool is started when the first callback is executed and
+    stopped when the reactor shuts down, or L{stop} is called.
+
+    Callbacks run by an executor must not use an Axiom store, stores may
+    only be used from the thread that opened them.
+
+    @type maxThreads: C{int}
+    @ivar maxThreads: Maximum number of callbacks to run concurrently
+
+    @type pool: C{twisted.python.threadpool.ThreadPool}
+    @ivar pool: Thread pool callbacks are run in
+
+    @type queued: C{int}
+    @ivar queued: Number of callbacks waiting for a thread
+
+    @type active: C{int}
+    @ivar active: Number of callbacks currently running
+
+    @type completed: C{int}
+    @ivar completed: Number of callbacks that returned a result
+
+    @type failed: C{int}
+    @ivar failed: Number of callbacks that raised an exception
+
+    @type maxQueued: C{int}
+    @ivar maxQueued: Largest value L{queued} has reached
+    """
+    def __init__(self, maxThreads=4, name=None, reactor=None):
+        """
+        Initialise the executor.
+
+        @type  maxThreads: C{int}
+        @param maxThreads: Maximum number of callbacks to run concurrently
+
+        @type  name: C{str}
+        @param name: Thread pool name, or C{None}
+
+        @param reactor: Reactor to deliver results with, or C{None} for the
+            global reactor
+        """
+        if reactor is None:
+            from twisted.internet import reactor
+        self.reactor = reactor
+        self.maxThreads = maxThreads
+        self.pool = ThreadPool(minthreads=0, maxthreads=maxThreads, name=name)
+        self.queued = 0
+        self.active = 0
+        self.completed = 0
+        self.failed = 0
+        self.maxQueued = 0
+        self._lock = threading.Lock()
+        self._shutdownID = None
+
+
+    def start(self):
+        """
+        Start the thread pool, if it is not already running.
+        """
+        if not self.pool.started:
+            self.pool.start()
+            self._shutdownID = self.reactor.addSystemEventTrigger(
+                'during', 'shutdown', self.stop)
+
+
+    def stop(self):
+        """
+        Stop the thread pool, waiting for running callbacks to finish.
+        """
+        if self._shutdownID is not None:
+            try:
+                self.reactor.removeSystemEventTrigger(self._shutdownID)
+            except ValueError:
+                pass
+            self._shutdownID = None
+        if self.pool.started:
+            self.pool.stop()
+
+
+    def _run(self, f):
+        """
+        Run C{f} in a thread pool thread, keeping track of metrics.
+        """
+        with self._lock:
+            self.queued -= 1
+            self.active += 1
+        try:
+            result = f()
+        except:
+            with self._lock:
+                self.active -= 1
+                self.failed += 1
+            raise
+        with self._lock:
+            self.active -= 1
+            self.completed += 1
+        return result
+
+
+    def execute(self, f):
+        """
+        Run a callable in the thread pool.
+
+        @type  f: C{callable} taking no arguments
+
+        @rtype: C{Deferred}
+        @return: A C{Deferred} that fires, in the reactor thread, with the
+            result of C{f}
+        """
+        self.start()
+        with self._lock:
+            self.queued += 1
+            self.maxQueued = max(self.maxQueued, self.queued)
+        return deferToThreadPool(self.reactor, self.pool, self._run, f)
+
+
+    def getMetrics(self):
+        """
+        Get the executor's concurrency and queue-depth metrics.
+
+        @rtype: C{dict} mapping C{str} to C{int}
+        """
+        with self._lock:
+            return {
+                'maxThreads': self.maxThreads,
+                'queued': self.queued,
+                'active': self.active,
+                'completed': self.completed,
+                'failed': self.failed,
+                'maxQueued': self.maxQueued}
+
+
+
 class Model(object):
     """
     A Methanal form model.
+
+    @type executor: L{ThreadPoolExecutor}
+    @ivar executor: Execution policy for L{callback}, or C{None} to invoke it
+        synchronously in the reactor thread
     """
-    def __init__(self, params=[], callback=lambda **d: d, doc=u''):
+    def __init__(self, params=[], callback=lambda **d: d, doc=u'',
+                 executor=None):
         """
         Initialise the model.
 
@@ -247,12 +482,17 @@ class Model(object):
 
         @type doc: C{unicode}
         @param doc: A description for the model's action
+
+        @type executor: L{ThreadPoolExecutor}
+        @param executor: Execution policy for C{callback}, or C{None} to
+            invoke it synchronously
         """
         self.params = {}
         self.attach(*params)
 
         self.callback = callback
         self.doc = doc
+        self.executor = executor
 
 
     def attach(self, *params):
@@ -268,11 +508,33 @@ class Model(object):
     def process(self):
         """
         Invoke L{self.callback} with all the model parameter data.
+
+        @return: The result of L{self.callback}, or a C{Deferred} firing with
+            it if the model has an L{executor}
         """
         data = self.getData()
+        if self.executor is not None:
+            return self.executor.execute(partial(self.callback, **data))
         return self.callback(**data)
 
 
+    def validateAll(self):
+        """
+        Validate all of the model parameters' values in one pass.
+
+        @rtype: C{dict}
+        @return: Mapping of the names of invalid parameters to their error
+            messages, or to nested mappings for parameters with sub-models;
+            empty if all parameters are valid
+        """
+        errors = {}
+        for param in self.params.itervalues():
+            error = param.getErrors()
+            if error is not None:
+                errors[param.name] = error
+        return errors
+
+
     def getData(self):
         """
         Get all of the model parameters' values.
@@ -286,6 +548,10 @@ class Model(object):
 
 
 
+_marker = object()
+
+
+
 _paramTypes = {
     attributes.integer:        Value,
     attributes.ieee754_double: Value,
@@ -294,7 +560,17 @@ _paramTypes = {
     attributes.textlist:       List,
     attributes.timestamp:      Value}
 
-def paramFromAttribute(store, attr, value, name=None):
+def _paramFactoryFromAttribute(attr, name=None):
+    """
+    Create a model parameter factory from an Axiom attribute.
+
+    @raise ValueError: If C{attr} is a reference attribute without a reference
+        type
+
+    @rtype: C{callable} taking C{store} and C{value} arguments
+    @return: Callable producing a new model parameter for C{attr}, or C{None}
+        if the attribute type is not supported
+    """
     doc = attr.doc or None
 
     if name is None:
@@ -303,22 +579,121 @@ def paramFromAttribute(store, attr, value, name=None):
     if isinstance(attr, attributes.reference):
         if attr.reftype is None:
             raise ValueError('%r has no reference type' % (attr,))
-        model = ItemModel(item=value, itemClass=attr.reftype, store=store)
-        return ReferenceParameter(name=name,
-                                  value=value,
-                                  doc=doc,
-                                  model=model)
+        def _reference(store, value):
+            model = ItemModel(item=value, itemClass=attr.reftype, store=store)
+            return ReferenceParameter(name=name,
+                                      value=value,
+                                      doc=doc,
+                                      model=model)
+        return _reference
     elif isinstance(attr, attributes.AbstractFixedPointDecimal):
-        return DecimalValue(name=name,
-                            value=value,
-                            doc=doc,
-                            decimalPlaces=attr.decimalPlaces)
+        def _decimal(store, value):
+            return DecimalValue(name=name,
+                                value=value,
+                                doc=doc,
+                                decimalPlaces=attr.decimalPlaces)
+        return _decimal
     else:
         factory = _paramTypes.get(type(attr))
-        if factory:
+        if factory is None:
+            return lambda store, value: None
+        def _value(store, value):
             return factory(name=name,
                            value=value,
                            doc=doc)
+        return _value
+
+
+
+def paramFromAttribute(store, attr, value, name=None):
+    return _paramFactoryFromAttribute(attr, name)(store, value)
+
+
+
+class ModelTemplate(object):
+    """
+    Model parameter factories derived, once, from an Axiom item schema.
+
+    Use L{getModelTemplate} to retrieve a shared template for an item type.
+
+    @type itemClass: C{type}
+    @ivar itemClass: Item type whose schema the template is based on
+
+    @type ignoredAttributes: C{frozenset} of C{str}
+    @ivar ignoredAttributes: Names of attributes that have no parameters
+    """
+    def __init__(self, itemClass, ignoredAttributes=frozenset()):
+        self.itemClass = itemClass
+        self.ignoredAttributes = frozenset(ignoredAttributes)
+        self._factories = [
+            (name, attr, _paramFactoryFromAttribute(attr, name))
+            for name, attr in itemClass.getSchema()
+            if name not in self.ignoredAttributes]
+
+
+    def __repr__(self):
+        return '<%s itemClass=%r ignoredAttributes=%r>' % (
+            type(self).__name__,
+            self.itemClass,
+            sorted(self.ignoredAttributes))
+
+
+    def createParams(self, store, item=None):
+        """
+        Construct new model parameters.
+
+        @type store: L{axiom.store.Store}
+        @param store: Store used for reference attributes in the item schema
+
+        @type item: L{axiom.item.Item}
+        @param item: Item instance used for retrieving attribute values, or
+            C{None} to use the attribute's default
+
+        @rtype: C{list} of model parameters
+        """
+        params = []
+        for name, attr, factory in self._factories:
+            if item is not None:
+                value = getattr(item, name)
+            else:
+                value = attr.default
+            params.append(factory(store, value))
+        return params
+
+
+
+_modelTemplates = {}
+
+def getModelTemplate(itemClass, ignoredAttributes=frozenset()):
+    """
+    Get the shared L{ModelTemplate} for an item type.
+
+    Templates are built the first time they are requested and reused after
+    that.
+
+    @type itemClass: C{type}
+
+    @type ignoredAttributes: C{iterable} of C{str}
+    @param ignoredAttributes: Names of attributes to skip creating parameters
+        for
+
+    @rtype: L{ModelTemplate}
+    """
+    key = itemClass, frozenset(ignoredAttributes)
+    template = _modelTemplates.get(key)
+    if template is None:
+        template = _modelTemplates[key] = ModelTemplate(*key)
+    return template
+
+
+
+def clearModelTemplates():
+    """
+    Discard all shared L{ModelTemplate}s.
+
+    This is only necessary if an item type's schema is modified at runtime.
+    """
+    _modelTemplates.clear()
 
 
 
@@ -326,6 +701,9 @@ def paramsFromSchema(store, itemClass, item=None, ignoredAttributes=set()):
     """
     Construct model parameters from an Axiom item schema.
 
+    The schema is only inspected the first time parameters are constructed for
+    a given item type and set of ignored attributes, see L{getModelTemplate}.
+
     @type store: L{axiom.store.Store}
     @param store: Store used for reference attributes in the item schema
 
@@ -342,22 +720,25 @@ def paramsFromSchema(store, itemClass, item=None, ignoredAttributes=set()):
 
     @rtype: C{iterable} of model parameters
     """
-    for name, attr in itemClass.getSchema():
-        if name in ignoredAttributes:
-            continue
-
-        if item is not None:
-            value = getattr(item, name)
-        else:
-            value = attr.default
-
-        yield paramFromAttribute(store, attr, value, name)
+    template = getModelTemplate(itemClass, ignoredAttributes)
+    return iter(template.createParams(store, item))
 
 
 
 class ItemModelBase(Model):
     """
     A model backed by an item or item class.
+
+    Only parameters whose values differ from the values they had when they
+    were attached, or last stored, are written back to an existing item.
+
+    @type loadedValues: C{dict} mapping C{str} to values
+    @ivar loadedValues: Values of the model parameters, when they were
+        attached or last stored; see L{rememberValue}
+
+    @type changed: C{frozenset} of C{str}
+    @ivar changed: Names of the parameters whose values were written to the
+        item by the most recent call to L{storeData}, for use by L{stored}
     """
     def __init__(self, item=None, itemClass=None, store=None, doc=u'Save',
                  **kw):
@@ -379,7 +760,13 @@ class ItemModelBase(Model):
             instance for, or C{None} to use the type of L{item}
 
         @type store: C{axiom.store.Store}
+
+        @raise ValueError: If an executor is given for a model backed by a
+            store, store transactions cannot be run outside the reactor
+            thread
         """
+        self.loadedValues = {}
+        self.changed = frozenset()
         super(ItemModelBase, self).__init__(
             callback=self.storeData, doc=doc, **kw)
 
@@ -394,6 +781,46 @@ class ItemModelBase(Model):
 
         self.itemClass = itemClass or type(item)
         self.store = store or item.store
+        if self.executor is not None and self.store is not None:
+            raise ValueError('Store-backed models cannot use an executor')
+
+
+    def attach(self, *params):
+        """
+        Attach parameters to this model, remembering their current values.
+        """
+        super(ItemModelBase, self).attach(*params)
+        for param in params:
+            self.rememberValue(param.name, param.value)
+
+
+    def rememberValue(self, name, value):
+        """
+        Remember a parameter's value in L{loadedValues}.
+
+        Lists, dictionaries and sets are copied, so that changing the
+        parameter's value in place is still seen as a change.
+        """
+        if isinstance(value, (list, dict, set)):
+            value = copy.copy(value)
+        self.loadedValues[name] = value
+
+
+    def getChanges(self, data):
+        """
+        Determine which model data differs from L{loadedValues}.
+
+        @type  data: C{dict} mapping C{str} to values
+        @param data: Model data
+
+        @rtype: C{dict} mapping C{str} to values
+        @return: The subset of C{data} that has changed
+        """
+        changes = {}
+        for name, value in data.iteritems():
+            if self.loadedValues.get(name, _marker) != value:
+                changes[name] = value
+        return changes
 
 
     def _storeData(self, data):
@@ -406,6 +833,8 @@ class ItemModelBase(Model):
         else:
             for name, value in data.iteritems():
                 setattr(self.item, name, value)
+        for name, value in data.iteritems():
+            self.rememberValue(name, value)
         return self.stored(self.item)
 
 
@@ -413,12 +842,18 @@ class ItemModelBase(Model):
         """
         Model callback.
 
-        Write model parameter values back to our item, creating a new one if
-        no item instance was given.
+        Write changed model parameter values back to our item, creating a new
+        one if no item instance was given. If there are no changes to an
+        existing item, no transaction is performed.
 
         @rtype: C{axiom.item.Item}
         @return: The newly modified or created item
         """
+        if self.item is not None:
+            data = self.getChanges(data)
+        self.changed = frozenset(data)
+        if self.item is not None and not data:
+            return self.stored(self.item)
 
         if self.store is not None:
             return self.store.transact(self._storeData, data)
@@ -438,6 +873,9 @@ class ItemModelBase(Model):
         """
         Callback for saved item.
 
+        The names of the parameters that were written to the item are
+        available as L{changed}.
+
         @param item: The modified or newly-created item.
         """
 
@@ -499,6 +937,8 @@ def loadFromItem(model, item):
     """
     for name, param in model.params.iteritems():
         param.value = getattr(item, name)
+        if isinstance(model, ItemModelBase):
+            model.rememberValue(name, param.value)
 
 
 
@@ -0,0 +1,52 @@
+"""
+Tests for L{methanal.benchmark}.
+"""
+import json
+from StringIO import StringIO
+
+from twisted.trial import unittest
+from twisted.python import usage
+
+from methanal import benchmark
+
+
+
+class BenchmarkTests(unittest.TestCase):
+    """
+    Tests for L{methanal.benchmark}.
+    """
+    def test_runBenchmarks(self):
+        """
+        Every registered benchmark runs and produces timing results.
+        """
+        names = benchmark.getBenchmarkNames()
+        self.assertIn('tableArgs', names)
+        for name in names:
+            result = benchmark.runBenchmark(name, 2, 2)
+            self.assertEquals(result['name'], name)
+            self.assertEquals(result['size'], 2)
+            self.assertEquals(result['iterations'], 2)
+            self.assertTrue(
+                0 <= result['min'] <= result['mean'] <= result['max'])
+
+
+    def test_main(self):
+        """
+        L{methanal.benchmark.main} writes each result as a line of JSON.
+        """
+        stdout = StringIO()
+        benchmark.main(
+            ['--size=1', '--iterations=1', 'modelProcess', 'enumLookups'],
+            stdout)
+        results = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        self.assertEquals(
+            [result['name'] for result in results],
+            [u'modelProcess', u'enumLookups'])
+
+
+    def test_unknownBenchmark(self):
+        """
+        Specifying an unknown benchmark is a usage error.
+        """
+        self.assertRaises(
+            usage.UsageError, benchmark.main, ['notABenchmark'], StringIO())
@@ -1,6 +1,10 @@
 from twisted.trial import unittest
 
-from methanal.imethanal import IEnumeration
+from axiom.store import Store
+from axiom.item import Item
+from axiom.attributes import integer, text
+
+from methanal.imethanal import IEnumeration, ISearchableEnumeration
 from methanal import enums, errors
 # Adapter registration side-effect.
 from methanal import view
@@ -146,38 +150,100 @@ class _EnumTestsMixin(object):
         self.assertEquals(pairs, [(u'bar', u'Bar')])
 
 
+    def test_version(self):
+        """
+        An enumeration's version changes when one of its items is hidden or
+        shown, but not when an item of another enumeration is.
+        """
+        other = enums.Enum('Other', [enums.EnumItem(u'baz', u'Baz')])
+        version = self.enum.version
+        otherVersion = other.version
+        self.values[0].hidden = True
+        self.assertNotEquals(self.enum.version, version)
+        self.assertEquals(other.version, otherVersion)
+        self.assertEquals(len(list(self.enum)), len(self.values) - 1)
+
+        version = self.enum.version
+        other.get(u'baz').hidden = True
+        self.assertEquals(self.enum.version, version)
+
+
     def test_find(self):
         """
-        Finding an enumeration item by extra value gets the first matching item
-        or C{None} if there are no matches. Passing fewer or more than one
-        query raises C{ValueError}.
+        Finding an enumeration item by extra values gets the first item
+        matching all of the queries or C{None} if there are no matches.
+        Passing no queries raises C{ValueError}.
         """
         self.assertIdentical(self.enum.find(quux=u'hello'), self.values[0])
         self.assertIdentical(self.enum.find(frob=u'world'), self.values[0])
         self.assertIdentical(self.enum.find(quux=u'goodbye'), self.values[1])
+        self.assertIdentical(
+            self.enum.find(quux=u'hello', frob=u'world'), self.values[0])
 
         self.assertIdentical(self.enum.find(haha=u'nothanks'), None)
+        self.assertIdentical(
+            self.enum.find(quux=u'goodbye', frob=u'world'), None)
         self.assertRaises(ValueError, self.enum.find)
-        self.assertRaises(ValueError, self.enum.find, foo=u'foo', bar=u'bar')
 
 
     def test_findAll(self):
         """
-        Finding all enumeration items by extra value gets an iterable of all
-        matching items. Passing fewer or more than one
-        query raises C{ValueError}.
+        Finding all enumeration items by extra values gets an iterable of all
+        items, in order, matching all of the queries. Passing no queries
+        raises C{ValueError}.
         """
         results = list(self.enum.findAll(frob=u'world'))
-        self.assertEquals(len(results), 2)
-        for res in results:
-            self.assertIn(res, self.values)
+        self.assertEquals(results, [self.values[0], self.values[2]])
+        self.assertEquals(
+            list(self.enum.findAll(frob=u'world', quux=u'hello')),
+            [self.values[0]])
 
         self.assertEquals(list(self.enum.findAll(asdf=u'qwer')), [])
+        self.assertEquals(
+            list(self.enum.findAll(frob=u'world', quux=u'goodbye')), [])
 
-        # Consume the generators to trigger the exception.
+        # Consume the generator to trigger the exception.
         self.assertRaises(ValueError, list, self.enum.findAll())
-        self.assertRaises(ValueError, list, self.enum.findAll(foo=u'foo',
-                                                              bar=u'bar'))
+
+
+    def test_findAllHidden(self):
+        """
+        Hidden enumeration items are not found, even when they are hidden
+        after they have been indexed.
+        """
+        self.assertEquals(
+            list(self.enum.findAll(frob=u'world')),
+            [self.values[0], self.values[2]])
+        self.values[0].hidden = True
+        self.assertEquals(
+            list(self.enum.findAll(frob=u'world')), [self.values[2]])
+        self.assertEquals(list(self.enum), self.values[1:])
+        self.values[0].hidden = False
+        self.assertEquals(list(self.enum), self.values)
+
+
+    def test_search(self):
+        """
+        Searching finds at most C{limit} visible items whose descriptions
+        contain the search text, ignoring case.
+        """
+        self.assertEquals(
+            self.enum.search(u'O', 5), [self.values[0], self.values[2]])
+        self.assertEquals(self.enum.search(u'o', 1), [self.values[0]])
+        self.values[0].hidden = True
+        self.assertEquals(self.enum.search(u'o', 5), [self.values[2]])
+        self.values[0].hidden = False
+
+
+    def test_findAllUnhashable(self):
+        """
+        Enumeration items can be found by extra values that are not hashable.
+        """
+        values = [
+            enums.EnumItem(u'foo', u'Foo', tags=[u'a']),
+            enums.EnumItem(u'bar', u'Bar', tags=[u'b'])]
+        enum = enums.Enum('Doc', values)
+        self.assertEquals(list(enum.findAll(tags=[u'b'])), [values[1]])
 
 
     def test_iterator(self):
@@ -392,3 +458,118 @@ class ObjectEnumTests(_EnumTestsMixin, unittest.TestCase):
             repr(enums.ObjectEnum(lorem, [])),
             '<ObjectEnum """Lorem ipsum dolor sit amet, consectetur adipiscing elit.'
             ' In vitae sem...""">')
+
+
+
+class _QueryEnumItem(Item):
+    """
+    An item enumerated by L{QueryEnumTests}.
+    """
+    name = text()
+    number = integer()
+
+
+
+class QueryEnumTests(unittest.TestCase):
+    """
+    Tests for L{methanal.enums.QueryEnum}.
+    """
+    def setUp(self):
+        self.store = Store()
+        self.items = [
+            _QueryEnumItem(store=self.store, name=u'Item %d' % (i,), number=i)
+            for i in xrange(10)]
+        self.enum = enums.QueryEnum(
+            u'Doc',
+            self.store.query(
+                _QueryEnumItem,
+                _QueryEnumItem.number >= 5,
+                sort=_QueryEnumItem.number.ascending),
+            searchAttribute=_QueryEnumItem.name)
+
+
+    def test_iterator(self):
+        """
+        Iterating the enumeration creates an enumeration item for each item
+        matched by the query, in query order.
+        """
+        self.assertEquals(
+            self.enum.asPairs(),
+            [(item, item.name) for item in self.items[5:]])
+
+
+    def test_get(self):
+        """
+        Getting an item the query matches creates an enumeration item for it,
+        with the store ID as the C{'id'} extra value. Getting anything else
+        raises L{InvalidEnumItem}.
+        """
+        item = self.items[6]
+        enumItem = self.enum.get(item)
+        self.assertIdentical(enumItem.value, item)
+        self.assertEquals(enumItem.desc, u'Item 6')
+        self.assertEquals(enumItem.id, unicode(item.storeID))
+        self.assertEquals(self.enum.getDesc(item), u'Item 6')
+
+        self.assertRaises(errors.InvalidEnumItem, self.enum.get, self.items[1])
+        self.assertRaises(errors.InvalidEnumItem, self.enum.get, u'Item 6')
+        self.assertEquals(self.enum.getDesc(self.items[1]), u'')
+
+
+    def test_find(self):
+        """
+        Items are found by their store ID, only if the query matches them.
+        Items can also be found by other extra values.
+        """
+        item = self.items[7]
+        self.assertIdentical(
+            self.enum.find(id=unicode(item.storeID)).value, item)
+        self.assertIdentical(
+            self.enum.find(id=unicode(self.items[2].storeID)), None)
+        self.assertIdentical(self.enum.find(id=u'nope'), None)
+        self.assertIdentical(self.enum.find(id=u'31337'), None)
+        self.assertEquals(
+            [i.value for i in self.enum.findAll(id=unicode(item.storeID))],
+            [item])
+        self.assertIdentical(
+            self.enum.find(id=unicode(item.storeID), bar=u'baz'), None)
+        self.assertRaises(ValueError, list, self.enum.findAll())
+
+
+    def test_search(self):
+        """
+        Searching finds at most C{limit} matching items, in query order.
+        """
+        self.assertEquals(
+            [i.value for i in self.enum.search(u'item', 2)],
+            self.items[5:7])
+        self.assertEquals(
+            [i.value for i in self.enum.search(u'm 9', 5)],
+            self.items[9:])
+        self.assertEquals(self.enum.search(u'm 1', 5), [])
+
+
+    def test_searchLiterally(self):
+        """
+        C{%} and C{_} in the search text are matched literally.
+        """
+        item = _QueryEnumItem(store=self.store, name=u'50% off', number=10)
+        self.assertEquals(
+            [i.value for i in self.enum.search(u'%', 5)], [item])
+        self.assertEquals(self.enum.search(u'm_', 5), [])
+
+
+    def test_describe(self):
+        """
+        Enumerations need a way to describe their items, but enumerations
+        described by a callable need not be searchable.
+        """
+        self.assertRaises(ValueError,
+            enums.QueryEnum, u'Doc', self.store.query(_QueryEnumItem))
+        enum = enums.QueryEnum(
+            u'Doc', self.store.query(_QueryEnumItem),
+            describe=lambda item: unicode(item.number))
+        self.assertEquals(enum.getDesc(self.items[3]), u'3')
+        self.assertFalse(ISearchableEnumeration.providedBy(enum))
+        self.assertTrue(ISearchableEnumeration.providedBy(self.enum))
+        self.assertRaises(ValueError, enum.search, u'3', 1)
@@ -1,4 +1,6 @@
 from twisted.trial.unittest import TestCase
+from twisted.internet.defer import Deferred
+from twisted.python import threadable
 from twisted.python.versions import Version
 from twisted.python.deprecate import _getDeprecationWarningString
 from twisted.python.deprecate import DEPRECATION_WARNING_FORMAT
@@ -39,6 +41,48 @@ class MethanalTests(TestCase):
         self.assertRaises(errors.ConstraintError, model.process)
 
 
+    def test_constraintNamesCached(self):
+        """
+        The exposed constraints of a parameter class are only looked up once,
+        no matter how many instances of the class are validated.
+        """
+        calls = []
+        exposedMethodNames = constraint.exposedMethodNames
+        def _exposedMethodNames(instance):
+            calls.append(instance)
+            return exposedMethodNames(instance)
+        self.patch(mmodel, '_constraintNames', {})
+        self.patch(constraint, 'exposedMethodNames', _exposedMethodNames)
+
+        for i in xrange(3):
+            param = List(name='param')
+            self.assertTrue(param.isValid([1]))
+            self.assertFalse(param.isValid(1))
+        self.assertEquals(calls, [List])
+
+
+    def test_externalConstraints(self):
+        """
+        External constraints are applied after the constraints exposed by the
+        parameter's class, and can be specified initially or added later.
+        """
+        param = List(name='param', constraints=[mmodel.mandatory])
+        self.assertEquals(param.validate(None), u'Value is mandatory')
+        self.assertEquals(
+            param.getConstraints(),
+            [param.isIterable, mmodel.mandatory])
+
+        def _notEmpty(value):
+            if not value:
+                return u'Value must not be empty'
+        param.addConstraint(_notEmpty)
+        self.assertEquals(param.validate([]), u'Value must not be empty')
+        self.assertTrue(param.isValid([1]))
+        self.assertEquals(
+            param.getConstraints(),
+            [param.isIterable, mmodel.mandatory, _notEmpty])
+
+
     def test_enumeration(self):
         param = Enum(name='param', values=range(5))
         self.assertTrue(param.isValid(3))
@@ -54,6 +98,79 @@ class MethanalTests(TestCase):
         self.assertEquals(result, dict(foo=4, bar=u'quux'))
 
 
+    def test_processExecutor(self):
+        """
+        Models with an executor invoke their callback in a thread pool and
+        return a C{Deferred} firing with the callback's result.
+        """
+        def _callback(**data):
+            data['inIOThread'] = threadable.isInIOThread()
+            return data
+
+        executor = mmodel.ThreadPoolExecutor(maxThreads=2)
+        self.addCleanup(executor.stop)
+        model = Model(
+            params=[Value(name='foo', value=4)],
+            callback=_callback,
+            executor=executor)
+        d = model.process()
+        self.assertIsInstance(d, Deferred)
+
+        def _checkResult(result):
+            self.assertEquals(result, dict(foo=4, inIOThread=False))
+            metrics = executor.getMetrics()
+            self.assertEquals(metrics['maxThreads'], 2)
+            self.assertEquals(metrics['queued'], 0)
+            self.assertEquals(metrics['active'], 0)
+            self.assertEquals(metrics['completed'], 1)
+            self.assertEquals(metrics['failed'], 0)
+            self.assertEquals(metrics['maxQueued'], 1)
+        return d.addCallback(_checkResult)
+
+
+    def test_processExecutorFailure(self):
+        """
+        Exceptions raised by callbacks run by an executor are delivered as
+        failures and counted.
+        """
+        def _callback(**data):
+            raise ValueError('Broken')
+
+        executor = mmodel.ThreadPoolExecutor()
+        self.addCleanup(executor.stop)
+        model = Model(params=[], callback=_callback, executor=executor)
+        d = self.assertFailure(model.process(), ValueError)
+        d.addCallback(
+            lambda ign: self.assertEquals(executor.getMetrics()['failed'], 1))
+        return d
+
+
+    def test_validateAll(self):
+        """
+        L{methanal.model.Model.validateAll} reports the errors of every
+        invalid parameter, including those of referenced models, at once.
+        """
+        subModel = Model(
+            params=[Value(name='baz', constraints=[mmodel.mandatory])])
+        model = Model(
+            params=[
+                Value(name='foo', constraints=[mmodel.mandatory]),
+                Value(name='bar', value=u'quux',
+                      constraints=[mmodel.mandatory]),
+                List(name='lst', value=1),
+                mmodel.ReferenceParameter(name='ref', model=subModel)])
+        self.assertEquals(
+            model.validateAll(),
+            {'foo': u'Value is mandatory',
+             'lst': u'Value is not an iterable',
+             'ref': {'baz': u'Value is mandatory'}})
+
+        model.params['foo'].value = 1
+        model.params['lst'].value = []
+        subModel.params['baz'].value = 2
+        self.assertEquals(model.validateAll(), {})
+
+
     def test_repr(self):
         """
         L{methanal.model.Value} has a useful human-readable representation.
@@ -200,6 +317,69 @@ class AutoSchemaTests(TestCase):
         self.assertEquals(model.item.t, u'foo')
 
 
+    def test_itemModelExecutor(self):
+        """
+        Store-backed item models cannot use an executor.
+        """
+        self.assertRaises(ValueError,
+            ItemModel, itemClass=_DummyItem, store=self.store,
+            executor=mmodel.ThreadPoolExecutor())
+
+
+    def test_itemEditingChanges(self):
+        """
+        Only parameters whose values have changed since they were loaded are
+        written to the item, their names are available to
+        L{methanal.model.ItemModelBase.stored}, and no transaction is
+        performed when nothing changed.
+        """
+        stored = []
+        item = _DummyItem(store=self.store, t=u'bar')
+        model = ItemModel(item=item)
+        model.stored = lambda item: stored.append(model.changed)
+
+        transactions = []
+        transact = self.store.transact
+        def _transact(f, *a, **kw):
+            transactions.append(f)
+            return transact(f, *a, **kw)
+        self.patch(self.store, 'transact', _transact)
+
+        model.params['t'].value = u'foo'
+        model.process()
+        self.assertEquals(item.t, u'foo')
+        self.assertEquals(stored, [frozenset(['t'])])
+        self.assertEquals(len(transactions), 1)
+
+        model.process()
+        self.assertEquals(stored[-1], frozenset())
+        self.assertEquals(len(transactions), 1)
+
+        model.params['i'].value = 7
+        model.params['t'].value = u'bar'
+        model.process()
+        self.assertEquals((item.i, item.t), (7, u'bar'))
+        self.assertEquals(stored[-1], frozenset(['i', 't']))
+        self.assertEquals(len(transactions), 2)
+
+
+    def test_itemEditingInPlace(self):
+        """
+        Changing a parameter's list value in place, after it was loaded or
+        stored, is written to the item.
+        """
+        item = _DummyItem(store=self.store, tl=[u'a'])
+        model = ItemModel(item=item)
+        model.params['tl'].value.append(u'b')
+        model.process()
+        self.assertEquals(item.tl, [u'a', u'b'])
+
+        model.params['tl'].value.append(u'c')
+        model.process()
+        self.assertEquals(item.tl, [u'a', u'b', u'c'])
+        self.assertEquals(model.changed, frozenset(['tl']))
+
+
     def test_itemEditing(self):
         model = ItemModel(item=_DummyItem(store=self.store))
         model.params['i'].value = 7
@@ -242,6 +422,76 @@ class AutoSchemaTests(TestCase):
 
 
 
+class ModelTemplateTests(TestCase):
+    """
+    Tests for L{methanal.model.ModelTemplate} and
+    L{methanal.model.getModelTemplate}.
+    """
+    def setUp(self):
+        self.store = Store()
+        self.addCleanup(mmodel.clearModelTemplates)
+        mmodel.clearModelTemplates()
+
+
+    def test_shared(self):
+        """
+        L{methanal.model.getModelTemplate} returns the same template for the
+        same item type and ignored attributes, only inspecting the item schema
+        once.
+        """
+        calls = []
+        getSchema = _DummyItem.getSchema
+        def _getSchema():
+            calls.append(_DummyItem)
+            return getSchema()
+        self.patch(_DummyItem, 'getSchema', staticmethod(_getSchema))
+
+        template = mmodel.getModelTemplate(_DummyItem, ['tl'])
+        self.assertIdentical(
+            mmodel.getModelTemplate(_DummyItem, set(['tl'])), template)
+        ItemModel(itemClass=_DummyItem, store=self.store,
+                  ignoredAttributes=set(['tl']))
+        ItemModel(itemClass=_DummyItem, store=self.store,
+                  ignoredAttributes=set(['tl']))
+        self.assertEquals(calls, [_DummyItem])
+        self.assertNotIdentical(
+            mmodel.getModelTemplate(_DummyItem), template)
+
+
+    def test_createParams(self):
+        """
+        L{methanal.model.ModelTemplate.createParams} creates new parameters
+        each time, with values from the item or attribute defaults.
+        """
+        template = mmodel.getModelTemplate(_DummyItem, ['tl'])
+        item = _DummyItem(store=self.store, i=7, t=u'foo')
+        params = dict(
+            (param.name, param)
+            for param in template.createParams(self.store, item))
+        self.assertEquals(sorted(params), ['i', 't'])
+        self.assertEquals(params['i'].value, 7)
+        self.assertEquals(params['t'].value, u'foo')
+        self.assertEquals(params['t'].doc, u'param t')
+
+        otherParams = template.createParams(self.store)
+        self.assertEquals(
+            [param.value for param in otherParams], [5, None])
+        self.assertNotIdentical(otherParams[0], params['i'])
+
+
+    def test_references(self):
+        """
+        Parameters for reference attributes have their own nested models,
+        which are created for each set of parameters.
+        """
+        template = mmodel.getModelTemplate(_DummyParentItem)
+        [param1] = template.createParams(self.store)
+        [param2] = template.createParams(self.store)
+        self.assertNotIdentical(param1.model, param2.model)
+        self.assertIdentical(param1.model.itemClass, _DummyChildItem)
+
+
+
 class _DummyControl(object):
     invoked = 0
 
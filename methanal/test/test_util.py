@@ -2,8 +2,11 @@ from decimal import Decimal
 
 from twisted.trial.unittest import TestCase
 
+from nevow.athena import LiveElement, LivePage
+
 from methanal.util import (
-    collectMethods, getArgsDict, Porthole, CurrencyFormatter, DecimalFormatter)
+    collectMethods, clearMethodCache, getArgsDict, Porthole, CurrencyFormatter,
+    DecimalFormatter, releaseFragment, countLiveFragments)
 
 
 
@@ -105,6 +108,115 @@ class MethodCollectorTests(TestCase):
         self.assertRaises(TypeError, getArgsDict, A())
 
 
+    def test_methodCache(self):
+        """
+        Methods are collected once per class, changes to the class are only
+        noticed after L{clearMethodCache} is called.
+        """
+        class A(object):
+            def foo(self):
+                return 'A'
+
+        class B(A):
+            pass
+
+        self.addCleanup(clearMethodCache)
+        self.assertEquals([m() for m in collectMethods(B(), 'foo')], ['A'])
+        B.foo = lambda self: 'B'
+        self.assertEquals([m() for m in collectMethods(B(), 'foo')], ['A'])
+        clearMethodCache()
+        self.assertEquals(
+            [m() for m in collectMethods(B(), 'foo')], ['B', 'A'])
+
+
+    def test_argumentNamesChanged(self):
+        """
+        Argument names that a class has not produced before are checked, even
+        once the class's argument names have been checked.
+        """
+        class A(object):
+            def __init__(self, names):
+                self.names = names
+
+            def getArgs(self):
+                return dict.fromkeys(self.names, 1)
+
+        class B(A):
+            def getArgs(self):
+                return {u'bar': 2}
+
+        self.assertEquals(getArgsDict(B([u'foo'])), {u'foo': 1, u'bar': 2})
+        self.assertEquals(getArgsDict(B([])), {u'bar': 2})
+        self.assertRaises(ValueError, getArgsDict, B([u'bar']))
+        self.assertRaises(TypeError, getArgsDict, B(['baz']))
+        # Byte string names equal to names checked before are still rejected.
+        self.assertRaises(TypeError, getArgsDict, B(['foo']))
+
+
+
+class ReleaseFragmentTests(TestCase):
+    """
+    Tests for L{methanal.util.releaseFragment} and
+    L{methanal.util.countLiveFragments}.
+    """
+    def setUp(self):
+        self.page = LivePage()
+        self.page._localObjects = {}
+        self.parent = LiveElement()
+        self.parent.setFragmentParent(self.page)
+        self.child = LiveElement()
+        self.child.setFragmentParent(self.parent)
+
+
+    def test_countLiveFragments(self):
+        """
+        L{countLiveFragments} counts all the fragments attached, directly or
+        indirectly, to a parent.
+        """
+        self.assertEqual(countLiveFragments(self.page), 2)
+        self.assertEqual(countLiveFragments(self.parent), 1)
+        self.assertEqual(countLiveFragments(self.child), 0)
+
+
+    def test_release(self):
+        """
+        Releasing a fragment detaches it, and its children, from its parent
+        and page.
+        """
+        self.detached = []
+        self.parent.detached = lambda: self.detached.append(self.parent)
+        self.child.detached = lambda: self.detached.append(self.child)
+
+        self.assertTrue(releaseFragment(self.parent))
+        self.assertEqual(countLiveFragments(self.page), 0)
+        self.assertEqual(self.detached, [self.child, self.parent])
+        for fragment in [self.parent, self.child]:
+            self.assertIdentical(fragment.fragmentParent, None)
+            self.assertIdentical(fragment.page, None)
+
+
+    def test_releaseRendered(self):
+        """
+        Releasing a fragment that has been rendered removes it from the page's
+        local objects.
+        """
+        self.parent._athenaID = 1
+        self.page._localObjects[1] = self.parent
+        releaseFragment(self.parent)
+        self.assertEqual(self.page._localObjects, {})
+
+
+    def test_releaseUnattached(self):
+        """
+        Releasing C{None}, or a fragment that is not attached to a parent,
+        does nothing.
+        """
+        self.assertFalse(releaseFragment(None))
+        self.assertFalse(releaseFragment(LiveElement()))
+        releaseFragment(self.child)
+        self.assertFalse(releaseFragment(self.child))
+
+
 
 class PortholeTests(TestCase):
     """
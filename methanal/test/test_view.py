@@ -21,8 +21,8 @@ from nevow.testutil import renderLivePage
 
 from methanal import view, errors
 from methanal.imethanal import IEnumeration
-from methanal.model import ItemModel, Value, DecimalValue, Model
-from methanal.enums import Enum, EnumItem, ObjectEnum
+from methanal.model import ItemModel, Value, DecimalValue, Model, mandatory
+from methanal.enums import Enum, EnumItem, ObjectEnum, QueryEnum
 
 
 
@@ -106,6 +106,191 @@ class LiveFormTests(unittest.TestCase):
         return renderWidget(self.form).addCallback(verifyRendering)
 
 
+    def test_deltaSubmission(self):
+        """
+        When L{methanal.view.LiveForm.deltaSubmission} is C{True}, only the
+        inputs with submitted values are invoked, the other model parameters
+        keep their existing values.
+        """
+        model = Model(
+            params=[Value(name='a', value=u'a'), Value(name='b', value=u'b')])
+        form = view.LiveForm(store=None, model=model, deltaSubmission=True)
+        row = view.FormRow(parent=form)
+        view.TextInput(parent=row, name='a')
+        view.TextInput(parent=form, name='b')
+        self.assertTrue(form.getArgs()[u'deltaSubmission'])
+
+        self.assertEquals(form.invoke({u'b': u'B'}), dict(a=u'a', b=u'B'))
+        self.assertEquals(form.invoke({u'a': u'A'}), dict(a=u'A', b=u'B'))
+        self.assertEquals(form.invoke({}), dict(a=u'A', b=u'B'))
+
+
+    def test_lightweightInputs(self):
+        """
+        Inputs, and the rows created for them, in a form with
+        C{lightweightInputs} are rendered without being registered with the
+        page, and the form passes the information needed to create their
+        widgets to the client. Inputs that do not support lightweight mode are
+        rendered as normal widgets.
+        """
+        model = Model(
+            params=[Value(name='a', value=u'x'), Value(name='b')])
+        form = view.LiveForm(store=None, model=model, lightweightInputs=True)
+        class _HeavyInput(view.TextInput):
+            supportsLightweight = False
+
+        textInput = view.TextInput(parent=form, name='a')
+        heavyInput = _HeavyInput(parent=form, name='b')
+        self.assertTrue(textInput.lightweight)
+        self.assertTrue(textInput.fragmentParent.lightweight)
+        self.assertFalse(heavyInput.lightweight)
+        self.assertFalse(heavyInput.fragmentParent.lightweight)
+
+        def verifyRendering(tree):
+            page = form.page
+            lightweight = [textInput.fragmentParent, textInput]
+            self.assertEquals(
+                form.getLightweightWidgets(),
+                [[element._athenaID,
+                  element.jsClass,
+                  list(element.getInitialArguments())]
+                 for element in lightweight])
+            for element in lightweight:
+                self.assertNotIn(element, page._localObjects.values())
+                self.assertNotIn(element, page.liveFragmentChildren)
+            self.assertIn(heavyInput, page._localObjects.values())
+
+            ids = [node.get('id') for node in tree.getiterator()]
+            self.assertIn('athena:%d' % (textInput._athenaID,), ids)
+            self.assertNotIn(
+                'athena-init-args-%d' % (textInput._athenaID,), ids)
+            self.assertIn(
+                'athena-init-args-%d' % (heavyInput._athenaID,), ids)
+
+        return renderWidget(form).addCallback(verifyRendering)
+
+
+    def test_onlyLightweightInputs(self):
+        """
+        A form whose inputs are all lightweight imports the JavaScript modules
+        of its lightweight widgets, since Athena does not import them.
+        """
+        model = Model(params=[Value(name='a', value=u'x')])
+        form = view.LiveForm(store=None, model=model, lightweightInputs=True)
+        class _CustomInput(view.TextInput):
+            jsClass = u'Methanal.Tests.Util.CustomInput'
+
+        textInput = _CustomInput(parent=form, name='a')
+        self.assertTrue(textInput.lightweight)
+
+        def verifyRendering(tree):
+            sources = [node.get('src') for node in tree.getiterator()
+                       if node.tag == 'script' and node.get('src')]
+            for moduleName in ['Methanal.View', 'Methanal.Tests.Util']:
+                self.assertEquals(
+                    len([src for src in sources
+                         if src.endswith('/' + moduleName)]),
+                    1)
+
+        return renderWidget(form).addCallback(verifyRendering)
+
+
+    def test_lightweightContainers(self):
+        """
+        Explicitly created lightweight containers, and their lightweight
+        parents, become normal widgets when an input that does not support
+        lightweight mode is added to them. Their other lightweight children
+        are still created by the form.
+        """
+        model = Model(
+            params=[Value(name='a', value=u'x'), Value(name='b')])
+        form = view.LiveForm(store=None, model=model, lightweightInputs=True)
+        class _HeavyInput(view.TextInput):
+            supportsLightweight = False
+
+        group = view.FormGroup(parent=form)
+        row = view.FormRow(parent=group)
+        self.assertTrue(group.lightweight)
+        self.assertTrue(row.lightweight)
+        textInput = view.TextInput(parent=row, name='a')
+        heavyInput = _HeavyInput(parent=row, name='b')
+        self.assertTrue(textInput.lightweight)
+        self.assertFalse(heavyInput.lightweight)
+        self.assertFalse(row.lightweight)
+        self.assertFalse(group.lightweight)
+        self.assertIn(group, form.liveFragmentChildren)
+        self.assertIn(row, group.liveFragmentChildren)
+        self.assertIn(heavyInput, row.liveFragmentChildren)
+
+        def verifyRendering(tree):
+            page = form.page
+            for element in [group, row, heavyInput]:
+                self.assertIn(element, page._localObjects.values())
+            self.assertNotIn(textInput, page._localObjects.values())
+            self.assertEquals(
+                [widget[0] for widget in form.getLightweightWidgets()],
+                [textInput._athenaID])
+
+        return renderWidget(form).addCallback(verifyRendering)
+
+
+    def test_invokeValidationErrors(self):
+        """
+        Invoking a form with invalid data raises
+        L{methanal.errors.ValidationErrors} reporting every invalid parameter,
+        without calling the model's callback.
+        """
+        calls = []
+        model = Model(
+            params=[
+                Value(name='a', constraints=[mandatory]),
+                Value(name='b', constraints=[mandatory]),
+                Value(name='c')],
+            callback=lambda **d: calls.append(d))
+        form = view.LiveForm(store=None, model=model)
+        for name in 'abc':
+            view.TextInput(parent=form, name=name)
+
+        e = self.assertRaises(
+            errors.ValidationErrors,
+            form.invoke, {u'a': None, u'b': None, u'c': u'c'})
+        self.assertEquals(
+            e.errors,
+            {'a': u'Value is mandatory', 'b': u'Value is mandatory'})
+        self.assertEquals(calls, [])
+
+        form.invoke({u'a': u'a', u'b': u'b', u'c': None})
+        self.assertEquals(calls, [dict(a=u'a', b=u'b', c=None)])
+
+
+    def test_invokeValidatesOnce(self):
+        """
+        Invoking a form with valid data checks each parameter's constraints
+        once. L{methanal.errors.ConstraintError}s raised by the model's
+        callback, rather than by its parameters, are not wrapped.
+        """
+        checked = []
+        def _constraint(value):
+            checked.append(value)
+        def _callback(**data):
+            raise errors.ConstraintError(u'Callback error')
+        model = Model(
+            params=[Value(name='a', constraints=[_constraint])],
+            callback=_callback)
+        form = view.LiveForm(store=None, model=model)
+        view.TextInput(parent=form, name='a')
+
+        e = self.assertRaises(
+            errors.ConstraintError, form.invoke, {u'a': u'a'})
+        self.assertNotIsInstance(e, errors.ValidationErrors)
+        self.assertEquals(str(e), u'Callback error')
+
+        del checked[:]
+        model.callback = lambda **data: None
+        form.invoke({u'a': u'a'})
+        self.assertEquals(checked, [u'a'])
+
+
 
 class FormInputTests(unittest.TestCase):
     """
@@ -834,6 +1019,221 @@ class SelectInputTests(ChoiceInputTests):
 
 
 
+class RenderedOptionCacheTests(unittest.TestCase):
+    """
+    Tests for L{methanal.view.RenderedOptionCache}.
+    """
+    def test_getPut(self):
+        """
+        Cached markup is retrieved by key, counting hits and misses.
+        """
+        cache = view.RenderedOptionCache()
+        self.assertIdentical(cache.get('a'), None)
+        cache.put('a', '<option />')
+        self.assertEquals(cache.get('a'), '<option />')
+        self.assertEquals((cache.hits, cache.misses), (1, 1))
+        self.assertEquals(cache.size, len('<option />'))
+
+
+    def test_maxSize(self):
+        """
+        The least recently used markup is discarded when the cache exceeds
+        its maximum size, and markup larger than the maximum size is never
+        cached.
+        """
+        cache = view.RenderedOptionCache(maxSize=10)
+        cache.put('a', 'aaaa')
+        cache.put('b', 'bbbb')
+        cache.get('a')
+        cache.put('c', 'cccc')
+        self.assertIdentical(cache.get('b'), None)
+        self.assertEquals(cache.get('a'), 'aaaa')
+        self.assertEquals(cache.get('c'), 'cccc')
+        self.assertEquals(cache.size, 8)
+
+        cache.put('d', 'd' * 11)
+        self.assertIdentical(cache.get('d'), None)
+        self.assertEquals(cache.size, 8)
+
+
+
+class SelectInputOptionCacheTests(FormInputTests):
+    """
+    Tests for the caching of rendered L{methanal.view.SelectInput} options.
+    """
+    controlType = view.SelectInput
+
+
+    def setUp(self):
+        super(SelectInputOptionCacheTests, self).setUp()
+        self.cache = view.RenderedOptionCache()
+        self.patch(view.ChoiceInput, 'optionCache', self.cache)
+        self.values = Enum(
+            '',
+            [EnumItem(u'foo', u'Foo', group=u'Group'),
+             EnumItem(u'bar', u'Bar')],
+            shared=True)
+
+
+    def renderOptions(self, **kw):
+        """
+        Render a control and get the values of its options.
+        """
+        kw.setdefault('values', self.values)
+        control = self.createControl(kw)
+        def _getValues(tree):
+            return [node.get('value') for node in tree.findall('.//option')]
+        return renderWidget(control).addCallback(_getValues)
+
+
+    def test_shared(self):
+        """
+        Inputs with the same enumeration, type and name share rendered
+        options.
+        """
+        d = gatherResults([self.renderOptions(), self.renderOptions()])
+        def _checkResults(results):
+            self.assertEquals(results, [[u'foo', u'bar'], [u'foo', u'bar']])
+            self.assertEquals((self.cache.hits, self.cache.misses), (1, 1))
+            return self.renderOptions(name='other')
+        def _checkOtherName(result):
+            self.assertEquals(result, [u'foo', u'bar'])
+            self.assertEquals(self.cache.misses, 2)
+        return d.addCallback(_checkResults).addCallback(_checkOtherName)
+
+
+    def test_hidden(self):
+        """
+        Hiding an enumeration item invalidates the rendered options.
+        """
+        d = self.renderOptions()
+        def _hide(result):
+            self.assertEquals(result, [u'foo', u'bar'])
+            self.values.get(u'foo').hidden = True
+            return self.renderOptions()
+        def _checkResult(result):
+            self.assertEquals(result, [u'bar'])
+            self.assertEquals(self.cache.misses, 2)
+        return d.addCallback(_hide).addCallback(_checkResult)
+
+
+    def test_unshared(self):
+        """
+        Options of enumerations that are not shared are not cached.
+        """
+        values = Enum.fromPairs(u'', [(u'foo', u'Foo')])
+        d = self.renderOptions(values=values)
+        def _checkResult(result):
+            self.assertEquals(result, [u'foo'])
+            self.assertEquals((self.cache.hits, self.cache.misses), (0, 0))
+            self.assertEquals(self.cache.size, 0)
+        return d.addCallback(_checkResult)
+
+
+    def test_uncacheable(self):
+        """
+        Options of enumerations without a version are not cached.
+        """
+        values = QueryEnum(
+            u'', Store().query(TestItem), describe=lambda item: item.foo)
+        d = self.renderOptions(values=values)
+        def _checkResult(result):
+            self.assertEquals(result, [])
+            self.assertEquals((self.cache.hits, self.cache.misses), (0, 0))
+        return d.addCallback(_checkResult)
+
+
+
+class SearchableSelectInputTests(FormInputTests):
+    """
+    Tests for L{methanal.view.SearchableSelectInput}.
+    """
+    controlType = view.SearchableSelectInput
+
+    createArgs = [
+        dict(values=[
+            (u'foo', u'Foo'),
+            (u'bar', u'Bar')])]
+
+
+    def setUp(self):
+        super(SearchableSelectInputTests, self).setUp()
+        self.store = Store()
+        self.items = [
+            TestItem(store=self.store, foo=u'Item %d' % (i,))
+            for i in xrange(10)]
+        self.values = QueryEnum(
+            u'Items',
+            self.store.query(TestItem, sort=TestItem.storeID.ascending),
+            searchAttribute=TestItem.foo)
+
+
+    def test_notSearchable(self):
+        """
+        Creating the input with an enumeration that cannot be searched raises
+        C{ValueError}.
+        """
+        values = QueryEnum(
+            u'Items', self.store.query(TestItem), describe=lambda item: u'')
+        self.assertRaises(
+            ValueError, self.createControl, dict(values=values))
+
+
+    def test_renderSelected(self):
+        """
+        Only the selected option is rendered.
+        """
+        control = self.createControl(dict(values=self.values))
+        item = self.items[3]
+        control.param.value = item
+
+        def verifyRendering(tree):
+            optionNodes = tree.findall('.//select/option')
+            self.assertEquals(len(optionNodes), 1)
+            self.assertEquals(
+                optionNodes[0].get('value'), unicode(item.storeID))
+            self.assertEquals(optionNodes[0].text.strip(), u'Item 3')
+
+        return renderWidget(control).addCallback(verifyRendering)
+
+
+    def test_search(self):
+        """
+        Searching finds at most C{limit} options, indicating whether there
+        were more. Text shorter than C{minSearchLength} is not searched for.
+        """
+        control = self.createControl(
+            dict(values=self.values, limit=3, minSearchLength=2))
+        self.assertEquals(
+            control.search(u'item'),
+            {u'options': [[unicode(item.storeID), item.foo]
+                          for item in self.items[:3]],
+             u'truncated': True})
+        self.assertEquals(
+            control.search(u'item 7'),
+            {u'options': [[unicode(self.items[7].storeID), u'Item 7']],
+             u'truncated': False})
+        self.assertEquals(
+            control.search(u'i'),
+            {u'options': [], u'truncated': False})
+
+
+    def test_invoke(self):
+        """
+        Invoking the input resolves the submitted store ID to an item.
+        """
+        control = self.createControl(dict(values=self.values))
+        param = control.parent.param
+        item = self.items[5]
+        control.invoke({param.name: unicode(item.storeID)})
+        self.assertIdentical(param.value, item)
+        self.assertEquals(control.getValue(), unicode(item.storeID))
+
+        self.assertRaises(errors.InvalidEnumItem,
+            control.invoke, {param.name: u'1234'})
+
+
+
 class MultiValueChoiceInputTestsMixin(object):
     """
     Tests mixin for L{methanal.view.ChoiceInput}s that support multiple values.
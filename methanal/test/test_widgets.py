@@ -4,12 +4,679 @@ Unit tests for L{methanal.widgets}.
 from functools import partial
 
 from twisted.trial import unittest
+from twisted.internet.defer import Deferred
+from twisted.internet.task import Clock
+
+from axiom.store import Store, ItemQuery
+from axiom.item import Item
+from axiom.attributes import integer, text
+from axiom.dependency import installOn
 
 from nevow import inevow
+from nevow.athena import LivePage
+
+from zope.interface import implements
 
+from xmantissa.ixmantissa import IWebTranslator
+from xmantissa.webapp import PrivateApplication
 from xmantissa.webtheme import ThemedElement
 
 from methanal import widgets, errors
+from methanal.imethanal import IBatchColumn
+from methanal.model import Model, Value
+from methanal.util import countLiveFragments
+from methanal.view import LiveForm
+
+
+
+class _TableItem(Item):
+    """
+    Item used for testing L{methanal.widgets.Table}.
+    """
+    typeName = 'methanal_test_widgets_tableitem'
+    schemaVersion = 1
+
+    value = integer()
+    name = text()
+
+
+
+class _IndexedTableItem(Item):
+    """
+    Item, with an indexed attribute, used for testing the order of
+    L{methanal.widgets.Table} windows.
+    """
+    typeName = 'methanal_test_widgets_indexedtableitem'
+    schemaVersion = 1
+
+    value = integer(indexed=True)
+
+
+
+class _BatchColumn(object):
+    """
+    L{IBatchColumn} implementation that records how it was called.
+    """
+    implements(IBatchColumn)
+
+    attributeID = 'batch'
+    title = u'Batch'
+
+    def __init__(self):
+        self.calls = []
+
+
+    def extractValue(self, model, item):
+        self.calls.append('extractValue')
+        return item.value
+
+
+    def extractLink(self, model, item):
+        self.calls.append('extractLink')
+        return None
+
+
+    def extractValues(self, model, items):
+        self.calls.append('extractValues')
+        return [item.value * 2 for item in items]
+
+
+    def extractLinks(self, model, items):
+        self.calls.append('extractLinks')
+        return [None] * len(items)
+
+
+    def getType(self):
+        return 'integer'
+
+
+
+class TableTests(unittest.TestCase):
+    """
+    Tests for L{methanal.widgets.Table}.
+    """
+    def setUp(self):
+        self.store = Store()
+        for i in xrange(10):
+            _TableItem(store=self.store, value=i, name=u'item%d' % (i,))
+        self.query = self.store.query(
+            _TableItem, sort=_TableItem.value.ascending)
+        self.columns = [_TableItem.value]
+
+
+    def values(self, rows):
+        """
+        Extract the row identifiers and C{value} cell values from C{rows}.
+        """
+        return [(row.id, row.cells[u'value'].value) for row in rows]
+
+
+    def test_allRows(self):
+        """
+        Without a page size, all rows are sent up front.
+        """
+        table = widgets.Table(self.query, self.columns)
+        args = table.getArgs()
+        self.assertEquals(
+            self.values(args[u'rows']), zip(range(10), range(10)))
+        self.assertNotIn(u'totalRows', args)
+
+
+    def test_snapshotQuery(self):
+        """
+        An Axiom item query is run once, when the table is created, unless the
+        table is paged or sortable.
+        """
+        table = widgets.Table(self.query, self.columns)
+        self.assertEquals(table.items, list(self.query))
+        _TableItem(store=self.store, value=10, name=u'item10')
+        self.assertEquals(len(table.items), 10)
+        self.assertEquals(table.countItems(), 10)
+
+        for kw in [dict(pageSize=3), dict(sortable=True)]:
+            table = widgets.Table(self.query, self.columns, **kw)
+            self.assertIdentical(table.items, self.query)
+
+
+    def test_getFirstPage(self):
+        """
+        L{methanal.widgets.Table.getFirstPage} returns the first page of rows
+        and the total number of rows, while the older
+        L{methanal.widgets.Table._getRows} returns only the rows.
+        """
+        table = widgets.Table(self.query, self.columns, pageSize=3)
+        rows, total = table.getFirstPage()
+        self.assertEquals(self.values(rows), [(0, 0), (1, 1), (2, 2)])
+        self.assertEquals(total, 10)
+        self.assertEquals(
+            self.values(table._getRows()), [(0, 0), (1, 1), (2, 2)])
+
+        table = widgets.Table(self.query, self.columns)
+        self.assertEquals(
+            self.values(table._getRows()), zip(range(10), range(10)))
+
+
+    def test_windowedArgs(self):
+        """
+        With a page size, only the first page of rows and the total number of
+        rows are sent up front.
+        """
+        table = widgets.Table(self.query, self.columns, pageSize=3)
+        args = table.getArgs()
+        self.assertEquals(
+            self.values(args[u'rows']), [(0, 0), (1, 1), (2, 2)])
+        self.assertEquals(args[u'pageSize'], 3)
+        self.assertEquals(args[u'totalRows'], 10)
+
+
+    def test_getRowRange(self):
+        """
+        L{methanal.widgets.Table.getRowRange} returns rows, numbered by their
+        absolute index, for the requested window and the total number of rows.
+        The window size is capped at the page size.
+        """
+        table = widgets.Table(self.query, self.columns, pageSize=3)
+        rows, total = table.getRowRange(4, 2)
+        self.assertEquals(self.values(rows), [(4, 4), (5, 5)])
+        self.assertEquals(total, 10)
+        rows, total = table.getRowRange(8, 100)
+        self.assertEquals(self.values(rows), [(8, 8), (9, 9)])
+
+
+    def test_rememberRowsByIndex(self):
+        """
+        Rows fetched beyond the rows the remote side already has are
+        remembered at their absolute index, the rows in between are filled in
+        when the remote rows are next updated.
+        """
+        table = widgets.Table(self.query, self.columns, pageSize=3)
+        table.getRowRange(0, 3)
+        table.getRowRange(6, 3)
+        self.assertEquals(
+            [row and row[0] for row in table._remoteRows],
+            [item.storeID for item in list(self.query)[:3]] +
+            [None, None, None] +
+            [item.storeID for item in list(self.query)[6:9]])
+
+        rows = table._getRowRange(0, 9)
+        removed, updated, inserted = table.computeRowChanges(rows)
+        self.assertEquals((removed, updated), ([], []))
+        self.assertEquals(
+            [index for index, row in inserted], [3, 4, 5])
+
+
+    def test_windowedQueryBounds(self):
+        """
+        A limit and offset on the original query are respected when fetching
+        windows of items.
+        """
+        query = self.store.query(
+            _TableItem, sort=_TableItem.value.descending, limit=5, offset=2)
+        table = widgets.Table(query, self.columns, pageSize=3)
+        self.assertEquals(
+            [item.value for item in table.getItemRange(0, 3)], [7, 6, 5])
+        self.assertEquals(
+            [item.value for item in table.getItemRange(3, 3)], [4, 3])
+        self.assertEquals(table.countItems(), 5)
+
+
+    def test_windowedDuplicateSortValues(self):
+        """
+        Items with the same sort values are ordered by their store ID, so
+        every item appears in exactly one window.
+        """
+        store = Store()
+        items = [
+            _IndexedTableItem(store=store, value=i % 2) for i in xrange(10)]
+        query = store.query(
+            _IndexedTableItem, sort=_IndexedTableItem.value.descending)
+        table = widgets.Table(
+            query, [_IndexedTableItem.value], pageSize=3)
+        pages = [table.getItemRange(offset, 3) for offset in xrange(0, 10, 3)]
+        self.assertEquals(
+            sum(pages, []),
+            items[1::2] + items[0::2])
+
+
+    def test_windowedSequence(self):
+        """
+        Windows of items can be fetched from items that are not Axiom queries.
+        """
+        items = list(self.query)
+        table = widgets.Table(lambda: iter(items), self.columns, pageSize=4)
+        self.assertEquals(table.getItemRange(8, 4), items[8:])
+        self.assertEquals(table.countItems(), 10)
+
+
+    def test_batchColumns(self):
+        """
+        Columns providing L{IBatchColumn} extract all of their cells with a
+        single call.
+        """
+        column = _BatchColumn()
+        table = widgets.Table(self.query, self.columns + [column])
+        rows = table.getArgs()[u'rows']
+        self.assertEquals(column.calls, ['extractValues', 'extractLinks'])
+        self.assertEquals(
+            [row.cells[u'batch'].value for row in rows], range(0, 20, 2))
+        self.assertEquals(
+            [row.cells[u'value'].value for row in rows], range(10))
+
+
+    def test_attributeColumnBatch(self):
+        """
+        L{methanal.widgets.AttributeColumn.extractValues} and
+        L{methanal.widgets.AttributeColumn.extractLinks} produce the same
+        results as extracting each cell individually.
+        """
+        installOn(PrivateApplication(store=self.store), self.store)
+        column = widgets.AttributeColumn(_TableItem.value)
+        items = list(self.query)
+        self.assertEquals(
+            column.extractValues(None, items),
+            [column.extractValue(None, item) for item in items])
+        links = column.extractLinks(None, items)
+        self.assertEquals(
+            links, [column.extractLink(None, item) for item in items])
+        self.assertNotIn(None, links)
+
+
+    def test_compactRows(self):
+        """
+        Tables with C{compactRows} send rows as a L{methanal.widgets.RowSet},
+        which is transported as arrays of row identifiers, row keys, values
+        per column and links per linked column.
+        """
+        table = widgets.Table(
+            self.query, self.columns, pageSize=3, compactRows=True)
+        rowSet = table.getArgs()[u'rows']
+        self.assertIsInstance(rowSet, widgets.RowSet)
+        self.assertEquals(self.values(rowSet), [(0, 0), (1, 1), (2, 2)])
+        items = list(self.query)[:3]
+        self.assertEquals(
+            inevow.IAthenaTransportable(rowSet).getInitialArguments(),
+            [[0, 1, 2],
+             [item.storeID for item in items],
+             {u'value': [0, 1, 2]},
+             {}])
+
+        rowSet.rows[1].cells[u'value'].link = u'/link'
+        links = inevow.IAthenaTransportable(rowSet).getInitialArguments()[3]
+        self.assertEquals(links, {u'value': [None, u'/link', None]})
+
+
+    def test_performAction(self):
+        """
+        L{methanal.widgets.Table.performAction} invokes the action method with
+        the item for the given row key, without running the item query again
+        for rows that were sent to the remote side.
+        """
+        table = widgets.Table(self.query, self.columns, pageSize=3)
+        rows = table.getArgs()[u'rows']
+        table.action_get = lambda item: item.value
+        self.patch(table, 'getItemRange', None)
+        self.patch(widgets.Table, 'viewItems', None)
+        self.assertEquals(table.performAction(u'get', rows[2].key), 2)
+
+
+    def test_getRowItemOnDemand(self):
+        """
+        L{methanal.widgets.Table.getRowItem} loads items for rows that have not
+        been sent to the remote side by their key, and raises
+        L{methanal.errors.InvalidIdentifier} for unknown keys.
+        """
+        table = widgets.Table(self.query, self.columns, pageSize=3)
+        table.getArgs()
+        item = list(self.query)[7]
+        self.assertIdentical(table.getRowItem(item.storeID), item)
+        self.assertRaises(errors.InvalidIdentifier, table.getRowItem, 12345)
+        self.assertRaises(errors.InvalidIdentifier, table.getRowItem, u'7')
+
+        other = Store()
+        table = widgets.Table(
+            [_TableItem(store=other, value=i) for i in xrange(3)],
+            self.columns)
+        self.assertEquals(table.getRowItem(table.items[1].storeID).value, 1)
+
+
+    def test_getRowItemOutsideQuery(self):
+        """
+        L{methanal.widgets.Table.getRowItem} raises
+        L{methanal.errors.InvalidIdentifier} for the keys of items, of the
+        queried type, that the table's query or filters exclude.
+        """
+        items = list(self.query)
+        query = self.store.query(
+            _TableItem, _TableItem.value < 5, sort=_TableItem.value.ascending)
+        table = widgets.Table(query, self.columns, pageSize=3, sortable=True)
+        self.assertIdentical(table.getRowItem(items[4].storeID), items[4])
+        self.assertRaises(
+            errors.InvalidIdentifier, table.getRowItem, items[7].storeID)
+
+        table.filterRows({u'value': 2})
+        self.assertIdentical(table.getRowItem(items[2].storeID), items[2])
+        self.assertRaises(
+            errors.InvalidIdentifier, table.getRowItem, items[3].storeID)
+
+        query = self.store.query(
+            _TableItem, sort=_TableItem.value.ascending, limit=3)
+        table = widgets.Table(query, self.columns, pageSize=3)
+        self.assertIdentical(table.getRowItem(items[2].storeID), items[2])
+        self.assertRaises(
+            errors.InvalidIdentifier, table.getRowItem, items[5].storeID)
+
+
+    def test_invalidateRows(self):
+        """
+        L{methanal.widgets.Table.invalidateRows} forgets the items resolved for
+        row keys and increments the row version, as does replacing the rows on
+        the remote side.
+        """
+        table = widgets.Table(self.query, self.columns, pageSize=3)
+        table.getArgs()
+        version = table.rowVersion
+        item = list(self.query)[1]
+        self.assertIn(item.storeID, table._rowItems)
+
+        self.assertEquals(table.invalidateRows(), version + 1)
+        self.assertEquals(table._rowItems, {})
+
+        table.getRowRange(0, 3)
+        self.assertEquals(table.rowVersion, version + 2)
+        table.getRowRange(3, 3)
+        self.assertEquals(table.rowVersion, version + 2)
+        self.assertEquals(len(table._rowItems), 6)
+
+
+
+class WebIDCacheTests(unittest.TestCase):
+    """
+    Tests for L{methanal.widgets.WebIDCache}.
+    """
+    def setUp(self):
+        self.store = Store()
+        installOn(PrivateApplication(store=self.store), self.store)
+        self.webTranslator = IWebTranslator(self.store)
+        self.items = [
+            _TableItem(store=self.store, value=i) for i in xrange(3)]
+
+
+    def test_getWebID(self):
+        """
+        L{methanal.widgets.WebIDCache.getWebID} computes an item's web ID only
+        the first time it is requested, counting cache hits and misses.
+        """
+        cache = widgets.WebIDCache()
+        item = self.items[0]
+        webID = unicode(self.webTranslator.toWebID(item), 'ascii')
+        self.assertEquals(cache.getWebID(item), webID)
+        self.assertEquals(cache.getWebID(item), webID)
+        self.assertEquals((cache.hits, cache.misses), (1, 1))
+        cache.clear()
+        self.assertEquals(cache.getWebID(item), webID)
+        self.assertEquals((cache.hits, cache.misses), (1, 2))
+
+
+    def test_invalidMaxSize(self):
+        """
+        Creating a L{methanal.widgets.WebIDCache} with a maximum size less
+        than 1 raises C{ValueError}.
+        """
+        self.assertRaises(ValueError, widgets.WebIDCache, maxSize=0)
+        self.assertRaises(ValueError, widgets.WebIDCache, maxSize=-1)
+        cache = widgets.WebIDCache(maxSize=1)
+        for item in self.items:
+            cache.getWebID(item)
+        self.assertEquals((cache.hits, cache.misses), (0, 3))
+
+
+    def test_noWebTranslator(self):
+        """
+        Items in stores without a web translator have no web ID.
+        """
+        store = Store()
+        cache = widgets.WebIDCache()
+        self.assertIdentical(
+            cache.getWebID(_TableItem(store=store, value=1)), None)
+
+
+    def test_maxSize(self):
+        """
+        The least recently used web IDs are discarded when the cache is full.
+        """
+        cache = widgets.WebIDCache(maxSize=2)
+        a, b, c = self.items
+        cache.getWebID(a)
+        cache.getWebID(b)
+        cache.getWebID(a)
+        cache.getWebID(c)
+        self.assertEquals((cache.hits, cache.misses), (1, 3))
+        cache.getWebID(a)
+        self.assertEquals((cache.hits, cache.misses), (2, 3))
+        cache.getWebID(b)
+        self.assertEquals((cache.hits, cache.misses), (2, 4))
+
+
+    def test_table(self):
+        """
+        A table computes each item's link once per build of its rows, no
+        matter how many columns are linked. A cache given to a table is not
+        cleared between builds.
+        """
+        columns = [_TableItem.value, _TableItem.name]
+        table = widgets.Table(self.items, columns)
+        table.getArgs()
+        table.getArgs()
+        self.assertEquals(
+            (table.webIDCache.hits, table.webIDCache.misses), (6, 6))
+
+        cache = widgets.WebIDCache(maxSize=10)
+        table = widgets.Table(self.items, columns, webIDCache=cache)
+        table.getArgs()
+        table.getArgs()
+        self.assertEquals((cache.hits, cache.misses), (9, 3))
+
+
+
+class TableRowChangesTests(unittest.TestCase):
+    """
+    Tests for incrementally updating L{methanal.widgets.Table} rows.
+    """
+    def setUp(self):
+        self.store = Store()
+        self.items = [
+            _TableItem(store=self.store, value=i, name=u'item%d' % (i,))
+            for i in xrange(5)]
+        self.table = widgets.Table(
+            lambda: self.items, [_TableItem.value, _TableItem.name])
+        self.table.getArgs()
+        self.calls = []
+        self.patch(
+            self.table, 'callRemote', lambda *a: self.calls.append(a))
+
+
+    def test_rowKeys(self):
+        """
+        Rows are keyed by the C{storeID} of their item.
+        """
+        rows, total = self.table.getFirstPage()
+        self.assertEquals(
+            [row.key for row in rows],
+            [item.storeID for item in self.items])
+        self.assertEquals(
+            inevow.IAthenaTransportable(rows[0]).getInitialArguments(),
+            [0, rows[0].cells, self.items[0].storeID])
+
+
+    def test_noChanges(self):
+        """
+        Nothing is removed, updated or inserted if nothing has changed.
+        """
+        self.table.updateRemoteRows()
+        self.assertEquals(self.calls, [('updateRows', [], [], [], 5)])
+
+
+    def test_changes(self):
+        """
+        Removed rows are identified by their keys, changed rows are updated in
+        place and new rows are inserted at their position.
+        """
+        removedItem = self.items.pop(1)
+        self.items[2].name = u'changed'
+        newItem = _TableItem(store=self.store, value=5, name=u'new')
+        self.items.insert(0, newItem)
+        self.table.updateRemoteRows()
+
+        [(name, removed, updated, inserted, total)] = self.calls
+        self.assertEquals(name, 'updateRows')
+        self.assertEquals(removed, [removedItem.storeID])
+        self.assertEquals(
+            [(row.id, row.key) for row in updated],
+            [(3, self.items[3].storeID)])
+        self.assertEquals(
+            [(index, row.key) for index, row in inserted],
+            [(0, newItem.storeID)])
+        self.assertEquals(total, 5)
+
+        # The remote rows are now up to date.
+        self.table.updateRemoteRows()
+        self.assertEquals(self.calls[-1], ('updateRows', [], [], [], 5))
+
+
+    def test_moves(self):
+        """
+        Rows that have moved relative to the other rows are removed and
+        inserted at their new position.
+        """
+        self.items.append(self.items.pop(0))
+        removed, updated, inserted = self.table.computeRowChanges(
+            self.table._createRows(self.items))
+        self.assertEquals(removed, [self.items[-1].storeID])
+        self.assertEquals(updated, [])
+        self.assertEquals(
+            [(index, row.key) for index, row in inserted],
+            [(4, self.items[-1].storeID)])
+
+
+
+class TableSortFilterTests(unittest.TestCase):
+    """
+    Tests for sorting and filtering L{methanal.widgets.Table}.
+    """
+    def setUp(self):
+        self.store = Store()
+        for i, name in enumerate([u'foo', u'bar', u'baz', u'quux', u'bar']):
+            _TableItem(store=self.store, value=i, name=name)
+        self.query = self.store.query(
+            _TableItem, sort=_TableItem.value.ascending)
+        self.columns = [_TableItem.value, _TableItem.name]
+
+
+    def values(self, table):
+        """
+        Get the C{value} attributes of the viewable items in C{table}.
+        """
+        return [item.value for item in table.getItemRange(0, None)]
+
+
+    def test_sortQuery(self):
+        """
+        Sorting a table backed by an Axiom query sorts in the query.
+        """
+        table = widgets.Table(
+            self.query, self.columns, pageSize=2, sortable=True)
+        rows, total = table.sortRows(u'name', False)
+        self.assertIsInstance(table.viewItems, ItemQuery)
+        self.assertEquals([row.id for row in rows], [0, 1])
+        self.assertEquals(
+            [row.cells[u'name'].value for row in rows], [u'quux', u'foo'])
+        self.assertEquals(total, 5)
+        table.sortRows(u'value', False)
+        self.assertEquals(self.values(table), [4, 3, 2, 1, 0])
+        table.sortRows(None, True)
+        self.assertEquals(self.values(table), [0, 1, 2, 3, 4])
+
+
+    def test_filterQuery(self):
+        """
+        Filtering a table backed by an Axiom query filters in the query. Text
+        columns match values containing the filter value, other columns match
+        equal values.
+        """
+        table = widgets.Table(self.query, self.columns, sortable=True)
+        rows, total = table.filterRows({u'name': u'BA'})
+        self.assertIsInstance(table.viewItems, ItemQuery)
+        self.assertEquals(total, 3)
+        self.assertEquals(self.values(table), [1, 2, 4])
+        table.filterRows({u'name': u'bar', u'value': 4})
+        self.assertEquals(self.values(table), [4])
+        table.sortRows(u'value', False)
+        table.filterRows({u'name': u'bar'})
+        self.assertEquals(self.values(table), [4, 1])
+
+
+    def test_sortFilterSequence(self):
+        """
+        Tables whose items are not an Axiom query are sorted and filtered on
+        the extracted column values.
+        """
+        table = widgets.Table(list(self.query), self.columns, sortable=True)
+        table.filterRows({u'name': u'ba'})
+        table.sortRows(u'name', True)
+        self.assertNotIsInstance(table.viewItems, ItemQuery)
+        self.assertEquals(self.values(table), [1, 4, 2])
+
+
+    def test_unsupportedColumn(self):
+        """
+        Sorting by a column that is not backed by an attribute of the queried
+        item type falls back to sorting on extracted column values.
+        """
+        column = widgets.LinkColumn(
+            widgets.AttributeColumn(_TableItem.value),
+            lambda model, item: None)
+        column.attribute = None
+        table = widgets.Table(self.query, [column], sortable=True)
+        table.sortRows(u'value', False)
+        self.assertNotIsInstance(table.viewItems, ItemQuery)
+        self.assertEquals(self.values(table), [4, 3, 2, 1, 0])
+
+
+    def test_invalidColumn(self):
+        """
+        Sorting or filtering by an unknown column identifier raises
+        L{methanal.errors.InvalidIdentifier}.
+        """
+        table = widgets.Table(self.query, self.columns, sortable=True)
+        self.assertRaises(
+            errors.InvalidIdentifier, table.sortRows, u'nope', True)
+        self.assertRaises(
+            errors.InvalidIdentifier, table.filterRows, {u'nope': 1})
+
+
+    def test_notSortable(self):
+        """
+        Tables that are not sortable cannot be sorted or filtered.
+        """
+        table = widgets.Table(self.query, self.columns, pageSize=2)
+        self.assertRaises(ValueError, table.sortRows, u'name', True)
+        self.assertRaises(ValueError, table.filterRows, {u'name': u'ba'})
+        self.assertIdentical(table.sortColumnID, None)
+        self.assertEquals(table.filters, {})
+
+
+    def test_filterLiterally(self):
+        """
+        C{%} and C{_} in text filter values are matched literally.
+        """
+        _TableItem(store=self.store, value=5, name=u'50%_off')
+        table = widgets.Table(self.query, self.columns, sortable=True)
+        table.filterRows({u'name': u'%'})
+        self.assertEquals(self.values(table), [5])
+        table.filterRows({u'name': u'a_'})
+        self.assertEquals(self.values(table), [])
+        table.filterRows({u'name': u'0%_O'})
+        self.assertEquals(self.values(table), [5])
 
 
 
@@ -140,6 +807,29 @@ class TabViewTests(unittest.TestCase):
             errors.InvalidIdentifier, self.tabView.getTab, tab.id)
 
 
+    def test_releaseTabs(self):
+        """
+        Tabs that are removed, or replaced, are released on the server side.
+        """
+        page = LivePage()
+        self.tabView.setFragmentParent(page)
+        for tab in self.tabs:
+            tab.setFragmentParent(self.tabView)
+        self.patch(self.tabView, 'callRemote', lambda *a: None)
+        self.assertEquals(countLiveFragments(page), 4)
+
+        tab = self.tabs[0]
+        self.tabView.removeTabs([tab])
+        self.assertIdentical(tab.fragmentParent, None)
+        self.assertEquals(countLiveFragments(page), 3)
+
+        oldTab = self.tabView.getTab(u'id2')
+        self.tabView.updateTabs(
+            [widgets.Tab(u'id2', u'New title', self.contentFactory)])
+        self.assertIdentical(oldTab.fragmentParent, None)
+        self.assertEquals(countLiveFragments(page), 3)
+
+
     def test_invalidRemove(self):
         """
         Trying to remove an unmanaged tab results in C{ValueError} being
@@ -156,6 +846,17 @@ class TabViewTests(unittest.TestCase):
                 widgets.Tab(u'id1', u'Title 1', self.contentFactory)])
 
 
+    def test_initialArguments(self):
+        """
+        The fetch scheduling options of a L{methanal.widgets.TabView} are
+        passed to the client.
+        """
+        self.assertEquals(self.tabView.getInitialArguments()[3:], [None, False])
+        tabView = widgets.TabView(
+            self.tabs, maxConcurrentFetches=3, prefetch=True)
+        self.assertEquals(tabView.getInitialArguments()[3:], [3, True])
+
+
     def test_repr(self):
         """
         L{methanal.widgets.TabView} has an accurate string representation.
@@ -257,11 +958,142 @@ class TabGroupTests(unittest.TestCase):
 
 
 
+class DemandTabTests(unittest.TestCase):
+    """
+    Tests for L{methanal.widgets.DemandTab}.
+    """
+    def setUp(self):
+        self.version = 1
+        self.remoteCalls = []
+
+
+    def createTab(self, cachePolicy):
+        """
+        Create a L{methanal.widgets.DemandTab} whose remote calls are recorded.
+        """
+        tab = widgets.DemandTab(
+            id=u'id',
+            title=u'Title',
+            contentFactory=partial(ComparableLiveElement, u'content'),
+            cachePolicy=cachePolicy)
+        tab.callRemote = lambda *a: self.remoteCalls.append(a)
+        return tab
+
+
+    def test_cachePolicyArgs(self):
+        """
+        The cache policy of a L{methanal.widgets.DemandTab} is passed to the
+        client, C{None} is passed if there is no cache policy.
+        """
+        tab = widgets.DemandTab(u'id', u'Title', None)
+        self.assertIdentical(tab.getArgs()[u'cachePolicy'], None)
+
+        tab = self.createTab(widgets.ContentCachePolicy(ttl=30))
+        self.assertEquals(
+            tab.getInitialArguments()[0][u'cachePolicy'],
+            {u'ttl': 30, u'revalidate': False})
+
+        tab = self.createTab(
+            widgets.ContentCachePolicy(getVersion=lambda: self.version))
+        self.assertEquals(
+            tab.getInitialArguments()[0][u'cachePolicy'],
+            {u'ttl': None, u'revalidate': True})
+
+
+    def test_isContentCurrent(self):
+        """
+        L{methanal.widgets.DemandTab.isContentCurrent} is C{True} only if the
+        content version has not changed since the content was fetched.
+        """
+        tab = self.createTab(
+            widgets.ContentCachePolicy(getVersion=lambda: self.version))
+        self.assertFalse(tab.isContentCurrent(u'content'))
+        tab.getContent(u'content')
+        self.assertTrue(tab.isContentCurrent(u'content'))
+        self.version = 2
+        self.assertFalse(tab.isContentCurrent(u'content'))
+        tab.getContent(u'content')
+        self.assertTrue(tab.isContentCurrent(u'content'))
+
+
+    def test_releaseContent(self):
+        """
+        Content produced by L{methanal.widgets.DemandTab.getContent} is
+        released when it is superseded.
+        """
+        tab = self.createTab(None)
+        tab.setFragmentParent(LivePage())
+        content = tab.getContent(u'content').result
+        self.assertIdentical(content.fragmentParent, tab)
+        newContent = tab.getContent(u'content').result
+        self.assertIdentical(content.fragmentParent, None)
+        self.assertIdentical(newContent.fragmentParent, tab)
+        self.assertEquals(countLiveFragments(tab.page), 2)
+
+
+    def test_sameContent(self):
+        """
+        Content is not released when the content factory produces the same
+        content again.
+        """
+        content = ComparableLiveElement(u'content')
+        tab = widgets.DemandTab(
+            id=u'id', title=u'Title', contentFactory=lambda: content)
+        tab.setFragmentParent(LivePage())
+        self.assertIdentical(tab.getContent(u'content').result, content)
+        self.assertIdentical(tab.getContent(u'content').result, content)
+        self.assertIdentical(content.fragmentParent, tab)
+        self.assertEquals(countLiveFragments(tab.page), 2)
+
+
+    def test_overlappingContent(self):
+        """
+        Content from a call to L{methanal.widgets.DemandTab.getContent} that
+        was superseded by another call, before it completed, is discarded and
+        does not replace or release the newer content, regardless of the order
+        the calls complete in.
+        """
+        results = []
+        tab = widgets.DemandTab(
+            id=u'id', title=u'Title', contentFactory=lambda: results[-1])
+        tab.setFragmentParent(LivePage())
+        first = [ComparableLiveElement(u'first'), Deferred()]
+        second = [ComparableLiveElement(u'second'), Deferred()]
+        results.append(first[1])
+        d1 = tab.getContent(u'content')
+        results.append(second[1])
+        d2 = tab.getContent(u'content')
+
+        second[1].callback(second[0])
+        first[1].callback(first[0])
+        self.assertIdentical(d1.result, None)
+        self.assertIdentical(d2.result, second[0])
+        self.assertIdentical(tab.currentContent, second[0])
+        self.assertIdentical(second[0].fragmentParent, tab)
+        self.assertIdentical(first[0].fragmentParent, None)
+
+
+    def test_invalidateRemoteContent(self):
+        """
+        L{methanal.widgets.DemandTab.invalidateRemoteContent} discards the
+        client's cached content.
+        """
+        tab = self.createTab(
+            widgets.ContentCachePolicy(getVersion=lambda: self.version))
+        tab.getContent(u'content')
+        tab.invalidateRemoteContent()
+        self.assertFalse(tab.isContentCurrent(u'content'))
+        self.assertEquals(
+            self.remoteCalls, [('invalidateContent', u'content')])
+
+
+
 class ComparableLiveElement(ThemedElement):
     """
     C{LiveElement} implementing C{__eq__} comparing C{self.value}.
     """
     def __init__(self, value):
+        super(ComparableLiveElement, self).__init__()
         self.value = value
 
 
@@ -337,3 +1169,157 @@ class ExpanderTests(unittest.TestCase):
         content = expander.getExpanderContent()
         self.assertNotIdentical(None, content)
         self.assertEqual(u'other', content.value)
+
+
+    def test_releaseContent(self):
+        """
+        Header and body content is released when it is superseded.
+        """
+        expander = widgets.Expander(
+            headerFactory=partial(ComparableLiveElement, u'foo'),
+            contentFactory=partial(ComparableLiveElement, u'bar'))
+        expander.setFragmentParent(LivePage())
+        header = expander.getHeaderContent()
+        content = expander.getExpanderContent()
+        self.assertEquals(countLiveFragments(expander), 2)
+
+        expander.headerFactory = partial(ComparableLiveElement, u'baz')
+        expander.contentFactory = partial(ComparableLiveElement, u'quux')
+        expander.getHeaderContent()
+        expander.getExpanderContent()
+        self.assertIdentical(header.fragmentParent, None)
+        self.assertIdentical(content.fragmentParent, None)
+        self.assertEquals(countLiveFragments(expander), 2)
+
+
+
+class DemandExpanderTests(unittest.TestCase):
+    """
+    Tests for L{methanal.widgets.DemandExpander}.
+    """
+    def test_cachePolicy(self):
+        """
+        The cache policy of a L{methanal.widgets.DemandExpander} is passed to
+        the client and content versions are tracked per node ID.
+        """
+        versions = {u'version': 1}
+        expander = widgets.DemandExpander(
+            headerFactory=partial(ComparableLiveElement, u'foo'),
+            contentFactory=partial(ComparableLiveElement, u'bar'),
+            cachePolicy=widgets.ContentCachePolicy(
+                ttl=5, getVersion=lambda: versions[u'version']))
+        self.assertEquals(
+            expander.getInitialArguments(),
+            [False, {u'ttl': 5, u'revalidate': True}])
+
+        self.assertEquals(expander.getContent(u'content').value, u'bar')
+        self.assertTrue(expander.isContentCurrent(u'content'))
+        self.assertFalse(expander.isContentCurrent(u'header'))
+        versions[u'version'] = 2
+        self.assertFalse(expander.isContentCurrent(u'content'))
+
+
+
+class LookupTests(unittest.TestCase):
+    """
+    Tests for L{methanal.widgets.Lookup}.
+    """
+    def setUp(self):
+        self.populateCalls = []
+        self.clock = Clock()
+
+
+    def populate(self, data):
+        """
+        Produce lookup results, recording the criteria.
+        """
+        self.populateCalls.append(data)
+        return iter(range(5))
+
+
+    def createLookup(self, **kw):
+        """
+        Create a L{methanal.widgets.Lookup}.
+        """
+        form = widgets.LookupForm(
+            store=None, model=Model(params=[Value(name='name')]))
+        parent = LiveForm(
+            store=None, model=Model(params=[Value(name='result')]))
+        return widgets.Lookup(
+            form=form, populate=self.populate, parent=parent, name='result',
+            **kw)
+
+
+    def test_lookup(self):
+        """
+        Without a limit, all results are returned.
+        """
+        lookup = self.createLookup()
+        self.assertEquals(
+            lookup.lookup({u'name': u'foo'}),
+            {u'results': range(5), u'more': False})
+        self.assertEquals(self.populateCalls, [{u'name': u'foo'}])
+
+
+    def test_limit(self):
+        """
+        At most C{limit} results are returned, indicating whether more
+        results are available.
+        """
+        lookup = self.createLookup(limit=3)
+        self.assertEquals(
+            lookup.lookup({u'name': u'foo'}),
+            {u'results': range(3), u'more': True})
+        lookup.limit = 5
+        self.assertEquals(
+            lookup.lookup({u'name': u'foo'}),
+            {u'results': range(5), u'more': False})
+
+
+    def test_debounce(self):
+        """
+        The debounce delay is passed to the client.
+        """
+        lookup = self.createLookup(debounce=250)
+        self.assertEquals(lookup.getInitialArguments()[0][u'debounce'], 250)
+
+
+    def test_cache(self):
+        """
+        Lookups with equivalent criteria are answered from the cache, ignoring
+        the value of the result input, until the results expire.
+        """
+        cache = widgets.LookupCache(ttl=10, clock=self.clock)
+        lookup = self.createLookup(cache=cache)
+        result = lookup.lookup({u'name': u'foo', u'__result__': None})
+        self.assertIdentical(
+            lookup.lookup({u'name': u' foo ', u'__result__': u'1'}), result)
+        self.assertEquals(len(self.populateCalls), 1)
+        self.assertEquals((cache.hits, cache.misses), (1, 1))
+
+        lookup.lookup({u'name': u'bar'})
+        self.assertEquals(len(self.populateCalls), 2)
+
+        self.clock.advance(10)
+        lookup.lookup({u'name': u'foo'})
+        self.assertEquals(len(self.populateCalls), 3)
+
+
+    def test_cacheMaxSize(self):
+        """
+        The least recently used results are discarded once the cache is
+        full. Criteria that cannot be hashed are never cached.
+        """
+        cache = widgets.LookupCache(maxSize=2, clock=self.clock)
+        lookup = self.createLookup(cache=cache)
+        lookup.lookup({u'name': u'a'})
+        lookup.lookup({u'name': u'b'})
+        lookup.lookup({u'name': u'a'})
+        lookup.lookup({u'name': u'c'})
+        self.assertEquals(len(self.populateCalls), 3)
+        lookup.lookup({u'name': u'b'})
+        self.assertEquals(len(self.populateCalls), 4)
+
+        lookup.lookup({u'name': set([u'a'])})
+        lookup.lookup({u'name': set([u'a'])})
+        self.assertEquals(len(self.populateCalls), 6)
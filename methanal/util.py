@@ -1,8 +1,11 @@
 from zope.interface import implements
 
+from twisted.internet.error import ConnectionLost
 from twisted.python import log
 from twisted.python.failure import Failure
 
+from axiom.iaxiom import IComparison
+
 from methanal.imethanal import ITextFormatter
 
 
@@ -31,6 +34,46 @@ class MethodWrapper(object):
 
 
 
+_methodCache = {}
+_validArgNames = {}
+
+def _getMethods(cls, methodName):
+    """
+    Find the methods named C{methodName} along C{cls}'s MRO.
+
+    Results are cached per class, see L{clearMethodCache}.
+
+    @rtype: C{tuple} of C{(type, callable)}
+    @return: Pairs of the class defining each method, and the unbound method
+    """
+    key = (cls, methodName)
+    methods = _methodCache.get(key)
+    if methods is None:
+        methods = []
+        for base in cls.__mro__:
+            try:
+                method = base.__dict__[methodName]
+            except KeyError:
+                pass
+            else:
+                methods.append((base, method))
+        methods = _methodCache[key] = tuple(methods)
+    return methods
+
+
+
+def clearMethodCache():
+    """
+    Discard the cached results of L{collectMethods} and L{getArgsDict}.
+
+    This should be called after adding, replacing or removing methods on
+    classes whose methods have already been collected.
+    """
+    _methodCache.clear()
+    _validArgNames.clear()
+
+
+
 def collectMethods(inst, methodName):
     """
     Traverse an object's MRO, collecting methods.
@@ -46,13 +89,32 @@ def collectMethods(inst, methodName):
     @rtype: C{iterable} of L{MethodWrapper} instances
     @return: Wrapped methods named L{methodName} along L{inst}'s MRO
     """
-    for cls in type(inst).__mro__:
-        try:
-            method = cls.__dict__[methodName]
-        except KeyError:
-            pass
-        else:
-            yield MethodWrapper(method, cls, inst)
+    for cls, method in _getMethods(type(inst), methodName):
+        yield MethodWrapper(method, cls, inst)
+
+
+
+def _checkArgs(results):
+    """
+    Combine C{getArgs} results, checking each argument name.
+
+    @type results: C{list} of C{(type, dict)}
+    @param results: Pairs of the class defining each C{getArgs} method, and
+        its result
+
+    @see: L{getArgsDict}
+    """
+    args = {}
+    for cls, result in results:
+        for key, value in result.iteritems():
+            if key in args:
+                raise ValueError(
+                    'Argument %r from %r already specified' % (key, cls))
+            if not isinstance(key, unicode):
+                raise TypeError(
+                    'Argument name %r is not unicode' % (key,))
+            args[key] = value
+    return args
 
 
 
@@ -64,6 +126,9 @@ def getArgsDict(inst):
     for C{getArgs} methods, which should return a single C{dict} mapping
     C{unicode} keys to values.
 
+    Argument names are only fully checked when a class produces names it has
+    not produced before, or names that are not exactly C{unicode}.
+
     @type inst: C{type}
     @param inst: Type instance whose C{getArgs} results should be collected
 
@@ -74,20 +139,117 @@ def getArgsDict(inst):
     @return: A dictionary combining the results of all C{getArgs} methods
         in C{inst}'s class hierarchy
     """
+    cls = type(inst)
+    results = [(base, method(inst))
+               for base, method in _getMethods(cls, 'getArgs')]
     args = {}
-    for getter in collectMethods(inst, 'getArgs'):
-        for key, value in getter().iteritems():
-            if key in args:
-                raise ValueError(
-                    'Argument %r from %r already specified' % (key, getter.cls))
-            if not isinstance(key, unicode):
-                raise TypeError(
-                    'Argument name %r is not unicode' % (key,))
-            args[key] = value
+    count = 0
+    for _, result in results:
+        args.update(result)
+        count += len(result)
+
+    validNames = _validArgNames.get(cls)
+    if (count != len(args) or
+        validNames is None or
+        not validNames.issuperset(args) or
+        # In Python 2 byte strings compare equal to the unicode names they
+        # would otherwise be mistaken for.
+        not all(type(key) is unicode for key in args)):
+        args = _checkArgs(results)
+        _validArgNames[cls] = frozenset(args).union(validNames or ())
     return args
 
 
 
+def releaseFragment(fragment):
+    """
+    Release a live fragment, and all its children, on the server side.
+
+    The fragment is removed from its fragment parent and, if it has been
+    rendered, from its page, without notifying the client. The client is
+    expected to drop its widget locally, the server-side component no longer
+    exists for it to communicate with.
+
+    @type  fragment: C{nevow.athena.LiveFragment} or
+        C{nevow.athena.LiveElement}
+    @param fragment: Fragment to release, may be C{None}
+
+    @rtype: C{bool}
+    @return: C{True} if the fragment was released, C{False} if it was not
+        attached to a fragment parent
+    """
+    if getattr(fragment, 'fragmentParent', None) is None:
+        return False
+
+    for child in list(fragment.liveFragmentChildren):
+        releaseFragment(child)
+    fragment.fragmentParent.liveFragmentChildren.remove(fragment)
+    fragment.fragmentParent = None
+    page = fragment.page
+    fragment.page = None
+    # Only fragments that have been rendered are known to the page.
+    athenaID = getattr(fragment, '_athenaID', None)
+    if page is not None and athenaID is not None:
+        page.removeLocalObject(athenaID)
+        if page._didConnect:
+            fragment.connectionLost(ConnectionLost('Released'))
+    fragment.detached()
+    return True
+
+
+
+def countLiveFragments(parent):
+    """
+    Count the live fragments attached, directly or indirectly, to a parent.
+
+    This is intended for debugging fragment lifecycles, passing a
+    C{nevow.athena.LivePage} counts all the live fragments on that page.
+
+    @rtype: C{int}
+    """
+    count = 0
+    for child in parent.liveFragmentChildren:
+        count += 1 + countLiveFragments(child)
+    return count
+
+
+
+class ContainsComparison(object):
+    """
+    Axiom comparison matching text attribute values that contain a value.
+
+    Unlike C{attribute.like(u'%', value, u'%')}, C{%} and C{_} in the value
+    are matched literally rather than as wildcards. As with C{LIKE}, ASCII
+    letters are matched without regard to case.
+
+    @type attribute: C{axiom.attributes.text}
+
+    @type value: C{unicode}
+    """
+    implements(IComparison)
+
+    def __init__(self, attribute, value):
+        self.attribute = attribute
+        self.value = value
+
+
+    def getInvolvedTables(self):
+        return [self.attribute.type]
+
+
+    def getQuery(self, store):
+        return "(%s LIKE ? ESCAPE '\\')" % (
+            self.attribute.getColumnName(store),)
+
+
+    def getArgs(self, store):
+        value = self.value
+        for c in u'\\%_':
+            value = value.replace(c, u'\\' + c)
+        return [self.attribute.infilter(u'%' + value + u'%', None, store)]
+
+
+
 class Porthole(object):
     """
     Observable event source.
@@ -1,4 +1,5 @@
 import itertools
+from collections import OrderedDict
 from warnings import warn
 from zope.interface import implements
 
@@ -12,15 +13,17 @@ from twisted.python.deprecate import deprecated
 
 from axiom.attributes import text, integer, timestamp, boolean, ieee754_double
 
+from nevow import flat
 from nevow.inevow import IAthenaTransportable
-from nevow.page import renderer
+from nevow.page import Element, renderer
+from nevow.tags import xml
 from nevow.athena import expose
 
 from xmantissa.ixmantissa import IWebTranslator
 from xmantissa.webtheme import ThemedElement
 
 from methanal import errors
-from methanal.imethanal import IEnumeration
+from methanal.imethanal import IEnumeration, ISearchableEnumeration
 from methanal.model import ItemModel, Model, paramFromAttribute
 from methanal.util import getArgsDict, CurrencyFormatter, DecimalFormatter
 from methanal.enums import ListEnumeration
@@ -253,13 +256,24 @@ class LiveForm(SimpleForm):
 
     @type doc: C{unicode}
     @ivar doc: Form title, or C{None} for no title.
+
+    @type deltaSubmission: C{bool}
+    @ivar deltaSubmission: Should the client only submit the values of
+        inputs that were modified since the form was loaded or last submitted?
+        Inputs without submitted values are not invoked, leaving their model
+        parameters with their existing values. Defaults to C{False}.
+
+    @type lightweightInputs: C{bool}
+    @ivar lightweightInputs: Should inputs, and input containers, added to
+        this form be lightweight? See L{LightweightMixin}. Defaults to
+        C{False}.
     """
     fragmentName = 'methanal-liveform'
     jsClass = u'Methanal.View.LiveForm'
 
 
     def __init__(self, store, model, viewOnly=False, actions=None, doc=None,
-                 **kw):
+                 deltaSubmission=False, lightweightInputs=False, **kw):
         super(LiveForm, self).__init__(store=store, model=model, **kw)
         if self.model.doc is None:
             viewOnly = True
@@ -270,6 +284,8 @@ class LiveForm(SimpleForm):
                 actions=[SubmitAction(name=self.model.doc)])
         self.actions = actions
         self.doc = doc
+        self.deltaSubmission = deltaSubmission
+        self.lightweightInputs = lightweightInputs
 
         self.hideModificationIndicator = False
         self.hideValidationErrorIndicator = False
@@ -284,7 +300,54 @@ class LiveForm(SimpleForm):
         return {
             u'viewOnly': self.viewOnly,
             u'hideModificationIndicator': self.hideModificationIndicator,
-            u'hideValidationErrorIndicator': self.hideValidationErrorIndicator}
+            u'hideValidationErrorIndicator': self.hideValidationErrorIndicator,
+            u'deltaSubmission': self.deltaSubmission,
+            u'lightweightWidgets': self.getLightweightWidgets()}
+
+
+    def _getLightweightElements(self, container=None):
+        """
+        Get this form's lightweight elements, parents before their children.
+        """
+        if container is None:
+            container = self
+        for child in container.formChildren:
+            if getattr(child, 'lightweight', False):
+                yield child
+            if hasattr(child, 'formChildren'):
+                for descendant in self._getLightweightElements(child):
+                    yield descendant
+
+
+    def getLightweightWidgets(self):
+        """
+        Get the information needed to create the client-side widgets of this
+        form's lightweight elements.
+
+        @rtype: C{list}
+        @return: C{[athenaID, jsClass, initialArguments]} for each lightweight
+            element, parents before their children
+        """
+        return [
+            [element.getLightweightID(),
+             element.jsClass,
+             list(element.getInitialArguments())]
+            for element in self._getLightweightElements()]
+
+
+    def _getRequiredModules(self, memo):
+        """
+        Get the JavaScript modules required by this form's widget, including
+        those required by the widgets of its lightweight elements, which are
+        created by the form rather than by Athena.
+        """
+        modules = super(LiveForm, self)._getRequiredModules(memo)
+        for element in self._getLightweightElements():
+            modules.extend(
+                (dep.name, self.page.getJSModuleURL(dep.name))
+                for dep in element._getModuleForClass().allDependencies(memo)
+                if self.page._shouldInclude(dep.name))
+        return modules
 
 
     @renderer
@@ -300,31 +363,154 @@ class LiveForm(SimpleForm):
         return tag[self.actions]
 
 
+    def _invokeSubmitted(self, container, data):
+        """
+        Process form data for each child input, of C{container}, that has a
+        value in C{data}.
+        """
+        for child in container.formChildren:
+            if hasattr(child, 'formChildren') and child.model is self.model:
+                self._invokeSubmitted(child, data)
+            elif child.name in data:
+                child.invoke(data)
+
+
     @expose
     def invoke(self, data):
         """
         Process form data for each child input.
 
         The callback for L{self.model} is invoked once all the child inputs
-        have been invoked.
+        have been invoked. If L{deltaSubmission} is C{True} only the inputs
+        with values in C{data} are invoked.
 
         @type data: C{dict}
         @param data: Form data.
 
         @raise RuntimeError: If L{self.viewOnly} is C{True}.
 
-        @return: The result of the model's callback function.
+        @raise errors.ValidationErrors: If any of the model's parameters are
+            invalid, all of the errors are reported at once. This is a
+            subclass of L{errors.ConstraintError}.
+
+        @return: The result of the model's callback function, or a
+            C{Deferred} firing with it if the model has an executor.
         """
         if self.viewOnly:
             raise RuntimeError('Attempted to submit view-only form')
 
-        for child in self.formChildren:
-            child.invoke(data)
-        return self.model.process()
+        if self.deltaSubmission:
+            self._invokeSubmitted(self, data)
+        else:
+            for child in self.formChildren:
+                child.invoke(data)
+        try:
+            return self.model.process()
+        except errors.ConstraintError:
+            # Processing the model stops at the first invalid parameter, only
+            # collect the rest of the errors when there is one.
+            validationErrors = self.model.validateAll()
+            if not validationErrors:
+                raise
+            raise errors.ValidationErrors(validationErrors)
+
+
+
+class LightweightMixin(object):
+    """
+    Mixin for form elements that can be rendered as plain markup.
+
+    The client-side widgets of lightweight elements are created by their
+    L{LiveForm}, from L{LiveForm.getLightweightWidgets}, rather than by
+    Athena, and the form imports the JavaScript modules of their classes.
+    Lightweight elements are not registered with the page, or their fragment
+    parent, and so cannot receive remote method calls.
 
+    Elements only become lightweight when their parent is a
+    L{LiveForm} with C{lightweightInputs} set, or a lightweight container.
+    Athena cannot create widgets inside lightweight elements, so adding an
+    element that is not lightweight to a lightweight container makes the
+    container, and its lightweight parents, normal widgets.
 
+    @type supportsLightweight: C{bool}
+    @cvar supportsLightweight: Can elements of this type be lightweight?
+        Element types that make remote method calls should set this to
+        C{False}.
 
-class InputContainer(ThemedElement):
+    @type lightweight: C{bool}
+    @ivar lightweight: Is this element lightweight?
+    """
+    supportsLightweight = True
+    lightweight = False
+    _athenaID = None
+
+
+    def _setLightweight(self, parent):
+        """
+        Determine whether this element is lightweight, from its parent.
+        """
+        self.lightweight = self.supportsLightweight and (
+            getattr(parent, 'lightweightInputs', False) or
+            getattr(parent, 'lightweight', False))
+        if not self.lightweight and getattr(parent, 'lightweight', False):
+            parent._makeHeavy()
+
+
+    def _makeHeavy(self):
+        """
+        Make this element, and its lightweight parents, normal widgets.
+        """
+        if not self.lightweight:
+            return
+        self.lightweight = False
+        fragmentParent = self.fragmentParent
+        if getattr(fragmentParent, 'lightweight', False):
+            fragmentParent._makeHeavy()
+        self.setFragmentParent(fragmentParent)
+
+
+    def getLightweightID(self):
+        """
+        Get a page-unique Athena identifier for this lightweight element.
+
+        The identifier is reserved with the page but no object is registered
+        for it.
+
+        @rtype: C{int}
+        """
+        if self._athenaID is None:
+            page = self.page
+            self._athenaID = page.addLocalObject(self)
+            page.removeLocalObject(self._athenaID)
+        return self._athenaID
+
+
+    def setFragmentParent(self, fragmentParent):
+        if not self.lightweight:
+            return super(LightweightMixin, self).setFragmentParent(
+                fragmentParent)
+        self.fragmentParent = fragmentParent
+
+
+    def _prepare(self, tag):
+        if not self.lightweight:
+            return super(LightweightMixin, self)._prepare(tag)
+        tag.fillSlots('athena:id', str(self.getLightweightID()))
+
+
+    @renderer
+    def liveElement(self, req, tag):
+        """
+        Render the element's widget node, without the boilerplate needed for
+        Athena to create the widget if this element is lightweight.
+        """
+        if not self.lightweight:
+            return super(LightweightMixin, self).liveElement(req, tag)
+        return tag(id='athena:%d' % (self.getLightweightID(),))
+
+
+
+class InputContainer(LightweightMixin, ThemedElement):
     """
     Generic container for form inputs.
     """
@@ -341,6 +527,7 @@ class InputContainer(ThemedElement):
         @param doc: Input caption
         """
         super(InputContainer, self).__init__(**kw)
+        self._setLightweight(parent)
         parent.addFormChild(self)
         self.setFragmentParent(parent)
         self.parent = parent
@@ -426,6 +613,7 @@ class GroupInput(FormGroup):
     XXX: This API should be considered extremely unstable.
     """
     jsClass = u'Methanal.View.GroupInput'
+    supportsLightweight = False
 
 
     def __init__(self, parent, name):
@@ -461,7 +649,7 @@ class GroupInput(FormGroup):
 
 
 
-class FormInput(ThemedElement):
+class FormInput(LightweightMixin, ThemedElement):
     """
     Abstract input widget class.
     """
@@ -489,8 +677,10 @@ class FormInput(ThemedElement):
             label = self.param.doc
         self.label = label
 
+        self._setLightweight(parent)
         if not isinstance(parent, FormRow):
             container = FormRow(parent=parent, doc=self.param.doc)
+            self._setLightweight(container)
             container.addFormChild(self)
             self.setFragmentParent(container)
         else:
@@ -912,15 +1102,119 @@ class VerifiedPasswordInput(TextInput):
 
 
 
+class RenderedOptionCache(object):
+    """
+    Bounded cache of the rendered option markup of L{ChoiceInput}s.
+
+    The least recently used markup is discarded once the total size of the
+    cached markup exceeds L{maxSize}.
+
+    @type maxSize: C{int}
+    @ivar maxSize: Maximum total size, in bytes, of the cached markup
+
+    @type size: C{int}
+    @ivar size: Total size, in bytes, of the cached markup
+
+    @type hits: C{int}
+    @ivar hits: Number of lookups that found cached markup
+
+    @type misses: C{int}
+    @ivar misses: Number of lookups that found no cached markup
+    """
+    def __init__(self, maxSize=4 * 1024 * 1024):
+        self.maxSize = maxSize
+        self.hits = 0
+        self.misses = 0
+        self.clear()
+
+
+    def clear(self):
+        """
+        Discard all cached markup.
+        """
+        self._entries = OrderedDict()
+        self.size = 0
+
+
+    def get(self, key):
+        """
+        Get cached markup.
+
+        @rtype: C{str}
+        @return: The markup cached for C{key}, or C{None} if there is none
+        """
+        markup = self._entries.pop(key, None)
+        if markup is None:
+            self.misses += 1
+        else:
+            self._entries[key] = markup
+            self.hits += 1
+        return markup
+
+
+    def put(self, key, markup):
+        """
+        Cache markup, discarding the least recently used markup if necessary.
+
+        @type  markup: C{str}
+        """
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.size -= len(previous)
+        if len(markup) > self.maxSize:
+            return
+        self._entries[key] = markup
+        self.size += len(markup)
+        while self.size > self.maxSize:
+            _, discarded = self._entries.popitem(last=False)
+            self.size -= len(discarded)
+
+
+
+renderedOptionCache = RenderedOptionCache()
+
+
+
+class _RenderedOptions(Element):
+    """
+    Renderable for option markup, using the renderers of the input the
+    options belong to.
+    """
+    def __init__(self, input, options):
+        self.input = input
+        self.options = options
+
+
+    def renderer(self, name):
+        return self.input.renderer(name)
+
+
+    def render(self, request):
+        return self.options
+
+
+
 class ChoiceInput(FormInput):
     """
     Abstract input with multiple options.
 
+    Rendered options are cached in L{optionCache}, for shared enumerations
+    with a C{version} attribute, see L{methanal.enums.Enum.shared}, and reused
+    by inputs of the same type and name that have the same enumeration and
+    template. Enumerations created for each form are never cached, since
+    their options could never be reused.
+
     @type values: L{IEnumeration}
     @ivar values: An enumeration to be used for choice options. C{ChoiceInput}
         will group enumeration values by their C{'group'} extra value, if one
         exists.
+
+    @type optionCache: L{RenderedOptionCache}
+    @cvar optionCache: Cache of rendered options, or C{None} to always render
+        options
     """
+    optionCache = renderedOptionCache
+
     def __init__(self, values, **kw):
         super(ChoiceInput, self).__init__(**kw)
         _values = IEnumeration(values, None)
@@ -942,8 +1236,37 @@ class ChoiceInput(FormInput):
             yield o
 
 
+    def _getOptionCacheKey(self):
+        """
+        Get the key to cache this input's rendered options with.
+
+        @return: A hashable key, or C{None} if the options cannot be cached
+        """
+        version = getattr(self.values, 'version', None)
+        if (self.optionCache is None or version is None or
+            not getattr(self.values, 'shared', False)):
+            return None
+        return (self.values, version, self.docFactory, type(self), self.name)
+
+
     @renderer
     def options(self, req, tag):
+        """
+        Render all available options, or get them from L{optionCache}.
+        """
+        key = self._getOptionCacheKey()
+        if key is None:
+            return self._renderOptions(tag)
+
+        markup = self.optionCache.get(key)
+        if markup is None:
+            options = list(self._renderOptions(tag))
+            markup = flat.flatten(_RenderedOptions(self, options))
+            self.optionCache.put(key, markup)
+        return xml(markup)
+
+
+    def _renderOptions(self, tag):
         """
         Render all available options.
         """
@@ -952,7 +1275,7 @@ class ChoiceInput(FormInput):
 
         groups = itertools.groupby(self.values, lambda e: e.get('group'))
         for group, enums in groups:
-            options = self._makeOptions(optionPattern, enums)
+            options = list(self._makeOptions(optionPattern, enums))
             if group is not None:
                 g = groupPattern()
                 g.fillSlots('label', group)
@@ -1180,6 +1503,81 @@ class SelectInput(ChoiceInput):
 
 
 
+class SearchableSelectInput(ChoiceInput):
+    """
+    Dropdown input whose options are searched for on demand.
+
+    Only the selected option is rendered, other options are found by
+    searching L{values} for text entered by the user. This avoids rendering
+    every option for enumerations with a great many items, such as
+    L{methanal.enums.QueryEnum}.
+
+    @type values: L{ISearchableEnumeration}
+    @ivar values: Searchable enumeration, creating the input with an
+        enumeration that is not searchable raises C{ValueError}
+
+    @type limit: C{int}
+    @ivar limit: Maximum number of options to find for each search
+
+    @type minSearchLength: C{int}
+    @ivar minSearchLength: Minimum length of text to search for
+    """
+    fragmentName = 'methanal-searchable-select-input'
+    jsClass = u'Methanal.View.SearchableSelectInput'
+    supportsLightweight = False
+
+
+    def __init__(self, values, limit=50, minSearchLength=1, **kw):
+        super(SearchableSelectInput, self).__init__(values=values, **kw)
+        searchable = ISearchableEnumeration(self.values, None)
+        if searchable is None:
+            raise ValueError('%r is not searchable' % (self.values,))
+        self.values = searchable
+        self.limit = limit
+        self.minSearchLength = minSearchLength
+
+
+    def getArgs(self):
+        return {u'minSearchLength': self.minSearchLength}
+
+
+    @renderer
+    def options(self, req, tag):
+        """
+        Render the selected option, if there is one.
+        """
+        if self.param.value is None:
+            return []
+        try:
+            item = self.values.get(self.param.value)
+        except errors.InvalidEnumItem:
+            return []
+        return self._makeOptions(tag.patternGenerator('option'), [item])
+
+
+    @expose
+    def search(self, text):
+        """
+        Search for options.
+
+        @type  text: C{unicode}
+        @param text: Text to search for
+
+        @rtype: C{dict}
+        @return: Mapping of C{u'options'} to a C{list} of at most L{limit}
+            C{[value, description]} pairs, and C{u'truncated'} to a C{bool}
+            indicating whether more options than that were found
+        """
+        if len(text) < self.minSearchLength:
+            return {u'options': [], u'truncated': False}
+        items = list(self.values.search(text, self.limit + 1))
+        return {
+            u'options': [[item.get('id', item.value), item.desc]
+                         for item in items[:self.limit]],
+            u'truncated': len(items) > self.limit}
+
+
+
 class ObjectSelectInput(ObjectChoiceMixin, SelectInput):
     """
     Variant of L{SelectInput} for arbitrary Python objects.
@@ -2,6 +2,9 @@
 Utility widgets designed to operate outside of forms.
 """
 import time
+from collections import OrderedDict
+from bisect import bisect_left
+from itertools import islice, izip
 from warnings import warn
 
 from zope.interface import implements
@@ -15,6 +18,8 @@ from twisted.python.versions import Version
 from twisted.python.deprecate import deprecated
 
 from axiom.item import SQLAttribute
+from axiom.attributes import AND, text
+from axiom.store import ItemQuery
 
 from nevow.inevow import IAthenaTransportable
 from nevow.athena import expose
@@ -23,8 +28,8 @@ from nevow.page import renderer
 from xmantissa.ixmantissa import IWebTranslator, IColumn as mantissaIColumn
 from xmantissa.webtheme import ThemedElement
 
-from methanal.imethanal import IColumn
-from methanal.util import getArgsDict
+from methanal.imethanal import IColumn, IBatchColumn
+from methanal.util import getArgsDict, releaseFragment, ContainsComparison
 from methanal.view import (
     liveFormFromAttributes, SimpleForm, FormInput, LiveForm, ActionButton,
     SelectInput)
@@ -53,9 +58,98 @@ registerAdapter(TimeTransportable, Time, IAthenaTransportable)
 
 
 
+class WebIDCache(object):
+    """
+    Cache of item web IDs, keyed on the item's store and store ID.
+
+    @type maxSize: C{int}
+    @ivar maxSize: Maximum number of web IDs to cache, at least 1, the least
+        recently used web IDs are discarded first; or C{None} for no limit
+
+    @type webTranslator: L{xmantissa.ixmantissa.IWebTranslator}
+    @ivar webTranslator: Web translator to use for all items, or C{None} to
+        adapt each item's store to C{IWebTranslator}
+
+    @type hits: C{int}
+    @ivar hits: Number of web IDs found in the cache
+
+    @type misses: C{int}
+    @ivar misses: Number of web IDs not found in the cache
+    """
+    def __init__(self, maxSize=None, webTranslator=None):
+        if maxSize is not None and maxSize < 1:
+            raise ValueError('maxSize must be at least 1, not %r' % (maxSize,))
+        self.maxSize = maxSize
+        self.webTranslator = webTranslator
+        self.hits = 0
+        self.misses = 0
+        self._webIDs = OrderedDict()
+        self._webTranslators = {}
+
+
+    def __repr__(self):
+        return '<%s maxSize=%r size=%r hits=%r misses=%r>' % (
+            type(self).__name__,
+            self.maxSize,
+            len(self._webIDs),
+            self.hits,
+            self.misses)
+
+
+    def _getWebTranslator(self, store):
+        """
+        Get the web translator for a store.
+        """
+        if self.webTranslator is not None:
+            return self.webTranslator
+        try:
+            return self._webTranslators[store]
+        except KeyError:
+            webTranslator = self._webTranslators[store] = IWebTranslator(
+                store, None)
+            return webTranslator
+
+
+    def getWebID(self, item):
+        """
+        Get the web ID for an item.
+
+        @type  item: L{axiom.item.Item}
+
+        @rtype: C{unicode}
+        @return: The item's web ID, or C{None} if there is no web translator
+            for the item's store
+        """
+        key = item.store, item.storeID
+        try:
+            webID = self._webIDs.pop(key)
+        except KeyError:
+            self.misses += 1
+            webTranslator = self._getWebTranslator(item.store)
+            if webTranslator is None:
+                webID = None
+            else:
+                webID = unicode(webTranslator.toWebID(item), 'ascii')
+            if self.maxSize is not None and len(self._webIDs) >= self.maxSize:
+                self._webIDs.popitem(last=False)
+        else:
+            self.hits += 1
+        self._webIDs[key] = webID
+        return webID
+
+
+    def clear(self):
+        """
+        Discard all cached web IDs.
+        """
+        self._webIDs.clear()
+        self._webTranslators.clear()
+
+
+
 class AttributeColumn(object):
     """
-    An L{methanal.imethanal.IColumn} provider for Axiom attributes.
+    An L{methanal.imethanal.IBatchColumn} provider for Axiom attributes.
 
     @type attribute: L{axiom.attributes.SQLAttribute}
 
@@ -63,7 +157,7 @@ class AttributeColumn(object):
     @param attributeID: Attribute column identifier, defaults to the attribute
         name
     """
-    implements(IColumn)
+    implements(IBatchColumn)
 
     def __init__(self, attribute, attributeID=None, title=None):
         self.attribute = attribute
@@ -100,6 +194,9 @@ class AttributeColumn(object):
 
 
     def extractLink(self, model, item):
+        webIDCache = getattr(model, 'webIDCache', None)
+        if webIDCache is not None:
+            return webIDCache.getWebID(item)
         webTranslator = IWebTranslator(item.store, None)
         if webTranslator is not None:
             return unicode(webTranslator.toWebID(item), 'ascii')
@@ -109,6 +206,40 @@ class AttributeColumn(object):
     def getType(self):
         return type(self.attribute).__name__
 
+
+    # IBatchColumn
+
+    def extractValues(self, model, items):
+        attrname = self.attribute.attrname
+        return [getattr(item, attrname) for item in items]
+
+
+    def extractLinks(self, model, items):
+        """
+        Extract links for several items, adapting each distinct store to
+        L{IWebTranslator} only once.
+
+        If C{model} has a C{webIDCache} attribute, that is not C{None}, it is
+        used to look up links instead.
+        """
+        webIDCache = getattr(model, 'webIDCache', None)
+        if webIDCache is not None:
+            return [webIDCache.getWebID(item) for item in items]
+        webTranslators = {}
+        links = []
+        for item in items:
+            store = item.store
+            try:
+                webTranslator = webTranslators[store]
+            except KeyError:
+                webTranslator = webTranslators[store] = IWebTranslator(
+                    store, None)
+            if webTranslator is None:
+                links.append(None)
+            else:
+                links.append(unicode(webTranslator.toWebID(item), 'ascii'))
+        return links
+
 registerAdapter(AttributeColumn, SQLAttribute, IColumn)
 
 
@@ -132,6 +263,7 @@ class LinkColumn(object):
         self.getType = self._column.getType
         self.attributeID = self._column.attributeID
         self.title = self._column.title
+        self.attribute = getattr(self._column, 'attribute', None)
 
 
 
@@ -141,11 +273,22 @@ class Row(object):
 
     @ivar id: Row identifier
 
+    @ivar key: Stable row key, see L{Table.getRowKey}
+
+    @ivar item: Item the row was created from
+
     @type cells: Mapping of C{unicode} to L{Cell}
     @ivar cells: Mapping of column identifiers to cell objects
     """
-    def __init__(self, item, index, table):
+    __slots__ = ['id', 'key', 'item', 'cells']
+
+    def __init__(self, item, index, table, cells=None):
         self.id = index
+        self.key = table.getRowKey(item, index)
+        self.item = item
+        if cells is not None:
+            self.cells = cells
+            return
         self.cells = dict()
         for column in table.columns:
             columnID = unicode(column.attributeID, 'ascii')
@@ -164,7 +307,7 @@ class RowTransportable(record('row')):
     jsClass = u'Methanal.Widgets.Row'
 
     def getInitialArguments(self):
-        return [self.row.id, self.row.cells]
+        return [self.row.id, self.row.cells, self.row.key]
 
 registerAdapter(RowTransportable, Row, IAthenaTransportable)
 
@@ -180,6 +323,8 @@ class Cell(object):
     @ivar link: Hyperlink for the cell, or C{None} if the cell is not
         hyperlinked
     """
+    __slots__ = ['value', 'link']
+
     def __init__(self, value, link):
         self.value = value
         self.link = link
@@ -201,6 +346,65 @@ registerAdapter(CellTransportable, Cell, IAthenaTransportable)
 
 
 
+class RowSet(object):
+    """
+    A collection of L{Table} rows, transported to the client column by column
+    rather than as individual row and cell objects.
+
+    @type columnIDs: C{list} of C{unicode}
+    @ivar columnIDs: Column identifiers
+
+    @type rows: C{list} of L{Row}
+    """
+    __slots__ = ['columnIDs', 'rows']
+
+    def __init__(self, columnIDs, rows):
+        self.columnIDs = columnIDs
+        self.rows = rows
+
+
+    def __len__(self):
+        return len(self.rows)
+
+
+    def __iter__(self):
+        return iter(self.rows)
+
+
+
+class RowSetTransportable(record('rowSet')):
+    """
+    An C{IAthenaTransportable} implementation for L{RowSet} instances.
+
+    Row identifiers, row keys and cell values are each sent as an array per
+    column. Cell links are only sent for columns that have any links.
+    """
+    implements(IAthenaTransportable)
+
+    jsClass = u'Methanal.Widgets.RowSet'
+
+    def getInitialArguments(self):
+        rows = self.rowSet.rows
+        values = {}
+        links = {}
+        for columnID in self.rowSet.columnIDs:
+            cells = [row.cells[columnID] for row in rows]
+            values[columnID] = [cell.value for cell in cells]
+            columnLinks = [cell.link for cell in cells]
+            for link in columnLinks:
+                if link is not None:
+                    links[columnID] = columnLinks
+                    break
+        return [
+            [row.id for row in rows],
+            [row.key for row in rows],
+            values,
+            links]
+
+registerAdapter(RowSetTransportable, RowSet, IAthenaTransportable)
+
+
+
 class ColumnTransportable(record('column')):
     """
     An C{IAthenaTransportable} implementation for L{IColumn}.
@@ -244,20 +448,74 @@ class Table(ThemedElement):
         I{iterable} of L{axiom.item.Item}.
 
     @type columns: I{iterable} of L{methanal.imethanal.IColumn}
+
+    @type pageSize: C{int}
+    @ivar pageSize: Number of rows to send to the client at a time, or C{None}
+        to send all rows up front. When the items are an Axiom item query the
+        window is pushed down into the query with C{LIMIT}/C{OFFSET}; an item
+        query given to a table that is neither paged nor L{sortable} is run
+        once, when the table is created
+
+    @type sortable: C{bool}
+    @ivar sortable: Can the client sort and filter the table?
+
+    @type sortColumnID: C{unicode}
+    @ivar sortColumnID: Identifier of the column to sort rows by, or C{None}
+        to use the natural order of L{items}
+
+    @type sortAscending: C{bool}
+    @ivar sortAscending: Sort rows in ascending order?
+
+    @type filters: C{dict} mapping C{unicode} to values
+    @ivar filters: Mapping of column identifiers to values that rows must
+        match; text columns match rows containing the value, literally and
+        ignoring case, other columns match rows equal to the value
+
+    @type webIDCache: L{WebIDCache}
+    @ivar webIDCache: Cache of item links used by columns. If no cache is
+        given when the table is created, a cache that is cleared whenever rows
+        are created is used; a cache given, for example one with a size limit
+        that is shared between tables, is never cleared by the table
+
+    @type compactRows: C{bool}
+    @ivar compactRows: Send rows to the client as a L{RowSet}, rather than
+        individual row and cell objects?
+
+    @type rowVersion: C{int}
+    @ivar rowVersion: Version of the row key to item resolution used by
+        L{getRowItem}, incremented each time it is invalidated
     """
     jsClass = u'Methanal.Widgets.Table'
     fragmentName = 'methanal-table'
 
 
-    def __init__(self, items, columns, **kw):
+    def __init__(self, items, columns, pageSize=None, sortable=False,
+                 webIDCache=None, compactRows=False, **kw):
         super(Table, self).__init__(**kw)
         if callable(items):
             itemsFactory = items
         else:
-            items = list(items)
+            # Paging and sorting are pushed down into an Axiom item query, any
+            # other items are fixed when the table is created.
+            if (not isinstance(items, ItemQuery) or
+                (pageSize is None and not sortable)):
+                items = list(items)
             itemsFactory = lambda: items
         self._itemsFactory = itemsFactory
         self.columns = [IColumn(column) for column in columns]
+        self.pageSize = pageSize
+        self.sortable = sortable
+        self.sortColumnID = None
+        self.sortAscending = True
+        self.filters = {}
+        self._remoteRows = []
+        self._rowItems = {}
+        self.rowVersion = 0
+        self._ownWebIDCache = webIDCache is None
+        if webIDCache is None:
+            webIDCache = WebIDCache()
+        self.webIDCache = webIDCache
+        self.compactRows = compactRows
 
 
     @property
@@ -273,40 +531,553 @@ class Table(ThemedElement):
 
 
     def getArgs(self):
+        rows, totalRows = self.getFirstPage()
+        if self.pageSize is None:
+            return {u'columns': self.columns,
+                    u'rows': rows,
+                    u'sortable': self.sortable}
         return {u'columns': self.columns,
-                u'rows': self._createRows(self.items)}
+                u'rows': rows,
+                u'pageSize': self.pageSize,
+                u'totalRows': totalRows,
+                u'sortable': self.sortable}
+
+
+    def getColumn(self, columnID):
+        """
+        Get a column by its identifier.
+
+        @raise InvalidIdentifier: If C{columnID} does not identify a column
+
+        @rtype: L{methanal.imethanal.IColumn}
+        """
+        for column in self.columns:
+            if unicode(column.attributeID, 'ascii') == columnID:
+                return column
+        raise InvalidIdentifier(
+            u'%r is not a valid column identifier' % (columnID,))
+
+
+    def _getColumnAttribute(self, column, tableClass):
+        """
+        Get the Axiom attribute, belonging to C{tableClass}, that C{column}
+        was created from, or C{None} if there is no such attribute.
+        """
+        attribute = getattr(column, 'attribute', None)
+        if (isinstance(attribute, SQLAttribute) and
+            attribute.type is tableClass):
+            return attribute
+        return None
+
+
+    def _queryViewItems(self, query):
+        """
+        Apply L{filters} and the sort order to an Axiom item query.
+
+        @return: A new item query, or C{None} if any of the columns involved
+            could not be translated into query terms
+        """
+        if query.limit is not None or query.offset is not None:
+            # Filtering or sorting the query would change which items fall
+            # within the limit.
+            return None
+
+        comparisons = []
+        if query.comparison is not None:
+            comparisons.append(query.comparison)
+        for columnID, value in sorted(self.filters.iteritems()):
+            column = self.getColumn(columnID)
+            attribute = self._getColumnAttribute(column, query.tableClass)
+            if attribute is None:
+                return None
+            if isinstance(attribute, text):
+                comparisons.append(ContainsComparison(attribute, value))
+            else:
+                comparisons.append(attribute == value)
+
+        sort = query.sort
+        if self.sortColumnID is not None:
+            column = self.getColumn(self.sortColumnID)
+            attribute = self._getColumnAttribute(column, query.tableClass)
+            if attribute is None:
+                return None
+            if self.sortAscending:
+                sort = attribute.ascending
+            else:
+                sort = attribute.descending
+
+        comparison = None
+        if len(comparisons) == 1:
+            comparison = comparisons[0]
+        elif comparisons:
+            comparison = AND(*comparisons)
+        return query.store.query(query.tableClass, comparison, sort=sort)
+
+
+    def _matchesFilters(self, item):
+        """
+        Determine whether C{item} matches L{filters}.
+        """
+        for columnID, value in self.filters.iteritems():
+            column = self.getColumn(columnID)
+            itemValue = column.extractValue(self, item)
+            if column.getType() in (None, 'text'):
+                if itemValue is None:
+                    return False
+                if value.lower() not in itemValue.lower():
+                    return False
+            elif itemValue != value:
+                return False
+        return True
+
+
+    @property
+    def viewItems(self):
+        """
+        L{items} with L{filters} and the sort order applied.
+
+        When L{items} is an Axiom item query, and all the columns involved are
+        backed by attributes of the queried item type, the filtering and
+        sorting is performed by the store; otherwise it is performed on the
+        extracted column values.
+        """
+        items = self.items
+        if not self.filters and self.sortColumnID is None:
+            return items
+
+        if isinstance(items, ItemQuery):
+            query = self._queryViewItems(items)
+            if query is not None:
+                return query
+
+        items = [item for item in items if self._matchesFilters(item)]
+        if self.sortColumnID is not None:
+            column = self.getColumn(self.sortColumnID)
+            items.sort(
+                key=lambda item: column.extractValue(self, item),
+                reverse=not self.sortAscending)
+        return items
+
+
+    def getRowKey(self, item, index):
+        """
+        Get a key that identifies an item's row, regardless of its position in
+        the table.
+
+        The default implementation uses the item's C{storeID}, if it has one,
+        and otherwise falls back to the row index.
+        """
+        return getattr(item, 'storeID', index)
 
 
-    def _createRows(self, items):
+    def _createRows(self, items, offset=0):
         """
         Create L{Row} items for use on the client.
+
+        Cells are extracted a column at a time, using
+        L{methanal.imethanal.IBatchColumn} where columns provide it.
+
+        @type  offset: C{int}
+        @param offset: Index of the first item in C{items}, used to number the
+            rows
         """
+        if self._ownWebIDCache:
+            self.webIDCache.clear()
+        items = list(items)
+        cells = [dict() for item in items]
+        for column in self.columns:
+            columnID = unicode(column.attributeID, 'ascii')
+            if IBatchColumn.providedBy(column):
+                values = column.extractValues(self, items)
+                links = column.extractLinks(self, items)
+            else:
+                values = [column.extractValue(self, item) for item in items]
+                links = [column.extractLink(self, item) for item in items]
+            for rowCells, value, link in izip(cells, values, links):
+                rowCells[columnID] = Cell(value, link)
         return [
-            Row(item, index, self) for index, item in enumerate(items)]
+            Row(item, offset + index, self, cells[index])
+            for index, item in enumerate(items)]
+
+
+    def getItemRange(self, offset, limit):
+        """
+        Get a window of items.
+
+        If L{items} is an Axiom item query, the window is applied to the query
+        itself so that only the requested items are loaded from the store. The
+        store ID is used to break ties in the query's sort order, so that
+        items with the same sort values cannot move between windows.
+
+        @type  offset: C{int}
+        @param offset: Index of the first item
+
+        @type  limit: C{int}
+        @param limit: Maximum number of items, or C{None} for no limit
+
+        @rtype: C{list} of L{axiom.item.Item}
+        """
+        items = self.viewItems
+        if isinstance(items, ItemQuery):
+            if items.offset is not None:
+                offset += items.offset
+            if items.limit is not None:
+                end = (items.offset or 0) + items.limit
+                if limit is None or offset + limit > end:
+                    limit = max(end - offset, 0)
+            if limit is None:
+                limit = -1
+            return list(items.store.query(
+                items.tableClass,
+                items.comparison,
+                limit=limit,
+                offset=offset,
+                sort=items.sort + items.tableClass.storeID.ascending))
+
+        if limit is None:
+            end = None
+        else:
+            end = offset + limit
+        return list(islice(items, offset, end))
+
+
+    def countItems(self):
+        """
+        Count the number of items in the table.
+
+        @rtype: C{int}
+        """
+        items = self.viewItems
+        if isinstance(items, ItemQuery):
+            if items.limit is None and items.offset is None:
+                return items.count()
+            # Axiom's COUNT does not take LIMIT and OFFSET into account.
+            count = items.store.count(items.tableClass, items.comparison)
+            count = max(count - (items.offset or 0), 0)
+            if items.limit is not None:
+                count = min(count, items.limit)
+            return count
+        try:
+            return len(items)
+        except TypeError:
+            return len(list(items))
+
+
+    def _getRowRange(self, offset, limit):
+        """
+        Create L{Row}s for a window of items.
+        """
+        return self._createRows(self.getItemRange(offset, limit), offset)
+
+
+    def _transportRows(self, rows):
+        """
+        Prepare rows for sending to the client, according to L{compactRows}.
+        """
+        if self.compactRows:
+            columnIDs = [
+                unicode(column.attributeID, 'ascii')
+                for column in self.columns]
+            return RowSet(columnIDs, rows)
+        return rows
+
+
+    def _getRowState(self, row):
+        """
+        Get a comparable snapshot of a row's cells.
+        """
+        return dict(
+            (columnID, (cell.value, cell.link))
+            for columnID, cell in row.cells.iteritems())
+
+
+    def _rememberRows(self, rows, offset=0):
+        """
+        Remember the rows the remote side has, from C{offset} onwards, for
+        computing row changes later.
+
+        Rows are remembered by their absolute index, positions before
+        C{offset} that the remote side has not fetched are remembered as
+        C{None}.
+        """
+        if offset == 0:
+            self.invalidateRows()
+        del self._remoteRows[offset:]
+        self._remoteRows.extend([None] * (offset - len(self._remoteRows)))
+        self._remoteRows.extend(
+            (row.key, self._getRowState(row)) for row in rows)
+        for row in rows:
+            self._rowItems[row.key] = row.item
+
+
+    def invalidateRows(self):
+        """
+        Forget the items resolved for row keys by L{getRowItem}.
+
+        This happens whenever the remote side's rows are replaced, and should
+        be called if the items backing the table change, for example items
+        being deleted, without the remote rows being replaced or updated.
+
+        @rtype: C{int}
+        @return: The new L{rowVersion}
+        """
+        self._rowItems.clear()
+        self.rowVersion += 1
+        return self.rowVersion
+
+
+    def _loadRowItem(self, key):
+        """
+        Find the item for a row key that is not already known.
+
+        Only items in L{viewItems} are found. Items of an Axiom item query are
+        looked up by their C{storeID} within the query, otherwise the items
+        are searched.
+        """
+        items = self.viewItems
+        if (isinstance(items, ItemQuery) and
+            items.limit is None and items.offset is None):
+            if isinstance(key, (int, long)):
+                comparison = items.tableClass.storeID == key
+                if items.comparison is not None:
+                    comparison = AND(items.comparison, comparison)
+                item = items.store.findFirst(items.tableClass, comparison)
+                if item is not None and self.getRowKey(item, None) == key:
+                    return item
+        else:
+            for index, item in enumerate(items):
+                if self.getRowKey(item, index) == key:
+                    return item
+        raise InvalidIdentifier(u'%r is not a valid row key' % (key,))
+
+
+    def getRowItem(self, key):
+        """
+        Get the item for a row key.
+
+        Items for the rows sent to the remote side are remembered, other items
+        are loaded on demand, neither requires running the item query again.
+
+        @param key: Row key, see L{getRowKey}
+
+        @raise InvalidIdentifier: If C{key} does not identify a row
+
+        @rtype: L{axiom.item.Item}
+        """
+        item = self._rowItems.get(key)
+        if item is None:
+            item = self._rowItems[key] = self._loadRowItem(key)
+        return item
+
+
+    def computeRowChanges(self, rows):
+        """
+        Compute the changes needed to turn the rows the remote side has into
+        C{rows}.
+
+        Rows are matched by their key. Rows whose cells changed are updated in
+        place, rows that have moved relative to the others are removed and
+        inserted again at their new position.
+
+        @type  rows: C{list} of L{Row}
+        @param rows: New rows
+
+        @rtype: C{tuple}
+        @return: C{(removed, updated, inserted)}: a C{list} of keys of rows to
+            remove, a C{list} of L{Row}s to update in place and a C{list} of
+            C{[index, row]} pairs, ordered by index, to insert once the removed
+            and updated rows have been dealt with
+        """
+        remoteRows = [
+            (index, remoteRow)
+            for index, remoteRow in enumerate(self._remoteRows)
+            if remoteRow is not None]
+        oldPositions = dict(
+            (key, (index, state)) for index, (key, state) in remoteRows)
+
+        # Keep the longest run of rows whose relative order has not changed,
+        # any other common rows have moved.
+        common = [row for row in rows if row.key in oldPositions]
+        tails = []
+        tailIndices = []
+        previous = [None] * len(common)
+        for i, row in enumerate(common):
+            position = oldPositions[row.key][0]
+            j = bisect_left(tails, position)
+            if j > 0:
+                previous[i] = tailIndices[j - 1]
+            if j == len(tails):
+                tails.append(position)
+                tailIndices.append(i)
+            else:
+                tails[j] = position
+                tailIndices[j] = i
+        kept = set()
+        if tailIndices:
+            i = tailIndices[-1]
+            while i is not None:
+                kept.add(common[i].key)
+                i = previous[i]
+
+        removed = [
+            key for index, (key, state) in remoteRows if key not in kept]
+        updated = []
+        inserted = []
+        for index, row in enumerate(rows):
+            if row.key not in kept:
+                inserted.append([index, row])
+            elif oldPositions[row.key][1] != self._getRowState(row):
+                updated.append(row)
+        return removed, updated, inserted
 
 
     def replaceRemoteRows(self, items=None):
         """
         Replace rows on the remote side.
 
+        If L{pageSize} is not C{None} and C{items} is not specified only the
+        first page of rows is sent.
+
         @type  items: I{iterable} of L{axiom.item.Item}
         @param items: Rows.
         """
-        if items is None:
-            items = self.items
-        return self.callRemote('repopulate', self._createRows(items))
+        if items is not None:
+            rows = self._createRows(items)
+            self._rememberRows(rows)
+            return self.callRemote('repopulate', self._transportRows(rows))
+        return self.callRemote('repopulate', *self.getFirstPage())
+
+
+    def updateRemoteRows(self):
+        """
+        Update rows on the remote side, only sending the rows that have been
+        removed, changed or inserted since the remote side last received rows.
+
+        If L{pageSize} is not C{None} the rows the remote side has already
+        loaded, or the first page, are compared.
+        """
+        if self.pageSize is None:
+            rows = self._createRows(self.viewItems)
+            totalRows = len(rows)
+        else:
+            limit = max(len(self._remoteRows), self.pageSize)
+            rows = self._getRowRange(0, limit)
+            totalRows = self.countItems()
+        removed, updated, inserted = self.computeRowChanges(rows)
+        self._rememberRows(rows)
+        return self.callRemote(
+            'updateRows', removed, updated, inserted, totalRows)
 
 
     @expose
-    def performAction(self, name, rowIndex):
+    def performAction(self, name, rowKey):
+        """
+        Invoke an action method, named C{'action_' + name}, with the item for
+        a row.
+
+        @param rowKey: Key of the row the action was triggered for, see
+            L{getRowKey}
+        """
         method = getattr(self, 'action_' + name)
-        item = self.items[rowIndex]
-        return method(item)
+        return method(self.getRowItem(rowKey))
+
+
+    @expose
+    def getRowRange(self, offset, limit):
+        """
+        Get a window of rows and the current total number of rows.
+
+        C{limit} is capped at L{pageSize}, if it is not C{None}.
+
+        @rtype: C{list}
+        @return: C{[rows, totalRows]}
+        """
+        if self.pageSize is not None:
+            limit = min(limit, self.pageSize)
+        rows = self._getRowRange(offset, limit)
+        self._rememberRows(rows, offset)
+        return [self._transportRows(rows), self.countItems()]
+
+
+    def _checkSortable(self):
+        """
+        Ensure the table can be sorted and filtered.
+
+        @raise ValueError: If the table is not L{sortable}
+        """
+        if not self.sortable:
+            raise ValueError('%r is not sortable' % (self,))
+
+
+    @expose
+    def sortRows(self, columnID, ascending):
+        """
+        Sort the rows by a column.
+
+        @type  columnID: C{unicode}
+        @param columnID: Identifier of the column to sort by, or C{None} to use
+            the natural order of L{items}
+
+        @type  ascending: C{bool}
+        @param ascending: Sort in ascending order?
+
+        @raise ValueError: If the table is not L{sortable}
+
+        @rtype: C{list}
+        @return: C{[rows, totalRows]} for the first page of sorted rows
+        """
+        self._checkSortable()
+        if columnID is not None:
+            self.getColumn(columnID)
+        self.sortColumnID = columnID
+        self.sortAscending = ascending
+        return self.getFirstPage()
+
+
+    @expose
+    def filterRows(self, filters):
+        """
+        Filter the rows by column values.
+
+        @type  filters: C{dict} mapping C{unicode} to values
+        @param filters: See L{filters}
+
+        @raise ValueError: If the table is not L{sortable}
+
+        @rtype: C{list}
+        @return: C{[rows, totalRows]} for the first page of filtered rows
+        """
+        self._checkSortable()
+        for columnID in filters:
+            self.getColumn(columnID)
+        self.filters = dict(filters)
+        return self.getFirstPage()
+
+
+    @expose
+    def getFirstPage(self):
+        """
+        Get the first page of rows, or all the rows if L{pageSize} is C{None},
+        and the current total number of rows.
+
+        @rtype: C{list}
+        @return: C{[rows, totalRows]}
+        """
+        if self.pageSize is None:
+            rows = self._createRows(self.viewItems)
+            self._rememberRows(rows)
+            return [self._transportRows(rows), len(rows)]
+        return self.getRowRange(0, self.pageSize)
 
 
     @expose
     def _getRows(self):
-        return self._createRows(self.items)
+        """
+        Get the first page of rows, or all the rows if L{pageSize} is C{None}.
+
+        @see: L{getFirstPage}, which also returns the total number of rows
+        """
+        return self.getFirstPage()[0]
 
 
 
@@ -319,7 +1090,8 @@ class QueryList(ThemedElement):
     jsClass = u'Methanal.Widgets.QueryList'
     fragmentName = 'methanal-table'
 
-    def __init__(self, rows, columns, webTranslator=None, timezone=None, **kw):
+    def __init__(self, rows, columns, webTranslator=None, timezone=None,
+                 webIDCache=None, **kw):
         warn('QueryList is deprecated, use methanal.widgets.Table instead')
         super(QueryList, self).__init__(**kw)
 
@@ -338,6 +1110,9 @@ class QueryList(ThemedElement):
         self.columns = [(col.attributeID.decode('ascii'), col)
                         for col in columns]
         self.webTranslator = webTranslator
+        if webIDCache is None:
+            webIDCache = WebIDCache(webTranslator=webTranslator)
+        self.webIDCache = webIDCache
 
         if timezone is None:
             hour, minute = divmod(time.timezone, -3600)
@@ -357,9 +1132,7 @@ class QueryList(ThemedElement):
         if isinstance(item, tuple):
             link, item = item
         else:
-            if self.webTranslator is None:
-                self.webTranslator = IWebTranslator(item.store)
-            link = unicode(self.webTranslator.toWebID(item), 'ascii')
+            link = self.webIDCache.getWebID(item)
 
         d = dict((cid, _formatValue(col.extractValue(self, item)))
                  for (cid, col) in self.columns)
@@ -519,6 +1292,128 @@ class SimpleFilterList(FilterList):
 
 
 
+class LookupCache(object):
+    """
+    Cache of L{Lookup} results, keyed on normalised lookup criteria.
+
+    A cache can be shared by several L{Lookup}s, results are also keyed on
+    the lookup's C{populate} callable and result limit.
+
+    @type maxSize: C{int}
+    @ivar maxSize: Maximum number of results to cache, the least recently
+        used results are discarded first
+
+    @type ttl: C{float}
+    @ivar ttl: Number of seconds results are cached for
+
+    @ivar clock: C{IReactorTime} provider used to expire results
+
+    @type hits: C{int}
+    @ivar hits: Number of lookups found in the cache
+
+    @type misses: C{int}
+    @ivar misses: Number of lookups not found in the cache
+    """
+    def __init__(self, maxSize=256, ttl=60, clock=None):
+        if clock is None:
+            from twisted.internet import reactor as clock
+        self.maxSize = maxSize
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._results = OrderedDict()
+
+
+    def __repr__(self):
+        return '<%s maxSize=%r ttl=%r size=%r hits=%r misses=%r>' % (
+            type(self).__name__,
+            self.maxSize,
+            self.ttl,
+            len(self._results),
+            self.hits,
+            self.misses)
+
+
+    def normalise(self, value):
+        """
+        Normalise a criteria value, so that equivalent criteria share results.
+
+        Leading and trailing whitespace is stripped from strings, sequences
+        become C{tuple}s and mappings become sorted C{tuple}s of pairs.
+        """
+        if isinstance(value, basestring):
+            return value.strip()
+        elif isinstance(value, (list, tuple)):
+            return tuple(map(self.normalise, value))
+        elif isinstance(value, dict):
+            return tuple(sorted(
+                (k, self.normalise(v)) for k, v in value.iteritems()))
+        return value
+
+
+    def makeKey(self, lookup, data):
+        """
+        Create a cache key for a lookup.
+
+        The value of the result input is not part of the lookup criteria.
+
+        @type  lookup: L{Lookup}
+
+        @type  data: C{dict}
+        @param data: Lookup criteria
+
+        @return: A hashable key, or C{None} if the criteria are not hashable
+        """
+        criteria = tuple(sorted(
+            (name, self.normalise(value))
+            for name, value in data.iteritems()
+            if name != u'__result__'))
+        key = lookup.populate, lookup.limit, criteria
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+
+    def get(self, key):
+        """
+        Get cached results.
+
+        @return: Results, or C{None} if there are no unexpired results
+        """
+        try:
+            expires, result = self._results.pop(key)
+        except KeyError:
+            self.misses += 1
+            return None
+        if expires <= self.clock.seconds():
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._results[key] = expires, result
+        return result
+
+
+    def put(self, key, result):
+        """
+        Cache results.
+        """
+        self._results.pop(key, None)
+        if len(self._results) >= self.maxSize:
+            self._results.popitem(last=False)
+        self._results[key] = self.clock.seconds() + self.ttl, result
+
+
+    def clear(self):
+        """
+        Discard all cached results.
+        """
+        self._results.clear()
+
+
+
 class Lookup(FormInput):
     """
     Complex input for arriving at a single result, given a set of criteria.
@@ -531,12 +1426,26 @@ class Lookup(FormInput):
         L{LookupResultTransportable}
     @ivar populate: Callback called with a mapping of form input names to
         criteria, returning L{LookupResultTransportable} instances.
+
+    @type limit: C{int}
+    @ivar limit: Maximum number of results to return from a lookup, or
+        C{None} for no limit
+
+    @type debounce: C{int}
+    @ivar debounce: Number of milliseconds the criteria must remain unchanged
+        for before a lookup is performed, or C{None} to perform lookups
+        immediately
+
+    @type cache: L{LookupCache}
+    @ivar cache: Cache of lookup results, or C{None} to not cache results
     """
     fragmentName = 'methanal-lookup'
     jsClass = u'Methanal.Widgets.Lookup'
+    supportsLightweight = False
 
 
-    def __init__(self, form, populate, values=None, **kw):
+    def __init__(self, form, populate, values=None, limit=None, debounce=None,
+                 cache=None, **kw):
         """
         Lookup input.
 
@@ -546,6 +1455,9 @@ class Lookup(FormInput):
         super(Lookup, self).__init__(**kw)
         self.form = form
         self.populate = populate
+        self.limit = limit
+        self.debounce = debounce
+        self.cache = cache
         if values is None:
             values = []
 
@@ -568,12 +1480,44 @@ class Lookup(FormInput):
         SelectInput(parent=self.form, name='__result__', values=values)
 
 
+    def getArgs(self):
+        return {u'debounce': self.debounce}
+
+
+    def _populate(self, data):
+        """
+        Call L{populate}, limiting the number of results to L{limit}.
+        """
+        results = self.populate(data)
+        if self.limit is None:
+            return {u'results': list(results), u'more': False}
+        results = list(islice(results, self.limit + 1))
+        return {u'results': results[:self.limit],
+                u'more': len(results) > self.limit}
+
+
     @expose
     def lookup(self, data):
         """
         Call L{populate} with the lookup criteria and return the results.
+
+        @rtype: C{dict}
+        @return: Mapping of C{u'results'} to a C{list} of at most L{limit}
+            results, and C{u'more'} to a C{bool} indicating whether there were
+            more results than that
         """
-        return list(self.populate(data))
+        key = None
+        if self.cache is not None:
+            key = self.cache.makeKey(self, data)
+            if key is not None:
+                result = self.cache.get(key)
+                if result is not None:
+                    return result
+
+        result = self._populate(data)
+        if key is not None:
+            self.cache.put(key, result)
+        return result
 
 
     @renderer
@@ -693,6 +1637,17 @@ class TabView(ThemedElement):
         the fragment part of the current URL to track which tab is selected,
         this behaviour supercedes L{Tab.selected}.
 
+    @type maxConcurrentFetches: C{int}
+    @ivar maxConcurrentFetches: Maximum number of this TabView's tab content
+        fetches to run concurrently; or C{None} to share the client-side
+        page-wide limit. Content for the selected tab is fetched first.
+
+    @type prefetch: C{bool}
+    @ivar prefetch: Prefetch the content of tabs adjacent to the selected tab,
+        when there is nothing else to fetch? Only the content of
+        L{DemandTab}s, with a cache policy, is prefetched. Defaults to
+        C{False}.
+
     @type _tabsByID: C{dict} mapping C{unicode} to L{methanal.widgets.Tab}
     @ivar _tabsByID: Mapping of unique tab IDs to tabs currently being managed.
 
@@ -703,7 +1658,8 @@ class TabView(ThemedElement):
     fragmentName = 'methanal-tab-view'
     jsClass = u'Methanal.Widgets.TabView'
 
-    def __init__(self, tabs, topLevel=False, **kw):
+    def __init__(self, tabs, topLevel=False, maxConcurrentFetches=None,
+                 prefetch=False, **kw):
         """
         @type  tabs: C{list} of L{methanal.widgets.Tab} or
             L{methanal.widgets.TabGroup}.
@@ -714,6 +1670,8 @@ class TabView(ThemedElement):
         self._tabGroups = {}
         self.tabs = []
         self.topLevel = topLevel
+        self.maxConcurrentFetches = maxConcurrentFetches
+        self.prefetch = prefetch
 
         for tabOrGroup in tabs:
             if isinstance(tabOrGroup, TabGroup):
@@ -760,6 +1718,9 @@ class TabView(ThemedElement):
     def _releaseTab(self, tab):
         """
         Stop managing a L{methanal.widgets.Tab} widget.
+
+        The tab, and its content, are released on the server side; the client
+        side only detaches the widget locally when it removes it.
         """
         if tab not in self.tabs:
             raise ValueError(
@@ -769,6 +1730,7 @@ class TabView(ThemedElement):
         group = self._tabGroups.get(tab.group)
         if group is not None:
             group._releaseTab(tab)
+        releaseFragment(tab)
 
 
     def getTab(self, id):
@@ -889,7 +1851,9 @@ class TabView(ThemedElement):
         return [
             dict.fromkeys(self._tabsByID.iterkeys(), True),
             self._tabGroups,
-            self.topLevel]
+            self.topLevel,
+            self.maxConcurrentFetches,
+            self.prefetch]
 
 
     @renderer
@@ -977,6 +1941,110 @@ class TabGroup(object):
 
 
 
+class ContentCachePolicy(object):
+    """
+    Policy for reusing the client-side content of L{DemandTab}s and
+    L{DemandExpander}s.
+
+    Content that has already been fetched is reused, instead of being fetched
+    again, when the tab is reselected or the expander is expanded again, until
+    it expires or the server reports that it is out of date. Content can also
+    be discarded explicitly with C{invalidateRemoteContent}.
+
+    @type ttl: C{float}
+    @ivar ttl: Number of seconds content may be reused for, or C{None} to reuse
+        content until it is invalidated. Defaults to C{None}.
+
+    @type getVersion: C{callable} taking no arguments
+    @ivar getVersion: Get the current version of the content, the client asks
+        the server whether this differs from the version of the content it has
+        before reusing it; or C{None} to reuse content without checking.
+        Defaults to C{None}.
+    """
+    def __init__(self, ttl=None, getVersion=None):
+        self.ttl = ttl
+        self.getVersion = getVersion
+
+
+    def __repr__(self):
+        return '<%s ttl=%r getVersion=%r>' % (
+            type(self).__name__,
+            self.ttl,
+            self.getVersion)
+
+
+    def getArgs(self):
+        """
+        Get the client-side arguments for this policy.
+        """
+        return {u'ttl': self.ttl,
+                u'revalidate': self.getVersion is not None}
+
+
+
+class _CachedContentMixin(object):
+    """
+    Server-side support for a L{ContentCachePolicy}.
+
+    @type cachePolicy: L{ContentCachePolicy}
+    @ivar cachePolicy: Content caching policy, or C{None} to fetch content
+        every time it is shown.
+
+    @type _contentVersions: C{dict} mapping C{unicode} to C{object}
+    @ivar _contentVersions: Mapping of node IDs to the version of the content
+        most recently sent to the client.
+    """
+    def _getCachePolicyArgs(self):
+        """
+        Get the client-side arguments for L{cachePolicy}.
+        """
+        if self.cachePolicy is None:
+            return None
+        return self.cachePolicy.getArgs()
+
+
+    def _getContentVersion(self):
+        """
+        Get the current content version, or C{None} if the cache policy does
+        not check versions.
+        """
+        if self.cachePolicy is None or self.cachePolicy.getVersion is None:
+            return None
+        return self.cachePolicy.getVersion()
+
+
+    def _recordContentVersion(self, nodeID):
+        """
+        Record the current content version for C{nodeID}, before producing
+        content for the client.
+        """
+        self._contentVersions[nodeID] = self._getContentVersion()
+
+
+    @expose
+    def isContentCurrent(self, nodeID):
+        """
+        Determine whether the client-side content for C{nodeID} is current.
+
+        @rtype: C{bool}
+        @return: C{True} if the content version has not changed since the
+            content was last sent to the client.
+        """
+        if nodeID not in self._contentVersions:
+            return False
+        return self._contentVersions[nodeID] == self._getContentVersion()
+
+
+    def invalidateRemoteContent(self, nodeID=u'content'):
+        """
+        Discard the client-side cached content for C{nodeID}, causing it to be
+        fetched again the next time it is shown.
+        """
+        self._contentVersions.pop(nodeID, None)
+        return self.callRemote('invalidateContent', nodeID)
+
+
+
 class Tab(ThemedElement):
     """
     A content container, intended to be passed to L{TabView}.
@@ -998,6 +2066,13 @@ class Tab(ThemedElement):
     @type group: C{unicode}
     @ivar group: Identifier of the group this tab belongs to, or C{None} for no
         grouping. Defaults to C{None}.
+
+    @ivar currentContent: Content most recently produced by L{getContent}, it
+        is released when superseded.
+
+    @type _contentGeneration: C{int}
+    @ivar _contentGeneration: Number of calls to L{getContent}, used to
+        discard content from calls that were superseded before they completed
     """
     fragmentName = 'methanal-tab'
 
@@ -1010,6 +2085,8 @@ class Tab(ThemedElement):
         self.contentFactory = contentFactory
         self.selected = selected
         self.group = group
+        self.currentContent = None
+        self._contentGeneration = 0
 
 
     def __repr__(self):
@@ -1034,8 +2111,21 @@ class Tab(ThemedElement):
 
     @expose
     def getContent(self, nodeID=None):
+        """
+        Get the tab content.
+
+        @return: A C{Deferred} firing with the content, or C{None} if another
+            call to this method was made before the content was produced
+        """
+        self._contentGeneration += 1
+        generation = self._contentGeneration
         def _setFragmentParent(content):
-            content.setFragmentParent(self)
+            if generation != self._contentGeneration:
+                return None
+            if content is not self.currentContent:
+                releaseFragment(self.currentContent)
+                content.setFragmentParent(self)
+                self.currentContent = content
             return content
         d = maybeDeferred(self.contentFactory)
         d.addCallback(_setFragmentParent)
@@ -1090,17 +2180,40 @@ class DynamicTab(Tab):
 
 
 
-class DemandTab(Tab):
+class DemandTab(_CachedContentMixin, Tab):
     """
     On-demand content tab container.
 
     Content is only requested, from the server, and inserted when the tab is
-    selected. Selecting the tab always retrieves new content; selecting the tab
+    selected. Unless C{cachePolicy} allows previously fetched content to be
+    reused, selecting the tab always retrieves new content; selecting the tab
     before a previous fetch attempt has completed will result in that data
     being discarded and a new fetch occurring.
     """
     jsClass = u'Methanal.Widgets.DemandTab'
 
+    def __init__(self, *a, **kw):
+        """
+        @type  cachePolicy: L{ContentCachePolicy}
+        @param cachePolicy: Content caching policy, or C{None} to fetch content
+            every time the tab is selected. Must be passed as a keyword
+            argument.
+        """
+        self.cachePolicy = kw.pop('cachePolicy', None)
+        super(DemandTab, self).__init__(*a, **kw)
+        self._contentVersions = {}
+
+
+    def getArgs(self):
+        return {u'cachePolicy': self._getCachePolicyArgs()}
+
+
+    @expose
+    def getContent(self, nodeID=None):
+        self._recordContentVersion(nodeID or u'content')
+        return super(DemandTab, self).getContent(nodeID)
+
+
     def updateRemoteContent(self):
         """
         Force the remote content to be updated.
@@ -1131,9 +2244,11 @@ class Expander(ThemedElement):
     @type expanded: C{bool}
     @ivar expanded: Is the content visible?
 
-    @ivar currentHeaderContent: Current header renderable.
+    @ivar currentHeaderContent: Current header renderable, it is released
+        when superseded.
 
-    @ivar currentExpanderContent: Current header renderable.
+    @ivar currentExpanderContent: Current content renderable, it is released
+        when superseded.
     """
     fragmentName = 'methanal-expander'
     jsClass = u'Methanal.Widgets.Expander'
@@ -1177,6 +2292,7 @@ class Expander(ThemedElement):
         content = self.headerFactory()
         if content == self.currentHeaderContent:
             return None
+        releaseFragment(self.currentHeaderContent)
         content.setFragmentParent(self)
         self.currentHeaderContent = content
         return content
@@ -1195,6 +2311,7 @@ class Expander(ThemedElement):
         content = self.contentFactory()
         if content == self.currentExpanderContent:
             return None
+        releaseFragment(self.currentExpanderContent)
         content.setFragmentParent(self)
         self.currentExpanderContent = content
         return content
@@ -1249,13 +2366,38 @@ class DynamicExpander(Expander):
 
 
 
-class DemandExpander(DynamicExpander):
+class DemandExpander(_CachedContentMixin, DynamicExpander):
     """
     Collapsable container with dynamically loaded content upon being expanded.
+
+    Unless C{cachePolicy} allows previously fetched content to be reused, the
+    content is fetched every time the expander is expanded.
     """
     jsClass = u'Methanal.Widgets.DemandExpander'
 
 
+    def __init__(self, *a, **kw):
+        """
+        @type  cachePolicy: L{ContentCachePolicy}
+        @param cachePolicy: Content caching policy, or C{None} to fetch content
+            every time the expander is expanded. Must be passed as a keyword
+            argument.
+        """
+        self.cachePolicy = kw.pop('cachePolicy', None)
+        super(DemandExpander, self).__init__(*a, **kw)
+        self._contentVersions = {}
+
+
+    def getInitialArguments(self):
+        return [self.expanded, self._getCachePolicyArgs()]
+
+
+    @expose
+    def getContent(self, nodeID):
+        self._recordContentVersion(nodeID)
+        return super(DemandExpander, self).getContent(nodeID)
+
+
 
 class ExpanderHeader(ThemedElement):
     """